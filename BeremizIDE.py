@@ -66,6 +66,7 @@ from plcopen.types_enums import \
     ITEM_RESOURCE, \
     ITEM_CONFNODE
 
+from plcopen.structures import GetStdBlocksLoadReport
 from ProjectController import ProjectController, GetAddMenuItems, MATIEC_ERROR_MODEL
 
 from IDEFrame import \
@@ -468,6 +469,7 @@ class Beremiz(IDEFrame, LocalRuntimeMixin):
 
         IDEFrame.__init__(self, parent, debug)
         self.Log = LogPseudoFile(self.LogConsole, self.SelectTab, logf)
+        self.Log.write(GetStdBlocksLoadReport())
 
         LocalRuntimeMixin.__init__(self, self.Log)
 
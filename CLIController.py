@@ -11,6 +11,7 @@ import click
 
 import fake_wx
 
+from plcopen.structures import GetStdBlocksLoadReport
 from ProjectController import ProjectController
 from LocalRuntimeMixin import LocalRuntimeMixin
 from runtime.loglevels import LogLevelsCount, LogLevels
@@ -78,6 +79,8 @@ class CLIController(LocalRuntimeMixin, ProjectController):
         log = Log()
         LocalRuntimeMixin.__init__(self, log, use_gui=False)
         ProjectController.__init__(self, None, log)
+        if session.verbose:
+            log.write(GetStdBlocksLoadReport())
 
     def _SetConnector(self, connector, update_status=True):
         self._connector = connector
@@ -96,15 +99,13 @@ class CLIController(LocalRuntimeMixin, ProjectController):
                         dump_end = max(-1, count - 10)
                     else:
                         dump_end = prev - 1
-                    for msgidx in range(count-1, dump_end, -1):
-                        message = connector.GetLogMessage(level, msgidx)
-                        if message is not None:
-                            msg, _tick, tv_sec, tv_nsec = message
-                            date = datetime.utcfromtimestamp(tv_sec + tv_nsec * 1e-9)
-                            txt = "%s at %s: %s\n" % (LogLevels[level], date.isoformat(' '), msg)
-                            new_messages.append((date,txt))
-                        else:
-                            break
+                    messages = connector.FetchLogMessages(
+                        level, dump_end + 1, count - dump_end - 1) \
+                        if count > dump_end + 1 else None
+                    for _msgidx, msg, _tick, tv_sec, tv_nsec in messages or []:
+                        date = datetime.utcfromtimestamp(tv_sec + tv_nsec * 1e-9)
+                        txt = "%s at %s: %s\n" % (LogLevels[level], date.isoformat(' '), msg)
+                        new_messages.append((date,txt))
                 self.previous_log_count[level] = count
             new_messages.sort()
             for date, txt in new_messages:
@@ -38,6 +38,7 @@ import types
 import shutil
 from operator import add
 from functools import reduce
+from concurrent.futures import ThreadPoolExecutor, Future
 
 from lxml import etree
 
@@ -73,6 +74,10 @@ class ConfigTreeNode(object):
     LibraryControler = None
     EditorType = ConfTreeNodeEditor
     IconPath = None
+    # Confnodes which CTNGenerate_C doesn't rely on code generation of other
+    # confnodes set this to run it in a thread, concurrently with others.
+    # Other confnodes are generated one after another, in tree order.
+    CTNGenerateConcurrently = False
 
     def _AddParamsMembers(self):
         self.CTNParams = None
@@ -276,10 +281,14 @@ class ConfigTreeNode(object):
         self.GetCTRoot().logger.write_warning(".".join(map(str, self.GetCurrentLocation())) + " -> Nothing to do\n")
         return [], "", False
 
-    def _Generate_C(self, buildpath, locations):
-        # Generate confnodes [(Cfiles, CFLAGS)], LDFLAGS, DoCalls, extra_files
-        # extra_files = [(fname,fobject), ...]
-        gen_result = self.CTNGenerate_C(buildpath, locations)
+    def _GenerateNode_C(self, buildpath, locations):
+        """
+        Generate C code of this confnode only, without its children
+        """
+        with self.GetCTRoot().BuildProfiler.Span(
+                self.CTNFullName() or self.CTNType, "CTNGenerate_C",
+                location=".".join(map(str, self.GetCurrentLocation()))):
+            gen_result = self.CTNGenerate_C(buildpath, locations)
         CTNCFilesAndCFLAGS, CTNLDFLAGS, DoCalls = gen_result[:3]
         extra_files = gen_result[3:]
         # if some files have been generated put them in the list with their location
@@ -298,21 +307,54 @@ class ConfigTreeNode(object):
             elif isinstance(CTNLDFLAGS, list):
                 LDFLAGS += CTNLDFLAGS
 
-        # recurse through all children, and stack their results
+        return LocationCFilesAndCFLAGS, LDFLAGS, extra_files
+
+    def _ScheduleGenerate_C(self, buildpath, locations, pool):
+        """
+        Generate C code of this confnode and its children, and return their
+        results in tree order. Results of confnodes generated concurrently
+        are futures.
+        """
+        if self.CTNGenerateConcurrently:
+            results = [pool.submit(self._GenerateNode_C, buildpath, locations)]
+        else:
+            results = [self._GenerateNode_C(buildpath, locations)]
+
         for CTNChild in self.IECSortedChildren():
             new_location = CTNChild.GetCurrentLocation()
             # How deep are we in the tree ?
             depth = len(new_location)
-            _LocationCFilesAndCFLAGS, _LDFLAGS, _extra_files = \
-                CTNChild._Generate_C(
-                    # keep the same path
-                    buildpath,
-                    # filter locations that start with current IEC location
-                    [loc for loc in locations if loc["LOC"][0:depth] == new_location])
-            # stack the result
-            LocationCFilesAndCFLAGS += _LocationCFilesAndCFLAGS
-            LDFLAGS += _LDFLAGS
-            extra_files += _extra_files
+            # filter locations that start with current IEC location
+            child_locations = [loc for loc in locations if loc["LOC"][0:depth] == new_location]
+            if type(CTNChild)._Generate_C is not ConfigTreeNode._Generate_C:
+                # confnode post-processes code generated by its children
+                results.append(CTNChild._Generate_C(buildpath, child_locations))
+            else:
+                results.extend(
+                    CTNChild._ScheduleGenerate_C(buildpath, child_locations, pool))
+        return results
+
+    def _Generate_C(self, buildpath, locations):
+        # Generate confnodes [(Cfiles, CFLAGS)], LDFLAGS, DoCalls, extra_files
+        # extra_files = [(fname,fobject), ...]
+        pool = ThreadPoolExecutor()
+        try:
+            results = self._ScheduleGenerate_C(buildpath, locations, pool)
+
+            # stack the results, in tree order whatever order they came
+            LocationCFilesAndCFLAGS = []
+            LDFLAGS = []
+            extra_files = ()
+            for result in results:
+                if isinstance(result, Future):
+                    result = result.result()
+                _LocationCFilesAndCFLAGS, _LDFLAGS, _extra_files = result
+                LocationCFilesAndCFLAGS += _LocationCFilesAndCFLAGS
+                LDFLAGS += _LDFLAGS
+                extra_files += tuple(_extra_files)
+        finally:
+            # on error, don't start generation of remaining confnodes
+            pool.shutdown(cancel_futures=True)
 
         return LocationCFilesAndCFLAGS, LDFLAGS, extra_files
 
@@ -31,6 +31,8 @@ import datetime
 from time import localtime
 from functools import reduce
 
+from lxml import etree
+
 import util.paths as paths
 from plcopen import *
 from plcopen.types_enums import *
@@ -50,6 +52,177 @@ ScriptDirectory = paths.AbsDir(__file__)
 # Length of the buffer
 UNDO_BUFFER_LENGTH = 20
 
+# Project elements which children are buffered one by one, others are
+# buffered as a whole. Each POU, data type or configuration is then
+# serialized separately, and states only differing by a few of them share
+# serialized content of others.
+UNDO_CONTAINERS = {
+    PLCOpenParser.DefaultNamespaceFormat % tag
+    for tag in ["project", "types", "instances",
+                "dataTypes", "pous", "configurations"]}
+
+
+def GetProjectState(element, previous=None):
+    """
+    Return state of project element, as tuple of serialized children, or
+    (tag, state) for children that are containers too. Serialized children
+    equal to one in previous state are shared with it.
+    """
+    if previous is None:
+        known = {}
+    elif isinstance(previous, dict):
+        known = previous
+    else:
+        known = {}
+        _GetStateChildren(previous, known)
+    state = []
+    for child in element:
+        if child.tag in UNDO_CONTAINERS:
+            state.append((child.tag, GetProjectState(child, known)))
+        else:
+            xml = etree.tostring(child, encoding='utf-8')
+            state.append(known.setdefault(xml, xml))
+    return tuple(state)
+
+
+def _GetStateChildren(state, children):
+    for entry in state:
+        if isinstance(entry, tuple):
+            _GetStateChildren(entry[1], children)
+        else:
+            children[entry] = entry
+
+
+# name and namespace declarations of serialized element start tag
+START_TAG_NAME_MODEL = re.compile(rb'<[^\s/>]+')
+NAMESPACE_DECLARATION_MODEL = re.compile(rb'\s+xmlns(?::([^=\s]+))?="([^"]*)"')
+
+
+def _StripDeclarations(xml, declared):
+    """
+    Remove from start tag of serialized element the namespace declarations
+    already made by its parent. Serialized children of project elements
+    repeat all namespace declarations in scope, that would otherwise stay
+    declared again on each of them once parsed.
+    """
+    start = pos = START_TAG_NAME_MODEL.match(xml).end()
+    kept = []
+    match = NAMESPACE_DECLARATION_MODEL.match(xml, pos)
+    while match is not None:
+        if match.groups() not in declared:
+            kept.append(match.group(0))
+        pos = match.end()
+        match = NAMESPACE_DECLARATION_MODEL.match(xml, pos)
+    if pos == start:
+        return xml
+    return xml[:start] + b"".join(kept) + xml[pos:]
+
+
+def _GetStateXML(tag, state, declared):
+    tag = etree.QName(tag)
+    return (
+        ('<%s>' % tag.localname).encode() +
+        b"".join(_GetStateXML(entry[0], entry[1], declared)
+                 if isinstance(entry, tuple)
+                 else _StripDeclarations(entry, declared)
+                 for entry in state) +
+        ('</%s>' % tag.localname).encode())
+
+
+def GetProjectStateXML(tag, state, nsmap=None):
+    """
+    Return XML of element with given tag, state and namespaces declarations,
+    default namespace of tag if nsmap is None
+    """
+    if nsmap is None:
+        nsmap = {None: etree.QName(tag).namespace}
+    declarations = "".join(
+        ' xmlns%s="%s"' % (":" + prefix if prefix else "", uri)
+        for prefix, uri in nsmap.items())
+    declared = {(prefix.encode() if prefix else None, uri.encode())
+                for prefix, uri in nsmap.items()}
+    xml = _GetStateXML(tag, state, declared)
+    # declarations go in root start tag
+    pos = xml.index(b">")
+    return xml[:pos] + declarations.encode() + xml[pos:]
+
+
+def RestoreProjectState(element, current, target):
+    """
+    Restore state of project element, only replacing children that differ
+    between current and target states
+    """
+    if current == target:
+        return
+    # current children, by serialized content or container tag
+    children = {}
+    for entry, child in zip(current, element):
+        key = entry[0] if isinstance(entry, tuple) else entry
+        children.setdefault(key, []).append((entry, child))
+
+    new_children = []
+    missing = []
+    for entry in target:
+        key = entry[0] if isinstance(entry, tuple) else entry
+        found = children.get(key)
+        if found:
+            current_entry, child = found.pop(0)
+            if isinstance(entry, tuple):
+                RestoreProjectState(child, current_entry[1], entry[1])
+            new_children.append(child)
+        else:
+            missing.append(len(new_children))
+            new_children.append(entry)
+
+    if missing:
+        # parse missing children at once, in an element with same tag and
+        # namespaces as container, so that they get the same classes as in
+        # project
+        parsed = PLCOpenParser.Loads(GetProjectStateXML(
+            element.tag, [new_children[idx] for idx in missing],
+            element.nsmap))
+        for idx, child in zip(missing, list(parsed)):
+            new_children[idx] = child
+
+        if element.getparent() is None:
+            # an element moved under root gets its namespace prefix from
+            # first matching declaration of root, that may not be the
+            # default one : update replaced children of root in place
+            unused = {}
+            for found in children.values():
+                for _entry, child in found:
+                    unused.setdefault(child.tag, []).append(child)
+            for idx in missing:
+                found = unused.get(new_children[idx].tag)
+                if found:
+                    child = found.pop(0)
+                    _CopyProjectElement(child, new_children[idx])
+                    new_children[idx] = child
+
+    # only move children that aren't at their place, as moving an element
+    # walks its whole subtree. Children to remove are removed first, so
+    # that kept ones are already at their place unless reordered.
+    kept = set(new_children)
+    for child in list(element):
+        if child not in kept:
+            element.remove(child)
+    for idx, child in enumerate(new_children):
+        if idx >= len(element) or element[idx] is not child:
+            element.insert(idx, child)
+
+
+def _CopyProjectElement(element, source):
+    """
+    Make element a copy of source, moving source children into it
+    """
+    element.attrib.clear()
+    element.attrib.update(source.attrib)
+    # generated classes don't let text be set as an attribute
+    etree.ElementBase.text.__set__(element, source.text)
+    for child in list(element):
+        element.remove(child)
+    element.extend(list(source))
+
 
 class UndoBuffer(object):
     """
@@ -161,8 +334,11 @@ class PLCControler(object):
         self.FileName = ""
         self.ProgramChunks = []
         self.ProgramOffset = 0
+        self.PouGenerationCache = {}
         self.NextCompiledProject = None
         self.CurrentCompiledProject = None
+        self.CompiledProject = None
+        self.CompiledProjectState = None
         self.ConfNodeTypes = []
         self.TotalTypesDict = StdBlckDct.copy()
         self.TotalTypes = StdBlckLst[:]
@@ -173,10 +349,38 @@ class PLCControler(object):
 
     def GetProject(self, debug=False):
         if debug and self.CurrentCompiledProject is not None:
-            return self.CurrentCompiledProject
+            return self.GetCompiledProject()
         else:
             return self.Project
 
+    def GetProjectSnapshot(self):
+        """
+        Return state of project, sharing serialized children with current
+        undo buffer state or last snapshot
+        """
+        if self.ProjectBuffer is not None:
+            return GetProjectState(self.Project, self.ProjectBuffer.Current())
+        return GetProjectState(self.Project, self.NextCompiledProject)
+
+    def GetCompiledProject(self):
+        """
+        Return project as it was compiled, parsed from its snapshot on first
+        use. Only children changed since last snapshot used are parsed again.
+        """
+        state = self.CurrentCompiledProject
+        if self.CompiledProjectState is not state:
+            if self.CompiledProject is None:
+                self.CompiledProject = PLCOpenParser.Loads(
+                    GetProjectStateXML(
+                        self.Project.tag, state, self.Project.nsmap))
+                # state doesn't hold root attributes, they never change
+                self.CompiledProject.attrib.update(self.Project.attrib)
+            else:
+                RestoreProjectState(
+                    self.CompiledProject, self.CompiledProjectState, state)
+            self.CompiledProjectState = state
+        return self.CompiledProject
+
     # -------------------------------------------------------------------------------
     #                         Project management functions
     # -------------------------------------------------------------------------------
@@ -198,8 +402,11 @@ class PLCControler(object):
         self.CreateProjectBuffer(False)
         self.ProgramChunks = []
         self.ProgramOffset = 0
-        self.NextCompiledProject = self.Copy(self.Project)
+        self.PouGenerationCache = {}
+        self.NextCompiledProject = self.GetProjectSnapshot()
         self.CurrentCompiledProject = None
+        self.CompiledProject = None
+        self.CompiledProjectState = None
         self.Buffering = False
 
     # Return project data type names
@@ -450,8 +657,10 @@ class PLCControler(object):
         warnings = []
         if self.Project is not None:
             try:
-                self.ProgramChunks = GenerateCurrentProgram(self, self.Project, errors, warnings,**kwargs)
-                self.NextCompiledProject = self.Copy(self.Project)
+                self.ProgramChunks = GenerateCurrentProgram(
+                    self, self.Project, errors, warnings,
+                    pou_cache=self.PouGenerationCache, **kwargs)
+                self.NextCompiledProject = self.GetProjectSnapshot()
                 program_text = "".join([item[0] for item in self.ProgramChunks])
                 if filepath is not None:
                     programfile = open(filepath, "w", encoding='utf-8')
@@ -472,7 +681,7 @@ class PLCControler(object):
         if self.NextCompiledProject is None:
             self.CurrentCompiledProject = self.NextCompiledProject
         else:
-            self.CurrentCompiledProject = self.Copy(self.Project)
+            self.CurrentCompiledProject = self.GetProjectSnapshot()
 
     def GetChunkInfos(self, from_location, to_location):
         row = self.ProgramOffset + 1
@@ -2745,8 +2954,11 @@ class PLCControler(object):
         self.CreateProjectBuffer(True)
         self.ProgramChunks = []
         self.ProgramOffset = 0
-        self.NextCompiledProject = self.Copy(self.Project)
+        self.PouGenerationCache = {}
+        self.NextCompiledProject = self.GetProjectSnapshot()
         self.CurrentCompiledProject = None
+        self.CompiledProject = None
+        self.CompiledProjectState = None
         self.Buffering = False
         self.CurrentElementEditing = None
         return error
@@ -2800,7 +3012,7 @@ class PLCControler(object):
 
     def CreateProjectBuffer(self, saved):
         if self.ProjectBufferEnabled:
-            self.ProjectBuffer = UndoBuffer(PLCOpenParser.Dumps(self.Project), saved)
+            self.ProjectBuffer = UndoBuffer(GetProjectState(self.Project), saved)
         else:
             self.ProjectBuffer = None
             self.ProjectSaved = saved
@@ -2819,7 +3031,8 @@ class PLCControler(object):
 
     def BufferProject(self):
         if self.ProjectBuffer is not None:
-            self.ProjectBuffer.Buffering(PLCOpenParser.Dumps(self.Project))
+            self.ProjectBuffer.Buffering(
+                GetProjectState(self.Project, self.ProjectBuffer.Current()))
         else:
             self.ProjectSaved = False
 
@@ -2831,7 +3044,8 @@ class PLCControler(object):
 
     def EndBuffering(self):
         if self.ProjectBuffer is not None and self.Buffering:
-            self.ProjectBuffer.Buffering(PLCOpenParser.Dumps(self.Project))
+            self.ProjectBuffer.Buffering(
+                GetProjectState(self.Project, self.ProjectBuffer.Current()))
             self.Buffering = False
 
     def MarkProjectAsSaved(self):
@@ -2848,14 +3062,21 @@ class PLCControler(object):
         else:
             return self.ProjectSaved
 
+    def LoadBufferedState(self, state):
+        if state is not None:
+            # project may have been modified since current state was buffered,
+            # take its actual state, sharing unchanged children with buffer
+            current = GetProjectState(self.Project, state)
+            RestoreProjectState(self.Project, current, state)
+
     def LoadPrevious(self):
         self.EndBuffering()
         if self.ProjectBuffer is not None:
-            self.Project = PLCOpenParser.Loads(self.ProjectBuffer.Previous())
+            self.LoadBufferedState(self.ProjectBuffer.Previous())
 
     def LoadNext(self):
         if self.ProjectBuffer is not None:
-            self.Project = PLCOpenParser.Loads(self.ProjectBuffer.Next())
+            self.LoadBufferedState(self.ProjectBuffer.Next())
 
     def GetBufferState(self):
         if self.ProjectBuffer is not None:
@@ -26,8 +26,11 @@
 from functools import cmp_to_key
 from operator import eq
 import re
+import hashlib
 from functools import reduce
 
+from lxml import etree
+
 from plcopen import PLCOpenParser
 from plcopen.structures import *
 from plcopen.types_enums import *
@@ -101,6 +104,22 @@ class PLCGenException(Exception):
     pass
 
 
+class PouGenerationRecord(object):
+    """
+    What generation of a POU program depended on and produced, so that it
+    can be reused while POU and what it depends on are unchanged
+    """
+
+    def __init__(self, xml_hash, warnings_mark):
+        self.XMLHash = xml_hash
+        # (local, method name, args, repr of result), see ProgramGenerator._Lookup
+        self.Lookups = []
+        # ("pou", name), ("datatype", name) or ("warning", message), in order
+        self.Events = []
+        self.Program = None
+        self.WarningsMark = warnings_mark
+
+
 # -------------------------------------------------------------------------------
 #                           Generator of PLC program
 # -------------------------------------------------------------------------------
@@ -109,7 +128,7 @@ class PLCGenException(Exception):
 class ProgramGenerator(object):
 
     # Create a new PCL program generator
-    def __init__(self, controler, project, errors, warnings):
+    def __init__(self, controler, project, errors, warnings, pou_cache=None):
         # Keep reference of the controler and project
         self.Controler = controler
         self.Project = project
@@ -119,10 +138,69 @@ class ProgramGenerator(object):
         self.PouComputed = {}
         self.Errors = errors
         self.Warnings = warnings
+        # POU generation records of previous generation, by POU name
+        self.PouCache = pou_cache
+        # Records of POUs being generated, innermost last
+        self.PouRecords = []
+        self.PouReused = 0
+        # repr of lookup results during this generation, by call
+        self.LookupSignatures = {}
+
+    def _Call(self, local, method_name, args):
+        return getattr(self if local else self.Controler, method_name)(*args)
+
+    def _Lookup(self, method_name, *args, local=False):
+        """
+        Call controler method, or generator method if local, and record
+        call for POU being generated
+        """
+        result = self._Call(local, method_name, args)
+        if self.PouRecords:
+            call = (local, method_name, args)
+            signature = self.LookupSignatures.get(call)
+            if signature is None:
+                signature = self.LookupSignatures[call] = repr(result)
+            self.PouRecords[-1].Lookups.append(call + (signature,))
+        return result
+
+    def _LookupSignature(self, local, method_name, args):
+        call = (local, method_name, args)
+        signature = self.LookupSignatures.get(call)
+        if signature is None:
+            signature = self.LookupSignatures[call] = \
+                repr(self._Call(local, method_name, args))
+        return signature
+
+    def GetBlockType(self, type, inputs=None):
+        return self._Lookup("GetBlockType", type, inputs)
+
+    def GetDataTypeInfos(self, tagname):
+        return self._Lookup("GetDataTypeInfos", tagname)
+
+    def _RecordEvent(self, event):
+        if self.PouRecords:
+            record = self.PouRecords[-1]
+            # warnings of POU being generated until now
+            record.Events.extend(
+                ("warning", msg) for msg in self.Warnings[record.WarningsMark:])
+            record.Events.append(event)
+
+    def _SkipWarnings(self):
+        # warnings emitted since last event belong to another POU
+        if self.PouRecords:
+            self.PouRecords[-1].WarningsMark = len(self.Warnings)
+
+    def _IsRecordValid(self, record, xml_hash):
+        if record.XMLHash != xml_hash:
+            return False
+        for local, method_name, args, result in record.Lookups:
+            if self._LookupSignature(local, method_name, args) != result:
+                return False
+        return True
 
     # Compute value according to type given
     def ComputeValue(self, value, var_type):
-        base_type = self.Controler.GetBaseType(var_type)
+        base_type = self._Lookup("GetBaseType", var_type)
         if base_type == "STRING" and not value.startswith("'") and not value.endswith("'"):
             return "'%s'" % value
         elif base_type == "WSTRING" and not value.startswith('"') and not value.endswith('"'):
@@ -131,6 +209,7 @@ class ProgramGenerator(object):
 
     # Generate a data type from its name
     def GenerateDataType(self, datatype_name):
+        self._RecordEvent(("datatype", datatype_name))
         # Verify that data type hasn't been generated yet
         if not self.DatatypeComputed.get(datatype_name, True):
             # If not mark data type as computed
@@ -246,6 +325,11 @@ class ProgramGenerator(object):
 
     # Generate a POU from its name
     def GeneratePouProgram(self, pou_name):
+        self._RecordEvent(("pou", pou_name))
+        self._GeneratePouProgramOnce(pou_name)
+        self._SkipWarnings()
+
+    def _GeneratePouProgramOnce(self, pou_name):
         # Verify that POU hasn't been generated yet
         if not self.PouComputed.get(pou_name, True):
             # If not mark POU as computed
@@ -256,19 +340,55 @@ class ProgramGenerator(object):
             pou_type = pou.getpouType()
             # Verify that POU type exists
             if pou_type in pouTypeNames:
-                # Create a POU program generator
-                pou_program = PouProgramGenerator(self, pou.getname(), pouTypeNames[pou_type], self.Errors, self.Warnings)
-                program = pou_program.GenerateProgram(pou)
+                if self.PouCache is None:
+                    self.Program += self._GeneratePouProgram(pou, pou_type)
+                    return
+                xml_hash = hashlib.md5(etree.tostring(pou)).hexdigest()
+                record = self.PouCache.get(pou_name)
+                if record is not None and self._IsRecordValid(record, xml_hash):
+                    # Replay what generating POU did, without generating it
+                    self.PouReused += 1
+                    for event, arg in record.Events:
+                        if event == "pou":
+                            self.GeneratePouProgram(arg)
+                        elif event == "datatype":
+                            self.GenerateDataType(arg)
+                        else:
+                            self.Warnings.append(arg)
+                    self.Program += record.Program
+                    return
+                record = PouGenerationRecord(xml_hash, len(self.Warnings))
+                self.PouCache.pop(pou_name, None)
+                self.PouRecords.append(record)
+                try:
+                    program = self._GeneratePouProgram(pou, pou_type)
+                finally:
+                    self.PouRecords.pop()
+                record.Events.extend(
+                    ("warning", msg) for msg in self.Warnings[record.WarningsMark:])
+                record.Program = program
+                self.PouCache[pou_name] = record
                 self.Program += program
             else:
                 raise PLCGenException(_("Undefined pou type \"%s\"") % pou_type)
 
-    # Generate a POU defined and used in text
-    def GeneratePouProgramInText(self, text):
+    def _GeneratePouProgram(self, pou, pou_type):
+        # Create a POU program generator
+        pou_program = PouProgramGenerator(self, pou.getname(), pouTypeNames[pou_type], self.Errors, self.Warnings)
+        return pou_program.GenerateProgram(pou)
+
+    def GetPouNamesInText(self, text):
+        pou_names = []
         for pou_name in list(self.PouComputed.keys()):
             model = re.compile("(?:^|[^0-9^A-Z])%s(?:$|[^0-9^A-Z])" % pou_name.upper())
             if model.search(text) is not None:
-                self.GeneratePouProgram(pou_name)
+                pou_names.append(pou_name)
+        return pou_names
+
+    # Generate a POU defined and used in text
+    def GeneratePouProgramInText(self, text):
+        for pou_name in self._Lookup("GetPouNamesInText", text, local=True):
+            self.GeneratePouProgram(pou_name)
 
     # Generate a configuration from its model
     def GenerateConfiguration(self, configuration):
@@ -481,6 +601,12 @@ class ProgramGenerator(object):
         for pou_name in list(self.PouComputed.keys()):
             log("Generate POU %s"%pou_name)
             self.GeneratePouProgram(pou_name)
+        if self.PouCache is not None:
+            # forget removed POUs
+            for pou_name in list(self.PouCache.keys()):
+                if pou_name not in self.PouComputed:
+                    self.PouCache.pop(pou_name)
+            log("%d POU(s) unchanged since previous generation" % self.PouReused)
         if noconfig:
             return
         # Generate every configurations defined
@@ -546,7 +672,7 @@ class PouProgramGenerator(object):
         self.Warnings = warnings
 
     def GetBlockType(self, type, inputs=None):
-        return self.ParentGenerator.Controler.GetBlockType(type, inputs)
+        return self.ParentGenerator.GetBlockType(type, inputs)
 
     def IndentLeft(self):
         if len(self.CurrentIndent) >= 2:
@@ -580,7 +706,7 @@ class PouProgramGenerator(object):
                         current_type = var_type
                         break
             while current_type is not None and len(parts) > 0:
-                blocktype = self.ParentGenerator.Controler.GetBlockType(current_type)
+                blocktype = self.ParentGenerator.GetBlockType(current_type)
                 if blocktype is not None:
                     name = parts.pop(0)
                     current_type = None
@@ -590,7 +716,7 @@ class PouProgramGenerator(object):
                             break
                 else:
                     tagname = ComputeDataTypeName(current_type)
-                    infos = self.ParentGenerator.Controler.GetDataTypeInfos(tagname)
+                    infos = self.ParentGenerator.GetDataTypeInfos(tagname)
                     if infos is not None and infos["type"] == "Structure":
                         name = parts.pop(0)
                         current_type = None
@@ -1769,8 +1895,8 @@ class PouProgramGenerator(object):
         return program
 
 
-def GenerateCurrentProgram(controler, project, errors, warnings, **kwargs):
-    generator = ProgramGenerator(controler, project, errors, warnings)
+def GenerateCurrentProgram(controler, project, errors, warnings, pou_cache=None, **kwargs):
+    generator = ProgramGenerator(controler, project, errors, warnings, pou_cache)
     if hasattr(controler, "logger"):
         def log(txt):
             controler.logger.write("    "+txt+"\n")
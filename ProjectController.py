@@ -47,6 +47,7 @@ from functools import reduce
 from jinja2 import PackageLoader, Environment, FileSystemLoader
 
 import wx
+import numpy as np
 
 import platform
 
@@ -57,6 +58,8 @@ from util.misc import CheckPathPerm, GetClassImporter
 from util.MiniTextControler import MiniTextControler
 from util.ProcessLogger import ProcessLogger
 from util.BitmapLibrary import GetBitmap
+from util.BuildProfiler import BuildProfiler, BUILD_TRACE_FILENAME
+from util.IECVariables import IECVariables
 from editors.FileManagementPanel import FileManagementPanel
 from editors.ProjectNodeEditor import ProjectNodeEditor
 from editors.IECCodeViewer import IECCodeViewer
@@ -66,7 +69,7 @@ from PLCControler import PLCControler
 from plcopen.structures import IEC_KEYWORDS
 from plcopen.types_enums import ComputeConfigurationResourceName, ITEM_CONFNODE
 import targets
-from runtime.typemapping import DebugTypesSize, UnpackDebugBuffer
+from runtime.typemapping import DebugTypesSize, GetDebugBufferLayout, DebugDeltaDecoder
 from runtime import PlcStatus
 from ConfigTreeNode import ConfigTreeNode, XSDSchemaErrorMessage
 from POULibrary import UserAddressedException
@@ -76,6 +79,10 @@ base_folder = paths.AbsParentDir(__file__)
 MATIEC_ERROR_MODEL = re.compile(
     r".*\.st:(\d+)-(\d+)\.\.(\d+)-(\d+): (?:error)|(?:warning) : (.*)$")
 
+# Minimum delay between two queries of debugger statistics
+# (PLC cycles dropped by debugger, traces sample rate)
+DEBUG_STATS_CHECK_PERIOD = 1.0
+
 
 def ExtractChildrenTypesFromCatalog(catalog):
     children_types = []
@@ -224,6 +231,7 @@ def GetProjectControllerXSD():
           </xsd:sequence>
           <xsd:attribute name="URI_location" type="xsd:string" use="optional" default=""/>
           <xsd:attribute name="Disable_Extensions" type="xsd:boolean" use="optional" default="false"/>
+          <xsd:attribute name="Debug_Changes_Only" type="xsd:boolean" use="optional" default="false"/>
         </xsd:complexType>
       </xsd:element>
     </xsd:schema>
@@ -260,10 +268,12 @@ class ProjectController(ConfigTreeNode, PLCControler):
         self.MandatoryParams = None
         self._builder = None
         self._buildType = "simulator"
+        self.BuildProfiler = BuildProfiler()
         self._connector = None
         self.DispatchDebugValuesTimer = None
         self.DebugValuesBuffers = []
         self.DebugTicks = []
+        self.DebugDeltaDecoder = None
         self.SetAppFrame(frame, logger)
 
         # Setup debug information
@@ -289,6 +299,12 @@ class ProjectController(ConfigTreeNode, PLCControler):
         self.StatusMethods = [dic.copy() for dic in self.StatusMethods]
         self.DebugToken = None
         self.LastComplainDebugToken = None
+        self.LastDroppedComplainDebugToken = None
+        self.LastDroppedCyclesCheck = 0
+        self.DebugDroppedCycles = 0
+        self.LastSampleRateCheck = 0
+        self.DebugSampleRate = None
+        self.DebugSampledTicks = 0
         self.debug_status = PlcStatus.Stopped
 
         self.IECcodeDigest = None
@@ -659,7 +675,8 @@ class ProjectController(ConfigTreeNode, PLCControler):
         LocatedCCodeAndFlags = []
         Extras = []
         for lib in self.Libraries:
-            res = lib.Generate_C(buildpath, self._VariablesList, LibIECCflags)
+            with self.BuildProfiler.Span(lib.__class__.__name__, "Generate_C"):
+                res = lib.Generate_C(buildpath, self._VariablesList, LibIECCflags)
             LocatedCCodeAndFlags.append(res[:2])
             if len(res) > 2:
                 Extras.extend(res[2:])
@@ -789,7 +806,9 @@ class ProjectController(ConfigTreeNode, PLCControler):
         return LibGlobals + CTNGlobals
 
     def _Generate_SoftPLC(self):
-        if self._Generate_PLC_ST():
+        with self.BuildProfiler.Span("Generate ST", "phase"):
+            res = self._Generate_PLC_ST()
+        if res:
             return self._Compile_ST_to_SoftPLC()
         return False
 
@@ -888,9 +907,10 @@ class ProjectController(ConfigTreeNode, PLCControler):
         try:
             # Invoke compiler.
             # Output files are listed to stdout, errors to stderr
-            status, result, err_result = ProcessLogger(self.logger, buildcmd,
-                                                       no_stdout=True,
-                                                       no_stderr=True).spin()
+            with self.BuildProfiler.Span("iec2c", "phase"):
+                status, result, err_result = ProcessLogger(self.logger, buildcmd,
+                                                           no_stdout=True,
+                                                           no_stderr=True).spin()
         except Exception as e:
             self.logger.write_error(buildcmd + "\n")
             self.logger.write_error(repr(e) + "\n")
@@ -1020,7 +1040,7 @@ class ProjectController(ConfigTreeNode, PLCControler):
         self._ProgramList = None
         self._VariablesList = None
         self._DbgVariablesList = None
-        self._IECPathToIdx = {}
+        self._IECVariables = IECVariables()
         self._Ticktime = 0
         self.TracedIECPath = []
         self.TracedIECTypes = []
@@ -1032,81 +1052,29 @@ class ProjectController(ConfigTreeNode, PLCControler):
         list of all variables used in various POUs
         """
         if self._ProgramList is None or self._VariablesList is None:
-            try:
-                csvfile = os.path.join(self._getBuildPath(), "VARIABLES.csv")
-                # describes CSV columns
-                ProgramsListAttributeName = ["num", "C_path", "type"]
-                VariablesListAttributeName = [
-                    "num", "vartype", "IEC_path", "C_path", "type", "derived", "retain"]
-                self._ProgramList = []
-                self._VariablesList = []
-                self._DbgVariablesList = []
-                self._IECPathToIdx = {}
-
-                # Separate sections
-                ListGroup = []
-                for line in open(csvfile, 'r').readlines():
-                    strippedline = line.strip()
-                    if strippedline.startswith("//"):
-                        # Start new section
-                        ListGroup.append([])
-                    elif len(strippedline) > 0 and len(ListGroup) > 0:
-                        # append to this section
-                        ListGroup[-1].append(strippedline)
-
-                # first section contains programs
-                for line in ListGroup[0]:
-                    # Split and Maps each field to dictionnary entries
-                    attrs = dict(
-                        list(zip(ProgramsListAttributeName, line.strip().split(';'))))
-                    # Truncate "C_path" to remove conf an resources names
-                    attrs["C_path"] = '__'.join(
-                        attrs["C_path"].split(".", 2)[1:])
-                    # Push this dictionnary into result.
-                    self._ProgramList.append(attrs)
-
-                # second section contains all variables
-                config_FBs = {}
-                Idx = 0
-                for line in ListGroup[1]:
-                    # Split and Maps each field to dictionnary entries
-                    attrs = dict(
-                        list(zip(VariablesListAttributeName, line.strip().split(';'))))
-                    # Truncate "C_path" to remove conf an resources names
-                    parts = attrs["C_path"].split(".", 2)
-                    if len(parts) > 2:
-                        config_FB = config_FBs.get(tuple(parts[:2]))
-                        if config_FB:
-                            parts = [config_FB] + parts[2:]
-                            attrs["C_path"] = '.'.join(parts)
-                        else:
-                            attrs["C_path"] = '__'.join(parts[1:])
-                    else:
-                        attrs["C_path"] = '__'.join(parts)
-                        if attrs["vartype"] == "FB":
-                            config_FBs[tuple(parts)] = attrs["C_path"]
-                    if attrs["vartype"] != "FB" and attrs["type"] in DebugTypesSize:
-                        # Push this dictionnary into result.
-                        self._DbgVariablesList.append(attrs)
-                        # Fill in IEC<->C translation dicts
-                        IEC_path = attrs["IEC_path"]
-                        self._IECPathToIdx[IEC_path] = (Idx, attrs["type"])
-                        # Ignores numbers given in CSV file
-                        # Idx=int(attrs["num"])
-                        # Count variables only, ignore FBs
-                        Idx += 1
-                    self._VariablesList.append(attrs)
-
-                # third section contains ticktime
-                if len(ListGroup) > 2:
-                    self._Ticktime = int(ListGroup[2][0])
+            with self.BuildProfiler.Span("GetIECProgramsAndVariables", "phase"):
+                return self._GetIECProgramsAndVariables()
+        return True
 
-            except Exception:
-                self.logger.write_error(
-                    _("Cannot open/parse VARIABLES.csv!\n"))
-                self.logger.write_error(traceback.format_exc())
-                self.ResetIECProgramsAndVariables()
-                return False
+    def _GetIECProgramsAndVariables(self):
+        try:
+            csvfile = os.path.join(self._getBuildPath(), "VARIABLES.csv")
+            # parsed content is cached next to CSV file
+            iec_variables = IECVariables()
+            iec_variables.Load(
+                csvfile, os.path.join(self._getBuildPath(), "VARIABLES.cache"))
+            self._IECVariables = iec_variables
+            self._ProgramList = iec_variables.Programs
+            self._VariablesList = iec_variables.Variables
+            self._DbgVariablesList = iec_variables.DbgVariables
+            self._Ticktime = iec_variables.Ticktime
+
+        except Exception:
+            self.logger.write_error(
+                _("Cannot open/parse VARIABLES.csv!\n"))
+            self.logger.write_error(traceback.format_exc())
+            self.ResetIECProgramsAndVariables()
+            return False
 
         return True
 
@@ -1185,34 +1153,36 @@ class ProjectController(ConfigTreeNode, PLCControler):
         # prepare debug code
         variable_decl_array = []
         retain_indexes = []
+        enum_suffix = {
+            "EXT": "_P_ENUM",
+            "IN":  "_P_ENUM",
+            "MEM": "_O_ENUM",
+            "OUT": "_O_ENUM",
+            "VAR": "_ENUM"
+        }
         for i, v in enumerate(self._DbgVariablesList):
             variable_decl_array.append(
-                "{&(%(C_path)s), " % v +
-                {
-                    "EXT": "%(type)s_P_ENUM",
-                    "IN":  "%(type)s_P_ENUM",
-                    "MEM": "%(type)s_O_ENUM",
-                    "OUT": "%(type)s_O_ENUM",
-                    "VAR": "%(type)s_ENUM"
-                }[v["vartype"]] % v +
+                "{&(" + v.C_path + "), " +
+                v.type + enum_suffix[v.vartype] +
                 "}")
 
-            if "retain" in v and v["retain"] == "1":
-                retain_indexes.append("/* "+v["C_path"]+" */ "+str(i))
+            if v.get("retain") == "1":
+                retain_indexes.append("/* "+v.C_path+" */ "+str(i))
 
+        extern_format = {
+            "EXT": "extern __IEC_%s_p %s;",
+            "IN":  "extern __IEC_%s_p %s;",
+            "MEM": "extern __IEC_%s_p %s;",
+            "OUT": "extern __IEC_%s_p %s;",
+            "VAR": "extern __IEC_%s_t %s;",
+            "FB":  "extern       %s   %s;"
+        }
         debug_code = targets.GetCode("plc_debug.c") % {
-            "programs_declarations": "\n".join(["extern %(type)s %(C_path)s;" %
-                                                p for p in self._ProgramList]),
+            "programs_declarations": "\n".join(["extern %s %s;" % (p.type, p.C_path)
+                                                for p in self._ProgramList]),
             "extern_variables_declarations": "\n".join([
-                {
-                    "EXT": "extern __IEC_%(type)s_p %(C_path)s;",
-                    "IN":  "extern __IEC_%(type)s_p %(C_path)s;",
-                    "MEM": "extern __IEC_%(type)s_p %(C_path)s;",
-                    "OUT": "extern __IEC_%(type)s_p %(C_path)s;",
-                    "VAR": "extern __IEC_%(type)s_t %(C_path)s;",
-                    "FB":  "extern       %(type)s   %(C_path)s;"
-                }[v["vartype"]] % v
-                for v in self._VariablesList if v["C_path"].find('.') < 0]),
+                extern_format[v.vartype] % (v.type, v.C_path)
+                for v in self._VariablesList if '.' not in v.C_path]),
             "variable_decl_array": ",\n".join(variable_decl_array),
             "retain_vardsc_index_array": ",\n".join(retain_indexes),
             "var_access_code": targets.GetCode("var_access.c")
@@ -1276,6 +1246,26 @@ class ProjectController(ConfigTreeNode, PLCControler):
         """
         Method called by user to (re)build SoftPLC and confnode tree
         """
+        self.BuildProfiler = BuildProfiler()
+        try:
+            with self.BuildProfiler.Span("Build", "build"):
+                return self._DoBuild()
+        finally:
+            self._ReportBuildProfile()
+
+    def _ReportBuildProfile(self):
+        """
+        Save build spans as trace next to build output, and log longest ones
+        """
+        buildpath = self._getBuildPath()
+        self.logger.write(_("Build time, CPU time, longest steps :\n"))
+        self.logger.write(self.BuildProfiler.GetSummary())
+        try:
+            self.BuildProfiler.Save(os.path.join(buildpath, BUILD_TRACE_FILENAME))
+        except OSError as e:
+            self.logger.write_warning(_("Cannot save build trace : %s\n") % str(e))
+
+    def _DoBuild(self):
         if self.AppFrame is not None:
             self.AppFrame.ClearErrors()
         self._CloseView(self._IECCodeView)
@@ -1376,30 +1366,41 @@ class ProjectController(ConfigTreeNode, PLCControler):
 
         # Get temporary directory path
         extrafilespath = self._getExtraFilesPath()
-        # Remove old directory
-        if os.path.exists(extrafilespath):
+        # Create directory
+        if not os.path.exists(extrafilespath):
             try:
-                shutil.rmtree(extrafilespath)
-            except OSError as e:
-                # Handle and log specific OS-related errors
-                self.logger.write_error(f"Failed to clean the project build folder: {e.filename}\n")
-                self.logger.write_error(f"{e.strerror} (Error Code: {e.errno})\n")
-                self.logger.write_error("Try to manually remove the build folder inside your project path if you have issues during compilation\n")
+                os.mkdir(extrafilespath)
             except Exception as e:
-                # Catch any other unexpected exceptions
-                self.logger.write_error(f"An unexpected error occurred while cleaning the build folder: {str(e)}\n")
-                self.logger.write_error("Try to manually remove the build folder inside your project path if you have issues during compilation\n")
-        # Recreate directory
-        try:
-            os.mkdir(extrafilespath)
-        except Exception as e:
-            self.logger.write_error(f"Failed to create extra files folder: {str(e)}\n")
-        # Then write the files
+                self.logger.write_error(f"Failed to create extra files folder: {str(e)}\n")
+        # Then write the files, only when changed so that unchanged
+        # files keep their modification time
+        fnames = set()
         for fname, fobject in ExtraFiles:
             fpath = os.path.join(extrafilespath, fname)
-            open(fpath, "wb").write(fobject.read())
+            fnames.add(fname)
+            data = fobject.read()
+            if os.path.isfile(fpath) and os.path.getsize(fpath) == len(data):
+                with open(fpath, "rb") as f:
+                    if f.read() == data:
+                        continue
+            open(fpath, "wb").write(data)
         # Now we can forget ExtraFiles (will close files object)
         del ExtraFiles
+        # Remove files left by previous builds
+        for fname in os.listdir(extrafilespath):
+            if fname in fnames:
+                continue
+            fpath = os.path.join(extrafilespath, fname)
+            try:
+                if os.path.isdir(fpath):
+                    shutil.rmtree(fpath)
+                else:
+                    os.remove(fpath)
+            except OSError as e:
+                # Handle and log specific OS-related errors
+                self.logger.write_error(f"Failed to clean the project build folder: {e.filename}\n")
+                self.logger.write_error(f"{e.strerror} (Error Code: {e.errno})\n")
+                self.logger.write_error("Try to manually remove the build folder inside your project path if you have issues during compilation\n")
 
         # Header file for extensions
         open(os.path.join(buildpath, "beremiz.h"), "w").write(
@@ -1735,6 +1736,8 @@ class ProjectController(ConfigTreeNode, PLCControler):
                         [_("Connected to URI: %s") % self.BeremizRoot.getURI_location().strip(), _(status)]
                 for i,txt in enumerate(texts):
                     self.AppFrame.ConnectionStatusBar.SetStatusText(txt, i+1)
+                # debug sample rate is shown again once debug resumes
+                self.AppFrame.ConnectionStatusBar.SetStatusText('', 0)
         return updated
 
     def ShowPLCProgress(self, status="", progress=0):
@@ -1762,42 +1765,97 @@ class ProjectController(ConfigTreeNode, PLCControler):
             # self.IECdebug_datas.items()]
             if debug_status == PlcStatus.Started:
                 if len(Traces) > 0:
-                    for debug_tick, debug_buff in Traces:
-                        debug_vars = UnpackDebugBuffer(
-                            debug_buff, self.TracedIECTypes, self._buildType == 'simulator')
-                        if debug_vars is not None:
-                            for IECPath, values_buffer, value in zip(
-                                    self.TracedIECPath,
-                                    self.DebugValuesBuffers,
-                                    debug_vars):
-                                IECdebug_data = self.IECdebug_datas.get(
-                                    IECPath, None)
-                                if IECdebug_data is not None and value is not None:
-                                    forced = (IECdebug_data[2] == "Forced") \
-                                        and (value is not None) and \
-                                        (IECdebug_data[3] is not None)
-
-                                    if not IECdebug_data[4] and len(values_buffer) > 0:
-                                        values_buffer[-1] = (value, forced)
-                                    else:
-                                        values_buffer.append((value, forced))
-                            self.DebugTicks.append(debug_tick)
-                        else:
-                            # complain if trace is incomplete, but only once per debug session
-                            if self.LastComplainDebugToken != self.DebugToken :
-                                self.logger.write_warning(
-                                    _("Debug: target couldn't trace all requested variables.\n"))
-                                self.LastComplainDebugToken = self.DebugToken
-
-
+                    if self.DebugDeltaDecoder is not None:
+                        # rebuild complete traces from changes
+                        debug_ticks, debug_columns, rejected = \
+                            self.DebugDeltaDecoder.Decode(Traces)
+                    else:
+                        layout = GetDebugBufferLayout(
+                            self.TracedIECTypes, self._buildType == 'simulator')
+                        debug_ticks, debug_columns, rejected = layout.UnpackTraces(Traces)
+                    if debug_ticks:
+                        for IECPath, values_buffer, values in zip(
+                                self.TracedIECPath,
+                                self.DebugValuesBuffers,
+                                debug_columns):
+                            IECdebug_data = self.IECdebug_datas.get(
+                                IECPath, None)
+                            if IECdebug_data is not None:
+                                values_column, _forced = values_buffer
+                                values_buffer[1] = (IECdebug_data[2] == "Forced") \
+                                    and (IECdebug_data[3] is not None)
+
+                                if not IECdebug_data[4]:
+                                    values_column[:] = values[-1:]
+                                else:
+                                    values_column.extend(values)
+                        self.DebugTicks.extend(debug_ticks)
+                        self.DebugSampledTicks += len(debug_ticks)
+                    if rejected:
+                        # complain if trace is incomplete, but only once per debug session
+                        if self.LastComplainDebugToken != self.DebugToken :
+                            self.logger.write_warning(
+                                _("Debug: target couldn't trace all requested variables.\n"))
+                            self.LastComplainDebugToken = self.DebugToken
+                    self.UpdateDebugDroppedCycles()
+                    self.UpdateDebugSampleRate()
 
+        # one [values column, forced flag] per traced variable
         buffers, self.DebugValuesBuffers = (self.DebugValuesBuffers,
-                                            [list() for dummy in range(len(self.TracedIECPath))])
+                                            [[list(), False] for dummy in range(len(self.TracedIECPath))])
 
-        ticks, self.DebugTicks = self.DebugTicks, []
+        ticks, self.DebugTicks = np.array(self.DebugTicks, dtype=np.int64), []
 
         return debug_status, ticks, buffers
 
+    def UpdateDebugDroppedCycles(self):
+        """
+        Get count of PLC cycles that runtime couldn't trace
+        in current debug session, and complain once if any
+        """
+        now = time.time()
+        if now - self.LastDroppedCyclesCheck < DEBUG_STATS_CHECK_PERIOD:
+            return
+        self.LastDroppedCyclesCheck = now
+        if not self._connector.HasTraceDroppedCycles(self.DebugToken):
+            # older runtime, dropped cycles are unknown
+            self.DebugDroppedCycles = None
+            return
+        dropped = self._connector.GetTraceDroppedCycles(self.DebugToken)
+        if dropped is None:
+            return
+        self.DebugDroppedCycles = dropped
+        if dropped > 0 and self.LastDroppedComplainDebugToken != self.DebugToken:
+            self.logger.write_warning(
+                _("Debug: some PLC cycles couldn't be traced, debugger is too slow.\n"))
+            self.LastDroppedComplainDebugToken = self.DebugToken
+
+    def UpdateDebugSampleRate(self):
+        """
+        Get count of traces per second runtime recently
+        produced, and show it in status bar
+        """
+        now = time.time()
+        elapsed = now - self.LastSampleRateCheck
+        if elapsed < DEBUG_STATS_CHECK_PERIOD:
+            return
+        self.LastSampleRateCheck = now
+        sampled, self.DebugSampledTicks = self.DebugSampledTicks, 0
+        if self._connector.HasTraceSampleRate(self.DebugToken):
+            rate = self._connector.GetTraceSampleRate(self.DebugToken)
+        elif elapsed < 2 * DEBUG_STATS_CHECK_PERIOD:
+            # older runtime, count traces received since last check
+            rate = sampled / elapsed
+        else:
+            # first check, or traces weren't received for a while
+            rate = None
+        if rate is None:
+            return
+        self.DebugSampleRate = rate
+        if self.AppFrame is not None:
+            self.AppFrame.ConnectionStatusBar.SetStatusText(
+                _("Debug: %.1f samples/s") % rate, 0)
+
     RegisterDebugVariableErrorCodes = {
         # Connector only can return None
         None : _("Debug: connection problem.\n"),
@@ -1815,6 +1873,7 @@ class ProjectController(ConfigTreeNode, PLCControler):
         Idxs = []
         self.TracedIECPath = []
         self.TracedIECTypes = []
+        self.DebugDeltaDecoder = None
         if self._connector is not None and self.debug_status != PlcStatus.Broken:
             IECPathsToPop = []
             for IECPath, data_tuple in self.IECdebug_datas.items():
@@ -1825,8 +1884,8 @@ class ProjectController(ConfigTreeNode, PLCControler):
                     IECPathsToPop.append(IECPath)
                 elif IECPath != "__tick__":
                     # Convert
-                    Idx, IEC_Type = self._IECPathToIdx.get(
-                        IECPath, (None, None))
+                    Idx, IEC_Type = self._IECVariables.GetDebugIdxAndType(
+                        IECPath)
                     if Idx is not None:
                         if IEC_Type in DebugTypesSize:
                             Idxs.append((Idx, IEC_Type, fvalue, IECPath))
@@ -1844,9 +1903,20 @@ class ProjectController(ConfigTreeNode, PLCControler):
                 IdxsT = list(zip(*Idxs))
                 self.TracedIECPath = IdxsT[3]
                 self.TracedIECTypes = IdxsT[1]
-                res = self._connector.SetTraceVariablesList(list(zip(*IdxsT[0:3])))
+                # Tracing only changes is only supported by simulation runtime
+                changes_only = self.BeremizRoot.getDebug_Changes_Only() and \
+                    self._buildType == 'simulator'
+                if changes_only:
+                    # deadbands list enables delta mode, none is set
+                    res = self._connector.SetTraceVariablesList(
+                        list(zip(*IdxsT[0:3])), [None] * len(Idxs))
+                else:
+                    res = self._connector.SetTraceVariablesList(list(zip(*IdxsT[0:3])))
                 if res is not None and res > 0:
                     self.DebugToken = res
+                    if changes_only:
+                        self.DebugDeltaDecoder = DebugDeltaDecoder(
+                            self.TracedIECTypes, True)
                 else:
                     self.DebugToken = None
                     self.logger.write_warning(
@@ -1869,7 +1939,7 @@ class ProjectController(ConfigTreeNode, PLCControler):
             self.DebugUpdatePending = True
 
     def GetDebugIECVariableType(self, IECPath):
-        _Idx, IEC_Type = self._IECPathToIdx.get(IECPath, (None, None))
+        _Idx, IEC_Type = self._IECVariables.GetDebugIdxAndType(IECPath)
         return IEC_Type
 
     def SubscribeDebugIECVariable(self, IECPath, callableobj, buffer_list=False):
@@ -1878,7 +1948,7 @@ class ProjectController(ConfigTreeNode, PLCControler):
         to a WeakKeyDictionary linking
         weakly referenced callables
         """
-        if IECPath != "__tick__" and IECPath not in self._IECPathToIdx:
+        if IECPath != "__tick__" and IECPath not in self._IECVariables.IECPathToIdx:
             return None
 
         # If no entry exist, create a new one with a fresh WeakKeyDictionary
@@ -1960,6 +2030,44 @@ class ProjectController(ConfigTreeNode, PLCControler):
                     except RuntimeError:
                         pass
 
+    def CallDebugValuesConsumers(self, IECPath, ticks, values, forced):
+        """
+        Pass new values of a variable to its subscribed consumers.
+        Consumers of whole buffers implementing NewValuesColumns get
+        ticks, values and forced flags as columns, others get lists of
+        (value, forced) tuples in NewValues, built only if needed.
+        """
+        data_tuple = self.IECdebug_datas.get(IECPath, None)
+        if data_tuple is None:
+            return
+        WeakCallableDict = data_tuple[0]
+        forced_column = rows = None
+        for weakcallable, buffer_list in WeakCallableDict.items():
+            # FIXME: apparently, despite of weak ref objects,
+            # some dead C/C++ wx object are still reachable from here
+            # leading to RuntimeError exception
+            try:
+                if not buffer_list:
+                    function = getattr(weakcallable, "NewValues", None)
+                    if function is not None:
+                        function(ticks[-1], (values[-1], forced))
+                    continue
+
+                function = getattr(weakcallable, "NewValuesColumns", None)
+                if function is not None:
+                    if forced_column is None:
+                        forced_column = np.full(len(values), forced, dtype=bool)
+                    function(ticks, values, forced_column)
+                    continue
+
+                function = getattr(weakcallable, "NewValues", None)
+                if function is not None:
+                    if rows is None:
+                        rows = [(value, forced) for value in values]
+                    function(ticks, rows)
+            except RuntimeError:
+                pass
+
     def GetTicktime(self):
         return self._Ticktime
 
@@ -1978,10 +2086,10 @@ class ProjectController(ConfigTreeNode, PLCControler):
                 _("Debug: token rejected - other debug took over - reconnect to recover\n"))
             return
 
-        for IECPath, values in zip(self.TracedIECPath, buffers):
+        for IECPath, (values, forced) in zip(self.TracedIECPath, buffers):
             if len(values) > 0:
-                self.CallWeakcallables(
-                    IECPath, "NewValues", debug_ticks, values)
+                self.CallDebugValuesConsumers(
+                    IECPath, debug_ticks, values, forced)
         if len(debug_ticks) > 0:
             self.CallWeakcallables(
                 "__tick__", "NewDataAvailable", debug_ticks)
@@ -2208,31 +2316,38 @@ class ProjectController(ConfigTreeNode, PLCControler):
         # purge any non-finished transfer
         # note: this would abord any runing transfer with error
         self._connector.PurgeBlobs()
+        self._connector.ResetTransferStats()
 
         try:
-            # transfer extra files
-            extrafiles = []
+            # extra files
+            names = []
+            files = []
             for extrafilespath in [self._getExtraFilesPath(),
                                    self._getProjectFilesPath()]:
 
                 for name in os.listdir(extrafilespath):
-                    extrafiles.append((
-                        name,
-                        self._connector.BlobFromFile(
-                            # use file name as a seed to avoid collisions
-                            # with files having same content
-                            os.path.join(extrafilespath, name), name)))
-
-            # Send PLC on target
-            object_path = builder.GetBinaryPath()
-            # arbitrarily use MD5 as a seed, could be any string
-            object_blob = self._connector.BlobFromFile(object_path, MD5)
+                    names.append(name)
+                    # use file name as a seed to avoid collisions
+                    # with files having same content
+                    files.append((os.path.join(extrafilespath, name), name))
+
+            # PLC, arbitrarily use MD5 as a seed, could be any string
+            files.append((builder.GetBinaryPath(), MD5))
+
+            # Send files target doesn't already have
+            blobs = self._connector.BlobsFromFiles(files)
+            extrafiles = list(zip(names, blobs[:-1]))
+            object_blob = blobs[-1]
         except IOError as e:
             self.HidePLCProgress()
             self.logger.write_error(repr(e))
         else:
             self.HidePLCProgress()
             self.logger.write(_("PLC data transfered successfully.\n"))
+            self.logger.write(
+                _("Sent {a1} kB for {a2} kB of files.\n").format(
+                    a1=self._connector.sentbytes >> 10,
+                    a2=self._connector.blobbytes >> 10))
 
             if self._connector.NewPLC(MD5, object_blob, extrafiles):
                 if self.GetIECProgramsAndVariables():
@@ -85,6 +85,110 @@ class BuildCacheOption(Enum):
             return self.value != other.value
         return NotImplemented
 
+# Results of environment probing are trusted at most this long, in seconds,
+# even if none of the files they depend on changed
+ENV_CACHE_TTL = 24 * 60 * 60
+
+def get_arduino_directories() -> Tuple[str, str, str]:
+    """
+    Get arduino-cli data directory, user directory and config file, as
+    arduino-cli defaults them, without running it.
+    
+    Returns:
+        Tuple[str, str, str]: (data directory, user directory, config file)
+    """
+    home = os.path.expanduser('~')
+    if os_platform.system() == 'Windows':
+        data_dir = os.path.join(os.environ.get('LOCALAPPDATA', home), 'Arduino15')
+        user_dir = os.path.join(home, 'Documents', 'Arduino')
+    elif os_platform.system() == 'Darwin':
+        data_dir = os.path.join(home, 'Library', 'Arduino15')
+        user_dir = os.path.join(home, 'Documents', 'Arduino')
+    else:
+        data_dir = os.path.join(home, '.arduino15')
+        user_dir = os.path.join(home, 'Arduino')
+    data_dir = os.environ.get('ARDUINO_DIRECTORIES_DATA', data_dir)
+    user_dir = os.environ.get('ARDUINO_DIRECTORIES_USER', user_dir)
+    config_file = os.environ.get('ARDUINO_CONFIG_FILE',
+                                 os.path.join(data_dir, 'arduino-cli.yaml'))
+    return data_dir, user_dir, config_file
+
+def get_environment_key() -> List:
+    """
+    Get modification stamps of arduino-cli and iec2c binaries, arduino-cli
+    config file, core and library indexes and installation directories.
+    Environment probing results are only valid while this key is unchanged.
+    
+    Returns:
+        List: [size, mtime] of each file, None for missing files
+    """
+    data_dir, user_dir, config_file = get_arduino_directories()
+    paths = [
+        _cli_command[0] if _cli_command else '',
+        _iec_transpiler,
+        config_file,
+        os.path.join(data_dir, 'package_index.json'),
+        os.path.join(data_dir, 'library_index.json'),
+        os.path.join(data_dir, 'packages'),
+        os.path.join(user_dir, 'libraries')
+    ]
+    key = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+            key.append([st.st_size, st.st_mtime_ns])
+        except OSError:
+            key.append(None)
+    return key
+
+class EnvironmentCache:
+    """
+    Persistent cache of arduino-cli environment probing results: tools
+    versions, installed cores, board manager URLs and libraries.
+    
+    Cache is dropped when environment key changes, when it is older than
+    ENV_CACHE_TTL, or explicitly when a build option asks for upgrades or
+    cleaning.
+    """
+    def __init__(self, path: str):
+        self.path = path
+        self.created = None
+        self.entries = {}
+
+    def load(self):
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+            if (data.get('key') == get_environment_key() and
+                    time.time() - data.get('created', 0) < ENV_CACHE_TTL):
+                self.created = data['created']
+                self.entries = data.get('entries', {})
+        except (OSError, ValueError, TypeError):
+            pass
+
+    def get(self, name: str, default=None):
+        return self.entries.get(name, default)
+
+    def set(self, name: str, value):
+        if self.created is None:
+            self.created = time.time()
+        self.entries[name] = value
+        try:
+            with open(self.path, 'w') as f:
+                # key taken now, after probing and installations
+                json.dump({
+                    'key': get_environment_key(),
+                    'created': self.created,
+                    'entries': self.entries}, f)
+        except OSError:
+            pass
+
+    def invalidate(self):
+        self.created = None
+        self.entries = {}
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
 def append_compiler_log(send_text, output):
     log_file_path = os.path.join(_arduino_src_path, 'build.log')
     try:
@@ -642,6 +746,14 @@ def build(st_file, definitions, arduino_sketch, port, send_text, board_hal, buil
     source_file = board_hal['source']
     required_libs = OPLC_DEPS   # in the future this might take project libraries, board specific libraries and extension specific libraries too
 
+    # Environment probing results of previous builds
+    env_cache = EnvironmentCache(os.path.join(_arduino_src_path, 'env_cache.json'))
+    if build_option > BuildCacheOption.USE_CACHE:
+        # upgrades or cleaning are requested, probe everything again
+        env_cache.invalidate()
+    else:
+        env_cache.load()
+
     def setup_environment() -> bool:
         # Clear build log
         open(os.path.join(_arduino_src_path, 'build.log'), 'w').close()
@@ -666,18 +778,30 @@ def build(st_file, definitions, arduino_sketch, port, send_text, board_hal, buil
             append_compiler_log(send_text, _("Error: arduino-cli not found!") + '\n')
             return False
         
-        runCommandToWin(send_text, [_iec_transpiler, '-v'])
-        runCommandToWin(send_text, _cli_command + ['version'])
+        versions = env_cache.get('versions')
+        if versions is None:
+            versions = ''
+            for cmd in [[_iec_transpiler, '-v'], _cli_command + ['version']]:
+                versions += '$ ' + ' '.join(cmd) + '\n' + runCommand(cmd)
+            env_cache.set('versions', versions)
+        append_compiler_log(send_text, versions)
         
         return True
 
     def handle_board_installation() -> bool:
         append_compiler_log(send_text, 'Checking Core and Board installation...\n')
         core = board_hal['core']
+        board_manager_url = board_hal.get('board_manager_url', None)
+
+        # core and board manager URL found installed by a previous build
+        board_key = f'board:{core}:{board_manager_url or ""}'
+        if env_cache.get(board_key):
+            append_compiler_log(send_text, _("Core {core_name} is installed").format(core_name=core) + '\n\n')
+            return True
+
         core_status, message = check_core_status(core, (build_option > BuildCacheOption.USE_CACHE))
         append_compiler_log(send_text, f'{message}\n')
         
-        board_manager_url = board_hal.get('board_manager_url', None)
         if board_manager_url:
             board_installed = is_board_url_configured(board_manager_url)
         else:
@@ -719,6 +843,9 @@ def build(st_file, definitions, arduino_sketch, port, send_text, board_hal, buil
             
             board_hal['last_update'] = time.time()
             board_hal['version'] = get_core_version(core)
+
+        elif core_status == 0:
+            env_cache.set(board_key, True)
                 
         append_compiler_log(send_text, f'\n')
         return True
@@ -738,9 +865,13 @@ def build(st_file, definitions, arduino_sketch, port, send_text, board_hal, buil
         append_compiler_log(send_text, _("Checking required libraries...") + '\n')
         
         # Check which libraries need to be installed
-        missing_libs = are_libraries_installed(required_libs)
+        if env_cache.get('libraries') == sorted(required_libs):
+            missing_libs = []
+        else:
+            missing_libs = are_libraries_installed(required_libs)
         
         if not missing_libs:
+            env_cache.set('libraries', sorted(required_libs))
             append_compiler_log(send_text, _("All required libraries are already installed.") + '\n')
             return True
         
@@ -4,14 +4,171 @@
 # See COPYING file for copyrights details.
 
 
+import os
+import zlib
+import random
 import hashlib
+from bisect import bisect_left
+
+import numpy as np
+
+
+# Content defined chunking : a chunk ends where a gear hash of last bytes
+# has all CHUNK_CUT_MASK bits cleared, so that an insertion in a file only
+# changes chunks around it. Chunks are then ~12KiB on average.
+CHUNK_MIN_SIZE = 4 << 10
+CHUNK_MAX_SIZE = 64 << 10
+CHUNK_CUT_MASK = ((1 << 13) - 1) << 19
+_gear_random = random.Random(0x6265)
+CHUNK_GEAR = np.array([_gear_random.getrandbits(32) for _i in range(256)],
+                      dtype=np.uint32)
+# bytes taken into account by 32 bits gear hash
+CHUNK_WINDOW = 32
+
+
+def GearHashes(data):
+    """
+    Return array of gear hashes of CHUNK_WINDOW bytes ending at each
+    position of data, computed by doubling window size at each step
+    """
+    h = CHUNK_GEAR[np.frombuffer(data, dtype=np.uint8)]
+    width = 1
+    while width < CHUNK_WINDOW:
+        shifted = h[:-width] << np.uint32(width)
+        h[width:] += shifted
+        width <<= 1
+    return h
+
+
+def SplitChunks(data):
+    """
+    Return list of (start, end) of content defined chunks of data
+    """
+    bounds = []
+    size = len(data)
+    # candidate cut points, ending chunk after byte at this position
+    cuts = np.flatnonzero(
+        (GearHashes(data) & np.uint32(CHUNK_CUT_MASK)) == 0).tolist()
+    start = 0
+    while start < size:
+        end = min(start + CHUNK_MAX_SIZE, size)
+        i = bisect_left(cuts, start + CHUNK_MIN_SIZE)
+        if i < len(cuts) and cuts[i] < end:
+            end = cuts[i] + 1
+        bounds.append((start, end))
+        start = end
+    return bounds
+
+
+# RPCs of runtimes able to rebuild files from chunks, first one being a
+# query taking a list
+CHUNK_STORE_RPCS = ("HasChunks", "StoreChunks", "BlobFromChunks")
+# RPCs of runtimes keeping installed files in a blob store
+BLOB_STORE_RPCS = ("HasBlobs", "BlobFromStore")
+# RPC of runtimes giving many log messages at once
+LOG_MESSAGES_RPCS = ("GetLogMessages",)
+# RPC of runtimes counting PLC cycles they couldn't trace
+TRACE_DROPPED_CYCLES_RPCS = ("GetTraceDroppedCycles",)
+# RPC of runtimes measuring their trace sample rate
+TRACE_SAMPLE_RATE_RPCS = ("GetTraceSampleRate",)
 
 
 class ConnectorBase(object):
 
     chuncksize = 1024*1024
 
-    def BlobFromFile(self, filepath, seed):
+    # file path -> ((size, mtime), [(hash, start, end), ...])
+    _filechunks = {}
+
+    # bytes of files transfered, and bytes actually sent
+    blobbytes = 0
+    sentbytes = 0
+
+    # whether runtime has chunk and blob stores, None until known
+    _chunkstore = None
+    _blobstore = None
+    _logmessages = None
+    _tracedroppedcycles = None
+    _tracesamplerate = None
+
+    def _GetFileChunks(self, filepath, stamp, data):
+        cached = self._filechunks.get(filepath)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        chunks = [(hashlib.sha256(data[start:end]).hexdigest(), start, end)
+                  for start, end in SplitChunks(data)]
+        self._filechunks[filepath] = (stamp, chunks)
+        return chunks
+
+    def ResetTransferStats(self):
+        self.blobbytes = 0
+        self.sentbytes = 0
+
+    def _HasRPCs(self, names, probe=([],)):
+        """
+        Tell if runtime exposes all given RPCs, as older runtimes don't.
+        When connector can't tell, first RPC is called with probe arguments.
+        """
+        methods = self._GetRemoteMethods()
+        if methods is not None:
+            return all(name in methods for name in names)
+        # connector can't tell, runtime lacking RPC answers None
+        return getattr(self, names[0])(*probe) is not None
+
+    def _HasChunkStore(self):
+        if self._chunkstore is None:
+            self._chunkstore = self._HasRPCs(CHUNK_STORE_RPCS)
+        return self._chunkstore
+
+    def _HasBlobStore(self):
+        if self._blobstore is None:
+            self._blobstore = self._HasRPCs(BLOB_STORE_RPCS)
+        return self._blobstore
+
+    def _HasLogMessages(self):
+        if self._logmessages is None:
+            self._logmessages = self._HasRPCs(LOG_MESSAGES_RPCS, (0, 0, 0))
+        return self._logmessages
+
+    def HasTraceDroppedCycles(self, DebugToken):
+        """
+        Tell if runtime counts PLC cycles it couldn't trace. Current debug
+        token is given for runtime to be probed when connector can't tell.
+        """
+        if self._tracedroppedcycles is None:
+            self._tracedroppedcycles = self._HasRPCs(
+                TRACE_DROPPED_CYCLES_RPCS, (DebugToken,))
+        return self._tracedroppedcycles
+
+    def HasTraceSampleRate(self, DebugToken):
+        """
+        Tell if runtime measures its trace sample rate, probing it with
+        current debug token when connector can't tell
+        """
+        if self._tracesamplerate is None:
+            self._tracesamplerate = self._HasRPCs(
+                TRACE_SAMPLE_RATE_RPCS, (DebugToken,))
+        return self._tracesamplerate
+
+    def FetchLogMessages(self, level, from_msgid, count):
+        """
+        Return list of (msgid, msg, tick, tv_sec, tv_nsec) of log messages
+        of given level, from from_msgid to from_msgid + count - 1, oldest
+        first. Older runtimes are asked one message at a time.
+        """
+        if self._HasLogMessages():
+            return self.GetLogMessages(level, from_msgid, count)
+        records = []
+        for msgid in range(from_msgid, from_msgid + count):
+            answer = self.GetLogMessage(level, msgid)
+            if answer is not None:
+                records.append((msgid,) + tuple(answer))
+        return records
+
+    def _StreamBlobFromFile(self, filepath, seed):
+        """
+        Transfer whole file to runtime, in chuncksize parts
+        """
         s = hashlib.new('md5')
         s.update(seed.encode())
         blobID = self.SeedBlob(seed)
@@ -22,4 +179,99 @@ class ConnectorBase(object):
                     return blobID
                 blobID = self.AppendChunkToBlob(chunk, blobID)
                 s.update(chunk)
+                self.blobbytes += len(chunk)
+                self.sentbytes += len(chunk)
         raise IOError("Data corrupted during transfer or connection lost")
+
+    def BlobFromFile(self, filepath, seed):
+        """
+        Transfer file to runtime, only sending chunks it doesn't already
+        have, and return ID of blob made of these chunks
+        """
+        if not self._HasChunkStore():
+            return self._StreamBlobFromFile(filepath, seed)
+
+        # stat before reading, so that a change while reading isn't missed
+        st = os.stat(filepath)
+        with open(filepath, "rb") as f:
+            data = f.read()
+        chunks = self._GetFileChunks(
+            filepath, (st.st_size, st.st_mtime_ns), data)
+        hashes = [chunkhash for chunkhash, _start, _end in chunks]
+
+        known = self.HasChunks(list(set(hashes)))
+        if known is None:
+            raise IOError("Connection lost")
+        known = set(known)
+
+        batch = []
+        batchsize = 0
+        for chunkhash, start, end in chunks:
+            if chunkhash in known:
+                continue
+            known.add(chunkhash)
+            chunk = data[start:end]
+            codec = ""
+            packed = zlib.compress(chunk)
+            if len(packed) < len(chunk):
+                chunk, codec = packed, "zlib"
+            batch.append((chunkhash, codec, chunk))
+            batchsize += len(chunk)
+            if batchsize >= self.chuncksize:
+                if not self.StoreChunks(batch):
+                    raise IOError("Data corrupted during transfer or connection lost")
+                self.sentbytes += batchsize
+                batch = []
+                batchsize = 0
+        if batch:
+            if not self.StoreChunks(batch):
+                raise IOError("Data corrupted during transfer or connection lost")
+            self.sentbytes += batchsize
+
+        s = hashlib.new('md5')
+        s.update(seed.encode())
+        s.update(data)
+        blobID = self.BlobFromChunks(seed, hashes)
+        if blobID != s.digest():
+            raise IOError("Data corrupted during transfer or connection lost")
+        self.blobbytes += len(data)
+        return blobID
+
+    def _BlobFromStore(self, filepath, seed, filehash):
+        s = hashlib.new('md5')
+        s.update(seed.encode())
+        with open(filepath, "rb") as f:
+            data = f.read()
+        s.update(data)
+        blobID = self.BlobFromStore(seed, filehash)
+        if blobID is None:
+            # stored file went missing or was modified on target
+            return self.BlobFromFile(filepath, seed)
+        if blobID != s.digest():
+            raise IOError("Data corrupted during transfer or connection lost")
+        self.blobbytes += len(data)
+        return blobID
+
+    def BlobsFromFiles(self, files):
+        """
+        Transfer list of (filepath, seed) files to runtime, skipping files
+        it already has in its blob store, and return list of their blob IDs
+        """
+        if not self._HasBlobStore():
+            return [self.BlobFromFile(filepath, seed)
+                    for filepath, seed in files]
+
+        hashes = []
+        for filepath, _seed in files:
+            with open(filepath, "rb") as f:
+                hashes.append(hashlib.sha256(f.read()).hexdigest())
+
+        known = self.HasBlobs(list(set(hashes)))
+        if known is None:
+            raise IOError("Connection lost")
+        known = set(known)
+
+        return [self._BlobFromStore(filepath, seed, filehash)
+                if filehash in known else
+                self.BlobFromFile(filepath, seed)
+                for (filepath, seed), filehash in zip(files, hashes)]
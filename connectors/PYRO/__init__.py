@@ -116,4 +116,8 @@ def PYRO_connector_factory(uri, confnodesroot):
                 self.__dict__[attrName] = member
             return member
 
+        def _GetRemoteMethods(self):
+            # known since proxy was bound, when checking connection
+            return RemotePLCObjectProxy._pyroMethods or None
+
     return PyroProxyProxy
@@ -151,6 +151,10 @@ def _WAMP_connector_factory(cls, uri, confnodesroot):
                 self.__dict__[attrName] = member
             return member
 
+        def _GetRemoteMethods(self):
+            # registered procedures can't be listed
+            return None
+
     # TODO : GetPLCID()
     # TODO : PSK.UpdateID()
 
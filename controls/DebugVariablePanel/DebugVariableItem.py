@@ -235,60 +235,76 @@ class DebugVariableItem(DebugDataConsumer):
     def NewValues(self, ticks, values):
         """
         Function called by debug thread when a new debug value is available
-        @param tick: PLC tick when value was captured
-        @param value: Value captured
-        @param forced: Forced flag, True if value is forced (default: False)
+        @param ticks: PLC ticks when values were captured
+        @param values: Values captured with forced flag [(value, forced),...]
         """
-        DebugDataConsumer.NewValues(self, ticks[-1], values[-1], raw=None)
+        values, forced = zip(*values)
+        self.NewValuesColumns(ticks, values, forced)
+
+    def NewValuesColumns(self, ticks, values, forced):
+        """
+        Function called by debug thread when new debug values are available,
+        given as columns
+        @param ticks: PLC ticks when values were captured
+        @param values: Values captured, one per tick
+        @param forced: Forced flags, one per tick
+        """
+        DebugDataConsumer.NewValues(
+            self, ticks[-1], (values[-1], bool(forced[-1])), raw=None)
 
         if self.Data is not None:
+            # Only keep values with a matching tick
+            count = min(len(ticks), len(values))
+            ticks = ticks[-count:]
+            values = values[-count:]
+            forced_values = np.asarray(forced[-count:], dtype=float)
 
+            if self.VariableType in ["STRING", "WSTRING"]:
+                # String data value is CRC
+                num_values = np.fromiter(
+                    (binascii.crc32(value) & STRING_CRC_MASK
+                     for value in values), dtype=float, count=count)
+            elif self.VariableType in ["TIME", "TOD", "DT", "DATE"]:
+                # Numeric value of time type variables
+                # is represented in seconds
+                num_values = np.fromiter(
+                    (value.total_seconds() for value in values),
+                    dtype=float, count=count)
+            else:
+                num_values = np.asarray(values, dtype=float)
+
+            # Update variable range values
+            min_value = float(num_values.min())
+            max_value = float(num_values.max())
+            self.MinValue = (min(self.MinValue, min_value)
+                             if self.MinValue is not None
+                             else min_value)
+            self.MaxValue = (max(self.MaxValue, max_value)
+                             if self.MaxValue is not None
+                             else max_value)
+
+            data_values = np.empty((count, 3))
+            data_values[:, 0] = ticks
+            data_values[:, 1] = num_values
+
+            # In the case of string variables, we store raw string value and
+            # forced flag in raw data table. Only changes in this two values
+            # are stored. Index to the corresponding raw value is stored in
+            # data third column
             if self.VariableType in ["STRING", "WSTRING"]:
                 last_raw_data = (self.RawData[-1]
                                  if len(self.RawData) > 0 else None)
                 last_raw_data_idx = len(self.RawData) - 1
-
-            data_values = []
-            for tick, (value, forced) in zip(ticks, values):
-                # Translate forced flag to float for storing in Data table
-                forced_value = float(forced)
-
-                if self.VariableType in ["STRING", "WSTRING"]:
-                    # String data value is CRC
-                    num_value = (binascii.crc32(value) & STRING_CRC_MASK)
-                elif self.VariableType in ["TIME", "TOD", "DT", "DATE"]:
-                    # Numeric value of time type variables
-                    # is represented in seconds
-                    num_value = float(value.total_seconds())
-                else:
-                    num_value = float(value)
-
-                # Update variable range values
-                self.MinValue = (min(self.MinValue, num_value)
-                                 if self.MinValue is not None
-                                 else num_value)
-                self.MaxValue = (max(self.MaxValue, num_value)
-                                 if self.MaxValue is not None
-                                 else num_value)
-
-                # In the case of string variables, we store raw string value and
-                # forced flag in raw data table. Only changes in this two values
-                # are stored. Index to the corresponding raw value is stored in
-                # data third column
-                if self.VariableType in ["STRING", "WSTRING"]:
-                    raw_data = (value, forced_value)
+                for idx, raw_data in enumerate(zip(values, forced_values.tolist())):
                     if len(self.RawData) == 0 or last_raw_data != raw_data:
                         last_raw_data_idx += 1
                         last_raw_data = raw_data
                         self.RawData.append(raw_data)
-                    extra_value = last_raw_data_idx
-
-                # In other case, data third column is forced flag
-                else:
-                    extra_value = forced_value
+                    data_values[idx, 2] = last_raw_data_idx
 
-                data_values.append(
-                    [float(tick), num_value, extra_value])
+            # In other case, data third column is forced flag
+            else:
+                data_values[:, 2] = forced_values
 
             # Add New data to stored data table
             self.Data.append(data_values)
@@ -274,6 +274,217 @@ class LogMessage(object):
         return MESSAGE_INFO_SIZE
 
 
+# Max count of messages kept by LogViewer, oldest ones are evicted beyond
+LOG_MESSAGES_MAX_COUNT = 100000
+LOG_MESSAGES_CHUNK_SIZE = 1024
+# Count of older messages fetched from source in a single request
+LOG_MESSAGES_FETCH_COUNT = 64
+
+
+class LogMessagesIndex(object):
+    """
+    Log messages sorted by timestamp, stored in chunks so that appending
+    or inserting a message only moves one chunk. Per chunk numpy arrays of
+    timestamps and of flags of messages matching current filter make
+    search by timestamp and walk through filtered messages O(log n).
+    Oldest messages are evicted once there are more than max_count.
+    """
+
+    def __init__(self, max_count=LOG_MESSAGES_MAX_COUNT,
+                 chunk_size=LOG_MESSAGES_CHUNK_SIZE):
+        self.MaxCount = max_count
+        self.ChunkSize = chunk_size
+        self.Levels = None
+        self.SearchValue = ""
+        self.Chunks = []
+        self.Timestamps = []
+        self.Matches = []
+        self.MatchCounts = []
+        self.Count = 0
+        self._Rebuild()
+
+    def __len__(self):
+        return self.Count
+
+    def __getitem__(self, msgidx):
+        chunk, offset = self._Locate(msgidx)
+        return self.Chunks[chunk][offset]
+
+    def _Rebuild(self):
+        """
+        Compute first index and first timestamp of each chunk
+        """
+        sizes = [len(messages) for messages in self.Chunks]
+        self.Starts = numpy.cumsum([0] + sizes)[:-1]
+        self.FirstTimestamps = numpy.array(
+            [timestamps[0] if size else numpy.inf
+             for timestamps, size in zip(self.Timestamps, sizes)])
+
+    def _Locate(self, msgidx):
+        chunk = int(self.Starts.searchsorted(msgidx, "right")) - 1
+        return chunk, msgidx - int(self.Starts[chunk])
+
+    def _Search(self, timestamp, side):
+        """
+        Return chunk and offset where message with given timestamp goes
+        """
+        chunk = max(int(self.FirstTimestamps.searchsorted(timestamp, side)) - 1, 0)
+        size = len(self.Chunks[chunk])
+        return chunk, int(self.Timestamps[chunk][:size].searchsorted(timestamp, side))
+
+    def _Match(self, message):
+        return ((self.Levels is None or message.Level in self.Levels) and
+                message.Message.find(self.SearchValue) != -1)
+
+    def _NewChunk(self, position):
+        # chunks grow up to twice chunk size with insertions before being split
+        self.Chunks.insert(position, [])
+        self.Timestamps.insert(position, numpy.empty(2 * self.ChunkSize))
+        self.Matches.insert(position, numpy.zeros(2 * self.ChunkSize, dtype=bool))
+        self.MatchCounts.insert(position, 0)
+
+    def _Split(self, chunk):
+        messages = self.Chunks[chunk]
+        half = len(messages) // 2
+        self._NewChunk(chunk + 1)
+        self.Chunks[chunk + 1].extend(messages[half:])
+        del messages[half:]
+        size = len(self.Chunks[chunk + 1])
+        self.Timestamps[chunk + 1][:size] = self.Timestamps[chunk][half:half + size]
+        self.Matches[chunk + 1][:size] = self.Matches[chunk][half:half + size]
+        self.MatchCounts[chunk + 1] = int(self.Matches[chunk + 1][:size].sum())
+        self.MatchCounts[chunk] -= self.MatchCounts[chunk + 1]
+        self._Rebuild()
+
+    def Append(self, message):
+        """
+        Add a message, usually newer than all others.
+        Return its index
+        """
+        if self.Count > 0:
+            last = self.Timestamps[-1][len(self.Chunks[-1]) - 1]
+            if message.Timestamp < last:
+                return self.Insert(message, "right")
+        if len(self.Chunks) == 0 or len(self.Chunks[-1]) >= self.ChunkSize:
+            self._NewChunk(len(self.Chunks))
+            self._Rebuild()
+        chunk = len(self.Chunks) - 1
+        offset = len(self.Chunks[chunk])
+        match = self._Match(message)
+        self.Chunks[chunk].append(message)
+        self.Timestamps[chunk][offset] = message.Timestamp
+        self.Matches[chunk][offset] = match
+        self.MatchCounts[chunk] += match
+        if offset == 0:
+            self.FirstTimestamps[chunk] = message.Timestamp
+        self.Count += 1
+        return self.Count - 1
+
+    def Insert(self, message, side="left"):
+        """
+        Insert a message before (side="left") or after (side="right")
+        messages with same timestamp. Return its index
+        """
+        if self.Count == 0:
+            return self.Append(message)
+        chunk, offset = self._Search(message.Timestamp, side)
+        size = len(self.Chunks[chunk])
+        match = self._Match(message)
+        self.Chunks[chunk].insert(offset, message)
+        timestamps = self.Timestamps[chunk]
+        timestamps[offset + 1:size + 1] = timestamps[offset:size]
+        timestamps[offset] = message.Timestamp
+        matches = self.Matches[chunk]
+        matches[offset + 1:size + 1] = matches[offset:size]
+        matches[offset] = match
+        self.MatchCounts[chunk] += match
+        self.Starts[chunk + 1:] += 1
+        if offset == 0:
+            self.FirstTimestamps[chunk] = message.Timestamp
+        self.Count += 1
+        msgidx = int(self.Starts[chunk]) + offset
+        if size + 1 == len(timestamps):
+            self._Split(chunk)
+        return msgidx
+
+    def Evict(self):
+        """
+        Remove oldest chunks while more than max count messages remain.
+        Return count of removed messages
+        """
+        evicted = 0
+        while len(self.Chunks) > 1 and \
+                self.Count - len(self.Chunks[0]) >= self.MaxCount:
+            size = len(self.Chunks.pop(0))
+            self.Timestamps.pop(0)
+            self.Matches.pop(0)
+            self.MatchCounts.pop(0)
+            self.Count -= size
+            evicted += size
+        if evicted:
+            self._Rebuild()
+        return evicted
+
+    def IsFull(self):
+        return self.Count >= self.MaxCount
+
+    def SetFilter(self, levels, search_value):
+        """
+        Flag messages matching levels and search value, when they change
+        """
+        if levels == self.Levels and search_value == self.SearchValue:
+            return
+        self.Levels = list(levels)
+        self.SearchValue = search_value
+        for chunk, messages in enumerate(self.Chunks):
+            matches = self.Matches[chunk]
+            matches[:len(messages)] = [self._Match(message) for message in messages]
+            self.MatchCounts[chunk] = int(matches[:len(messages)].sum())
+
+    def GetNearest(self, timestamp):
+        """
+        Return index of message which timestamp is the nearest
+        """
+        chunk, offset = self._Search(timestamp, "left")
+        msgidx = min(int(self.Starts[chunk]) + offset, self.Count - 1)
+        if msgidx > 0 and \
+           timestamp - self[msgidx - 1].Timestamp <= abs(self[msgidx].Timestamp - timestamp):
+            return msgidx - 1
+        return msgidx
+
+    def GetNextMatch(self, msgidx):
+        """
+        Return index of first message matching filter after given one
+        """
+        chunk, offset = self._Locate(msgidx)
+        offset += 1
+        while chunk < len(self.Chunks):
+            size = len(self.Chunks[chunk])
+            if self.MatchCounts[chunk] and offset < size:
+                matches = self.Matches[chunk][offset:size]
+                found = int(matches.argmax())
+                if matches[found]:
+                    return int(self.Starts[chunk]) + offset + found
+            chunk += 1
+            offset = 0
+        return None
+
+    def GetPreviousMatch(self, msgidx):
+        """
+        Return index of last message matching filter before given one
+        """
+        chunk, offset = self._Locate(msgidx)
+        while chunk >= 0:
+            if self.MatchCounts[chunk] and offset > 0:
+                matches = self.Matches[chunk][offset - 1::-1]
+                found = int(matches.argmax())
+                if matches[found]:
+                    return int(self.Starts[chunk]) + offset - 1 - found
+            chunk -= 1
+            offset = len(self.Chunks[chunk]) if chunk >= 0 else 0
+        return None
+
+
 SECOND = 1
 MINUTE = 60 * SECOND
 HOUR = 60 * MINUTE
@@ -360,14 +571,14 @@ class LogViewer(DebugViewer, wx.Panel):
             self.RightButtons.append(LogButton(label, callback))
 
         self.MessageFilter.SetSelection(0)
+        self.LevelFilters = [list(range(i)) for i in range(4, 0, -1)]
+        self.CurrentFilter = self.LevelFilters[0]
+        self.CurrentSearchValue = ""
         self.LogSource = None
         self.ResetLogMessages()
         self.ParentWindow = window
 
         self.LevelIcons = [GetBitmap("LOG_" + level) for level in LogLevels]
-        self.LevelFilters = [list(range(i)) for i in range(4, 0, -1)]
-        self.CurrentFilter = self.LevelFilters[0]
-        self.CurrentSearchValue = ""
 
         self.ScrollSpeed = 0.
         self.LastStartTime = None
@@ -382,8 +593,9 @@ class LogViewer(DebugViewer, wx.Panel):
     def ResetLogMessages(self):
         self.ResetLogCounters()
         self.OldestMessages = []
-        self.LogMessages = []
-        self.LogMessagesTimestamp = numpy.array([])
+        self.PrefetchedMessages = {}
+        self.LogMessages = LogMessagesIndex()
+        self.LogMessages.SetFilter(self.CurrentFilter, self.CurrentSearchValue)
         self.CurrentMessage = None
         self.HasNewData = False
 
@@ -394,12 +606,34 @@ class LogViewer(DebugViewer, wx.Panel):
             self.ResetLogMessages()
             wx.CallAfter(self.RefreshView)
 
-    def GetLogMessageFromSource(self, msgidx, level):
-        if self.LogSource is not None:
-            answer = self.LogSource.GetLogMessage(level, msgidx)
+    def GetLogMessagesFromSource(self, from_msgidx, count, level):
+        """
+        Get log messages from_msgidx to from_msgidx + count - 1 in a
+        single request. Return list of (msgidx, message), oldest first
+        """
+        messages = []
+        if self.LogSource is not None and count > 0:
+            answer = self.LogSource.FetchLogMessages(level, from_msgidx, count)
             if answer is not None:
-                msg, _tick, tv_sec, tv_nsec = answer
-                return LogMessage(tv_sec, tv_nsec, level, self.LevelIcons[level], msg)
+                for msgidx, msg, _tick, tv_sec, tv_nsec in answer:
+                    messages.append((msgidx, LogMessage(
+                        tv_sec, tv_nsec, level, self.LevelIcons[level], msg)))
+        return messages
+
+    def GetOlderMessageFromSource(self, msgidx, level):
+        """
+        Get log message msgidx, while walking back through older messages.
+        Messages before it are fetched in the same request and kept until
+        asked for
+        """
+        prefetched = self.PrefetchedMessages.get(level)
+        if not prefetched or prefetched[-1][0] != msgidx:
+            from_msgidx = max(0, msgidx - LOG_MESSAGES_FETCH_COUNT + 1)
+            prefetched = self.GetLogMessagesFromSource(
+                from_msgidx, msgidx - from_msgidx + 1, level)
+            self.PrefetchedMessages[level] = prefetched
+        if prefetched and prefetched[-1][0] == msgidx:
+            return prefetched.pop()[1]
         return None
 
     def ResetLogCounters(self):
@@ -414,20 +648,13 @@ class LogViewer(DebugViewer, wx.Panel):
                     oldest_message = (-1, None)
                 else:
                     dump_end = prev - 1
-                for msgidx in range(count-1, dump_end, -1):
-                    new_message = self.GetLogMessageFromSource(msgidx, level)
-                    if new_message is None:
-                        if prev is None:
-                            oldest_message = (-1, None)
-                        break
-                    if prev is None:
-                        oldest_message = (msgidx, new_message)
-                        if len(new_messages) == 0:
-                            new_messages = [new_message]
-                        else:
-                            new_messages.insert(0, new_message)
-                    else:
-                        new_messages.insert(0, new_message)
+                level_messages = self.GetLogMessagesFromSource(
+                    dump_end + 1, count - dump_end - 1, level)
+                if prev is None and level_messages and \
+                   len(level_messages) == count - dump_end - 1:
+                    # older messages may still be available
+                    oldest_message = level_messages[0]
+                new_messages.extend([message for _msgidx, message in level_messages])
                 if prev is None and len(self.OldestMessages) <= level:
                     self.OldestMessages.append(oldest_message)
                 self.previous_log_count[level] = count
@@ -439,8 +666,14 @@ class LogViewer(DebugViewer, wx.Panel):
             else:
                 current_is_last = True
             for new_message in new_messages:
-                self.LogMessages.append(new_message)
-                self.LogMessagesTimestamp = numpy.append(self.LogMessagesTimestamp, [new_message.Timestamp])
+                self.LogMessages.Append(new_message)
+            evicted = self.LogMessages.Evict()
+            if evicted:
+                # evicted messages must not be fetched again from source
+                self.OldestMessages = [(-1, None)] * len(self.OldestMessages)
+                self.PrefetchedMessages = {}
+                if self.CurrentMessage is not None:
+                    self.CurrentMessage = max(0, self.CurrentMessage - evicted)
             if current_is_last:
                 self.ScrollToLast(False)
                 self.ResetMessageToolTip()
@@ -455,7 +688,7 @@ class LogViewer(DebugViewer, wx.Panel):
 
     def GetMessageByTimestamp(self, timestamp):
         if self.CurrentMessage is not None:
-            msgidx = numpy.argmin(abs(self.LogMessagesTimestamp - timestamp))
+            msgidx = self.LogMessages.GetNearest(timestamp)
             message = self.LogMessages[msgidx]
             if self.FilterLogMessage(message) and message.Timestamp > timestamp:
                 return self.GetPreviousMessage(msgidx, timestamp)
@@ -463,21 +696,23 @@ class LogViewer(DebugViewer, wx.Panel):
         return None, None
 
     def GetNextMessage(self, msgidx):
-        while msgidx < len(self.LogMessages) - 1:
-            message = self.LogMessages[msgidx + 1]
-            if self.FilterLogMessage(message):
-                return message, msgidx + 1
-            msgidx += 1
+        if msgidx < len(self.LogMessages) - 1:
+            msgidx = self.LogMessages.GetNextMatch(msgidx)
+            if msgidx is not None:
+                return self.LogMessages[msgidx], msgidx
         return None, None
 
     def GetPreviousMessage(self, msgidx, timestamp=None):
         message = None
-        while 0 < msgidx < len(self.LogMessages):
-            message = self.LogMessages[msgidx - 1]
-            if self.FilterLogMessage(message, timestamp):
-                return message, msgidx - 1
-            msgidx -= 1
-        if len(self.LogMessages) > 0:
+        if 0 < msgidx < len(self.LogMessages):
+            msgidx = self.LogMessages.GetPreviousMatch(msgidx)
+            while msgidx is not None:
+                message = self.LogMessages[msgidx]
+                if timestamp is None or message.Timestamp < timestamp:
+                    return message, msgidx
+                msgidx = self.LogMessages.GetPreviousMatch(msgidx)
+        # older messages are only fetched from source while there is room
+        if len(self.LogMessages) > 0 and not self.LogMessages.IsFull():
             message = self.LogMessages[0]
             for _idx, msg in self.OldestMessages:
                 if msg is not None and msg > message:
@@ -486,7 +721,7 @@ class LogViewer(DebugViewer, wx.Panel):
                 level = message.Level
                 oldest_msgidx, _oldest_message = self.OldestMessages[level]
                 if oldest_msgidx > 0:
-                    message = self.GetLogMessageFromSource(oldest_msgidx - 1, level)
+                    message = self.GetOlderMessageFromSource(oldest_msgidx - 1, level)
                     if message is not None:
                         self.OldestMessages[level] = (oldest_msgidx - 1, message)
                     else:
@@ -495,20 +730,9 @@ class LogViewer(DebugViewer, wx.Panel):
                     message = None
                     self.OldestMessages[level] = (-1, None)
                 if message is not None:
-                    message_idx = 0
-                    while (message_idx < len(self.LogMessages) and
-                           self.LogMessages[message_idx] < message):
-                        message_idx += 1
-                    if len(self.LogMessages) > 0:
-                        current_message = self.LogMessages[self.CurrentMessage]
-                    else:
-                        current_message = message
-                    self.LogMessages.insert(message_idx, message)
-                    self.LogMessagesTimestamp = numpy.insert(
-                        self.LogMessagesTimestamp,
-                        [message_idx],
-                        [message.Timestamp])
-                    self.CurrentMessage = self.LogMessages.index(current_message)
+                    message_idx = self.LogMessages.Insert(message)
+                    if self.CurrentMessage is not None and message_idx <= self.CurrentMessage:
+                        self.CurrentMessage += 1
                     if message_idx == 0 and self.FilterLogMessage(message, timestamp):
                         return message, 0
                 for _idx, msg in self.OldestMessages:
@@ -622,6 +846,7 @@ class LogViewer(DebugViewer, wx.Panel):
                 self.RefreshView()
 
     def ResetMessagePanel(self):
+        self.LogMessages.SetFilter(self.CurrentFilter, self.CurrentSearchValue)
         if len(self.LogMessages) > 0:
             self.CurrentMessage = len(self.LogMessages) - 1
             message = self.LogMessages[self.CurrentMessage]
@@ -89,6 +89,7 @@ class OPCUAClient(object):
     """
 
     EditorType = OPCUAClientEditor
+    CTNGenerateConcurrently = True
 
     def __init__(self):
         self.modeldata = OPCUAClientModel(self.Log, self.CTNMarkModified)
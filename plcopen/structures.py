@@ -24,11 +24,17 @@
 
 
 
+import os
 import re
+import time
+import marshal
+import hashlib
 from collections import OrderedDict
 from functools import reduce
 
+import util.paths as paths
 from . plcopen import LoadProject
+from . import definitions
 from . definitions import *
 
 TypeHierarchy = dict(TypeHierarchy_list)
@@ -74,11 +80,39 @@ Inputs and outputs are a tuple of characteristics that are in order:
     - The default modifier which can be "none", "negated", "rising" or "falling"
 """
 
-StdBlckLibs = {libname: LoadProject(tc6fname)[0]
-               for libname, tc6fname in StdTC6Libs}
-StdBlckLst = [{"name": libname, "list":
-               [GetBlockInfos(pous) for pous in lib.getpous()]}
-              for libname, lib in StdBlckLibs.items()]
+
+class StdBlockLibraries(object):
+    """
+    Standard libraries projects by name, each one being loaded from its
+    XML file when first used
+    """
+    def __init__(self, libs):
+        self.Files = OrderedDict(libs)
+        self.Libs = {}
+
+    def __getitem__(self, libname):
+        lib = self.Libs.get(libname)
+        if lib is None:
+            lib = self.Libs[libname] = LoadProject(self.Files[libname])[0]
+        return lib
+
+    def __iter__(self):
+        return iter(self.Files)
+
+    def __len__(self):
+        return len(self.Files)
+
+    def keys(self):
+        return list(self.Files.keys())
+
+    def values(self):
+        return [self[libname] for libname in self.Files]
+
+    def items(self):
+        return [(libname, self[libname]) for libname in self.Files]
+
+
+StdBlckLibs = StdBlockLibraries(StdTC6Libs)
 
 # -------------------------------------------------------------------------------
 #                             Test identifier
@@ -272,21 +306,95 @@ def get_standard_funtions(table):
     return Standard_Functions_Decl
 
 
-StdBlckLst.extend(get_standard_funtions(csv_file_to_table(open(StdFuncsCSV))))
+# -------------------------------------------------------------------------------
+#                        Standard blocks list loading
+# -------------------------------------------------------------------------------
+
+# bump when blocks list generation changes, to ignore older cache files
+STD_BLOCKS_CACHE_VERSION = 1
+
+
+def GetStdBlocksCacheKey():
+    """
+    Return hash of all files standard blocks list is generated from
+    """
+    key = hashlib.md5(str(STD_BLOCKS_CACHE_VERSION).encode())
+    for libname, tc6fname in StdTC6Libs:
+        key.update(libname.encode())
+        with open(tc6fname, "rb") as f:
+            key.update(hashlib.md5(f.read()).digest())
+    for filename in [StdFuncsCSV, __file__, definitions.__file__]:
+        with open(filename, "rb") as f:
+            key.update(hashlib.md5(f.read()).digest())
+    return key.hexdigest()
+
+
+def GenerateStdBlocks():
+    """
+    Return standard blocks list, generated from libraries and functions table
+    """
+    blocks = [{"name": libname, "list":
+               [GetBlockInfos(pous) for pous in lib.getpous()]}
+              for libname, lib in StdBlckLibs.items()]
+    with open(StdFuncsCSV) as csvfile:
+        blocks.extend(get_standard_funtions(csv_file_to_table(csvfile)))
+
+    for section in blocks:
+        for desc in section["list"]:
+            words = desc["comment"].split('"')
+            if len(words) > 1:
+                desc["comment"] = words[1]
+            desc["usage"] = ("\n (%s) => (%s)" %
+                             (", ".join(["%s:%s" % (input[1], input[0])
+                                         for input in desc["inputs"]]),
+                              ", ".join(["%s:%s" % (output[1], output[0])
+                                         for output in desc["outputs"]])))
+    return blocks
+
+
+def LoadStdBlocks(cachefile):
+    """
+    Return standard blocks list and if it was loaded from cache file.
+    Cache file is used if none of the files blocks list is generated from
+    changed, libraries are then not loaded until they are used.
+    """
+    key = GetStdBlocksCacheKey()
+    try:
+        with open(cachefile, "rb") as f:
+            cachekey, blocks = marshal.load(f)
+        if cachekey == key:
+            return blocks, True
+    except (OSError, EOFError, ValueError, TypeError):
+        pass
+    blocks = GenerateStdBlocks()
+    try:
+        os.makedirs(os.path.dirname(cachefile), exist_ok=True)
+        with open(cachefile, "wb") as f:
+            marshal.dump((key, blocks), f)
+    except (OSError, ValueError):
+        pass
+    return blocks, False
+
+
+_start_time = time.time()
+StdBlckLst, StdBlckCached = LoadStdBlocks(
+    paths.UserCacheDir("stdblocks.cache"))
+StdBlckLoadTime = time.time() - _start_time
+
+
+def GetStdBlocksLoadReport():
+    if StdBlckCached:
+        message = _("Standard libraries blocks loaded from cache in %.3f s\n")
+    else:
+        message = _("Standard libraries blocks loaded in %.3f s\n")
+    return message % StdBlckLoadTime
+
 
 # Dictionary to speedup block type fetching by name
 StdBlckDct = OrderedDict()
 
 for section in StdBlckLst:
     for desc in section["list"]:
-        words = desc["comment"].split('"')
-        if len(words) > 1:
-            desc["comment"] = words[1]
-        desc["usage"] = ("\n (%s) => (%s)" %
-                         (", ".join(["%s:%s" % (input[1], input[0])
-                                     for input in desc["inputs"]]),
-                          ", ".join(["%s:%s" % (output[1], output[0])
-                                     for output in desc["outputs"]])))
         BlkLst = StdBlckDct.setdefault(desc["name"], [])
         BlkLst.append((section["name"], desc))
 
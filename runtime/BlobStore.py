@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz runtime.
+#
+# See COPYING.Runtime file for copyrights details.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Persistent store of files installed by NewPLC, keyed by their SHA-256.
+
+Transfered files are moved into store, and then hard-linked into working
+directory, so that IDE can skip files runtime already has, and installing
+them again doesn't rewrite them. Files are copied instead where hard links
+aren't supported.
+
+Least recently used files that aren't installed anymore are removed when
+store grows over max size.
+"""
+
+import os
+import re
+import shutil
+import hashlib
+
+BLOB_STORE_MAX_SIZE = 64 << 20
+
+BLOB_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+def FileSHA256(path):
+    sha = hashlib.sha256()
+    with open(path, "rb") as f:
+        for data in iter(lambda: f.read(1 << 20), b""):
+            sha.update(data)
+    return sha.hexdigest()
+
+
+class BlobStore(object):
+    def __init__(self, path, max_size=BLOB_STORE_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    def GetPath(self, filehash):
+        """
+        Return path of stored file with given hash, None if not in store
+        """
+        if BLOB_HASH_RE.match(filehash):
+            path = os.path.join(self.path, filehash)
+            if os.path.isfile(path):
+                return path
+        return None
+
+    def Has(self, hashes):
+        """
+        Return hashes of given list that are already in store
+        """
+        return [filehash for filehash in hashes
+                if self.GetPath(filehash) is not None]
+
+    def Add(self, path):
+        """
+        Move file into store and return its path in store
+        """
+        storepath = os.path.join(self.path, FileSHA256(path))
+        if os.path.exists(storepath):
+            os.remove(path)
+        else:
+            shutil.move(path, storepath)
+        return storepath
+
+    def Remove(self, storepath):
+        try:
+            os.remove(storepath)
+        except OSError:
+            pass
+
+    def Link(self, storepath, newpath):
+        """
+        Install stored file at newpath
+        """
+        if os.path.exists(newpath):
+            if os.path.samefile(storepath, newpath):
+                return
+            os.remove(newpath)
+        try:
+            os.link(storepath, newpath)
+        except OSError:
+            shutil.copyfile(storepath, newpath)
+        # most recently used
+        os.utime(storepath, None)
+
+    def Evict(self):
+        """
+        Remove least recently used files that aren't installed until store
+        size is under max size
+        """
+        blobs = []
+        total = 0
+        for name in os.listdir(self.path):
+            try:
+                st = os.stat(os.path.join(self.path, name))
+            except OSError:
+                continue
+            total += st.st_size
+            if st.st_nlink == 1:
+                blobs.append((st.st_mtime, st.st_size, name))
+        if total <= self.max_size:
+            return
+        blobs.sort()
+        for _mtime, size, name in blobs:
+            self.Remove(os.path.join(self.path, name))
+            total -= size
+            if total <= self.max_size:
+                break
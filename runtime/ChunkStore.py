@@ -0,0 +1,229 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz runtime.
+#
+# See COPYING.Runtime file for copyrights details.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Persistent store of chunks of transfered files, keyed by their SHA-256.
+
+IDE splits files it transfers into content defined chunks, asks which
+chunks runtime already has and only sends the missing ones. Files are then
+rebuilt from their list of chunk hashes. Chunks are kept between transfers
+so that next transfer of a slightly modified file only sends the changed
+chunks.
+
+Chunks of files that were rebuilt and then kept in another store are not
+duplicated : they are removed from store and read from these files instead,
+as listed in a map of each file. Such chunks are checked against their hash
+when read, since files may have been modified or removed since.
+
+Least recently used chunks are removed when store grows over max size.
+"""
+
+import os
+import re
+import zlib
+import json
+import hashlib
+
+CHUNK_STORE_MAX_SIZE = 64 << 20
+
+CHUNK_HASH_RE = re.compile(r"^[0-9a-f]{64}$")
+
+# codec names as sent by IDE, "" for uncompressed chunks
+CHUNK_CODECS = {
+    "": lambda data: data,
+    "zlib": zlib.decompress,
+}
+
+
+class ChunkStore(object):
+    def __init__(self, path, max_size=CHUNK_STORE_MAX_SIZE):
+        self.path = path
+        self.max_size = max_size
+        self.mapspath = os.path.join(path, "maps")
+        if not os.path.isdir(self.mapspath):
+            os.makedirs(self.mapspath)
+        # chunk hash -> (file path, offset, size) of chunks read from files
+        self.located = {}
+        self._LoadMaps()
+
+    def _ChunkPath(self, chunkhash):
+        return os.path.join(self.path, chunkhash)
+
+    def _MapPath(self, filepath):
+        return os.path.join(self.mapspath, os.path.basename(filepath) + ".json")
+
+    def _LoadMaps(self):
+        """
+        Index chunks listed in maps, dropping maps of files that are gone
+        """
+        self.located = {}
+        for name in os.listdir(self.mapspath):
+            mappath = os.path.join(self.mapspath, name)
+            try:
+                with open(mappath, "r") as f:
+                    filemap = json.load(f)
+                filepath = filemap["path"]
+                if not os.path.isfile(filepath):
+                    os.remove(mappath)
+                    continue
+                for chunkhash, offset, size in filemap["chunks"]:
+                    self.located[chunkhash] = (filepath, offset, size)
+            except (OSError, ValueError, KeyError, TypeError):
+                continue
+
+    def _ReadLocated(self, chunkhash):
+        """
+        Return content of chunk read from file, None if not found there
+        """
+        location = self.located.get(chunkhash)
+        if location is None:
+            return None
+        filepath, offset, size = location
+        try:
+            with open(filepath, "rb") as f:
+                f.seek(offset)
+                data = f.read(size)
+        except OSError:
+            data = None
+        if data is None or hashlib.sha256(data).hexdigest() != chunkhash:
+            # file was modified or removed
+            del self.located[chunkhash]
+            return None
+        return data
+
+    def _Read(self, chunkhash):
+        """
+        Return content of chunk, None if missing
+        """
+        if not CHUNK_HASH_RE.match(chunkhash):
+            return None
+        path = self._ChunkPath(chunkhash)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            # most recently used
+            os.utime(path, None)
+            return data
+        except OSError:
+            return self._ReadLocated(chunkhash)
+
+    def Has(self, hashes):
+        """
+        Return hashes of given list that are already in store
+        """
+        return [chunkhash for chunkhash in hashes
+                if CHUNK_HASH_RE.match(chunkhash) and
+                (os.path.isfile(self._ChunkPath(chunkhash)) or
+                 self._ReadLocated(chunkhash) is not None)]
+
+    def Store(self, chunks):
+        """
+        Store list of (hash, codec, data) chunks. Return False if a chunk
+        can't be decoded or doesn't match its hash.
+        """
+        for chunkhash, codec, data in chunks:
+            try:
+                data = CHUNK_CODECS[codec](data)
+            except (KeyError, zlib.error):
+                return False
+            if hashlib.sha256(data).hexdigest() != chunkhash:
+                return False
+            path = self._ChunkPath(chunkhash)
+            # rename once complete, chunk is not valid before
+            with open(path + ".tmp", "wb") as f:
+                f.write(data)
+            os.replace(path + ".tmp", path)
+        return True
+
+    def WriteTo(self, hashes, fd, md5sum):
+        """
+        Write chunks with given hashes in order to file descriptor and
+        update md5sum with their content. Return False if a chunk is missing.
+        """
+        for chunkhash in hashes:
+            data = self._Read(chunkhash)
+            if data is None:
+                return False
+            md5sum.update(data)
+            os.write(fd, data)
+        return True
+
+    def Locate(self, hashes, filepath):
+        """
+        Record that file at filepath is made of chunks with given hashes in
+        order, and remove these chunks from store, as they can be read from
+        that file instead.
+        """
+        chunks = []
+        offset = 0
+        for chunkhash in hashes:
+            try:
+                size = os.path.getsize(self._ChunkPath(chunkhash))
+            except OSError:
+                location = self.located.get(chunkhash)
+                if location is None:
+                    return
+                size = location[2]
+            chunks.append((chunkhash, offset, size))
+            offset += size
+        try:
+            # map written first, chunks must not be lost
+            mappath = self._MapPath(filepath)
+            with open(mappath + ".tmp", "w") as f:
+                json.dump({"path": filepath, "chunks": chunks}, f)
+            os.replace(mappath + ".tmp", mappath)
+        except OSError:
+            return
+        for chunkhash, offset, size in chunks:
+            self.located[chunkhash] = (filepath, offset, size)
+            try:
+                os.remove(self._ChunkPath(chunkhash))
+            except OSError:
+                pass
+
+    def Evict(self):
+        """
+        Remove least recently used chunks until store size is under max size,
+        and forget chunks of files that are gone
+        """
+        self._LoadMaps()
+        chunks = []
+        total = 0
+        for name in os.listdir(self.path):
+            if not CHUNK_HASH_RE.match(name):
+                continue
+            try:
+                st = os.stat(self._ChunkPath(name))
+            except OSError:
+                continue
+            chunks.append((st.st_mtime, st.st_size, name))
+            total += st.st_size
+        if total <= self.max_size:
+            return
+        chunks.sort()
+        for _mtime, size, name in chunks:
+            try:
+                os.remove(self._ChunkPath(name))
+            except OSError:
+                continue
+            total -= size
+            if total <= self.max_size:
+                break
@@ -0,0 +1,312 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz runtime.
+#
+# See COPYING.Runtime file for copyrights details.
+#
+# This library is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public
+# License as published by the Free Software Foundation; either
+# version 2.1 of the License, or (at your option) any later version.
+
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the GNU
+# Lesser General Public License for more details.
+
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301  USA
+
+"""
+Persistent journal of PLC log messages.
+
+Messages are appended to a directory of segment files. Each segment starts
+with JOURNAL_MAGIC and holds records made of a JOURNAL_RECORD_HEADER
+followed by message body. Once a segment reaches SEGMENT_MAX_SIZE a new one
+is started, and oldest segments are deleted beyond SEGMENTS_MAX_COUNT.
+
+Segments are scanned when journal is opened to build an in memory index of
+record timestamps, levels and offsets, that is then kept up to date when
+appending. Queries bisect this index and only read matching records, through
+a memory map of segment file when available.
+
+Records are indexed by their own timestamp, sorted per segment. Since system
+clock can go backwards, segments time ranges may overlap and are not assumed
+to be ordered.
+"""
+
+import os
+import re
+import mmap
+from array import array
+from bisect import bisect_left, bisect_right
+from threading import Lock
+import struct
+
+from runtime.loglevels import LogLevelsCount
+
+JOURNAL_MAGIC = b"BZLOGJ01"
+
+# tv_sec, tv_nsec, tick, level, message size
+JOURNAL_RECORD_HEADER = struct.Struct("<IIIB3xI")
+
+SEGMENT_MAX_SIZE = 4 << 20
+SEGMENTS_MAX_COUNT = 32
+
+SEGMENT_NAME_FORMAT = "%08d.journal"
+SEGMENT_NAME_RE = re.compile(r"^(\d{8})\.journal$")
+
+QUERY_DEFAULT_LIMIT = 1000
+
+
+class JournalSegment(object):
+    """
+    One append-only journal file and index of its records
+    """
+
+    def __init__(self, path, use_mmap):
+        self.path = path
+        self.use_mmap = use_mmap
+        # Index keys are record timestamps, kept sorted so that they can be
+        # bisected : a record older than its predecessor is inserted at its
+        # place, with its offset and level.
+        self.Keys = array('d')
+        self.Offsets = array('L')
+        self.Levels = array('B')
+        self.LevelCounts = [0] * LogLevelsCount
+        self.size = 0
+        self._map = None
+        self._map_size = 0
+
+    def Create(self):
+        with open(self.path, "wb") as f:
+            f.write(JOURNAL_MAGIC)
+        self.size = len(JOURNAL_MAGIC)
+
+    def Load(self):
+        """
+        Scan segment file to build index. Drop truncated record at the end
+        of file if any, as left by an interrupted write.
+        """
+        with open(self.path, "rb") as f:
+            data = f.read()
+        if not data.startswith(JOURNAL_MAGIC):
+            raise ValueError("Not a log journal segment: " + self.path)
+        header_size = JOURNAL_RECORD_HEADER.size
+        offset = len(JOURNAL_MAGIC)
+        while offset + header_size <= len(data):
+            tv_sec, tv_nsec, _tick, level, size = \
+                JOURNAL_RECORD_HEADER.unpack_from(data, offset)
+            if offset + header_size + size > len(data) or level >= LogLevelsCount:
+                break
+            self._Index(offset, tv_sec + tv_nsec * 1e-9, level)
+            offset += header_size + size
+        if offset < len(data):
+            with open(self.path, "r+b") as f:
+                f.truncate(offset)
+        self.size = offset
+
+    def _Index(self, offset, timestamp, level):
+        keys = self.Keys
+        if not keys or timestamp >= keys[-1]:
+            keys.append(timestamp)
+            self.Offsets.append(offset)
+            self.Levels.append(level)
+        else:
+            # clock went backwards
+            i = bisect_right(keys, timestamp)
+            keys.insert(i, timestamp)
+            self.Offsets.insert(i, offset)
+            self.Levels.insert(i, level)
+        self.LevelCounts[level] += 1
+
+    def Append(self, fobj, records):
+        """
+        Write given (level, body, tick, tv_sec, tv_nsec) records to segment
+        through fobj opened for appending, body being bytes.
+        """
+        chunks = []
+        offset = self.size
+        for level, body, tick, tv_sec, tv_nsec in records:
+            chunks.append(JOURNAL_RECORD_HEADER.pack(
+                tv_sec, tv_nsec, tick, level, len(body)))
+            chunks.append(body)
+            self._Index(offset, tv_sec + tv_nsec * 1e-9, level)
+            offset += JOURNAL_RECORD_HEADER.size + len(body)
+        fobj.write(b"".join(chunks))
+        fobj.flush()
+        self.size = offset
+
+    def View(self):
+        """
+        Return a bytes like view of segment content
+        """
+        if self.use_mmap:
+            if self._map is not None and self._map_size == self.size:
+                return self._map
+            self.Unmap()
+            try:
+                with open(self.path, "rb") as f:
+                    self._map = mmap.mmap(f.fileno(), self.size,
+                                          access=mmap.ACCESS_READ)
+                self._map_size = self.size
+                return self._map
+            except (OSError, ValueError):
+                # fall back to plain reads from now on
+                self.use_mmap = False
+        with open(self.path, "rb") as f:
+            return f.read(self.size)
+
+    def Unmap(self):
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+
+    def Remove(self):
+        self.Unmap()
+        os.remove(self.path)
+
+
+class LogJournal(object):
+    """
+    Segmented append-only journal of log messages with indexed queries.
+    Appending and querying are thread safe.
+    """
+
+    def __init__(self, path, use_mmap=True,
+                 segment_max_size=SEGMENT_MAX_SIZE,
+                 segments_max_count=SEGMENTS_MAX_COUNT):
+        self.path = path
+        self.use_mmap = use_mmap
+        self.segment_max_size = segment_max_size
+        self.segments_max_count = segments_max_count
+        self.lock = Lock()
+        self.Segments = []
+        self._fobj = None
+        self._next_segment = 0
+
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        numbers = sorted(int(match.group(1)) for match in
+                         map(SEGMENT_NAME_RE.match, os.listdir(path))
+                         if match is not None)
+        for number in numbers:
+            segment = JournalSegment(self._SegmentPath(number), use_mmap)
+            try:
+                segment.Load()
+            except (OSError, ValueError):
+                continue
+            self.Segments.append(segment)
+        if numbers:
+            self._next_segment = numbers[-1] + 1
+        if self.Segments:
+            self._fobj = open(self.Segments[-1].path, "ab")
+        else:
+            self._NewSegment()
+
+    def _SegmentPath(self, number):
+        return os.path.join(self.path, SEGMENT_NAME_FORMAT % number)
+
+    def _NewSegment(self):
+        if self._fobj is not None:
+            self._fobj.close()
+        segment = JournalSegment(self._SegmentPath(self._next_segment),
+                                 self.use_mmap)
+        self._next_segment += 1
+        segment.Create()
+        self.Segments.append(segment)
+        self._fobj = open(segment.path, "ab")
+        while len(self.Segments) > self.segments_max_count:
+            oldest = self.Segments.pop(0)
+            try:
+                oldest.Remove()
+            except OSError:
+                pass
+
+    def Append(self, records):
+        """
+        Append given (level, msg, tick, tv_sec, tv_nsec) records,
+        msg being str or bytes.
+        """
+        with self.lock:
+            batch = []
+            size = self.Segments[-1].size
+            for level, msg, tick, tv_sec, tv_nsec in records:
+                if isinstance(msg, str):
+                    msg = msg.encode()
+                record = (level, msg, tick, tv_sec, tv_nsec)
+                record_size = JOURNAL_RECORD_HEADER.size + len(msg)
+                if batch and size + record_size > self.segment_max_size:
+                    self.Segments[-1].Append(self._fobj, batch)
+                    self._NewSegment()
+                    batch = []
+                    size = self.Segments[-1].size
+                batch.append(record)
+                size += record_size
+            if batch:
+                self.Segments[-1].Append(self._fobj, batch)
+                if size >= self.segment_max_size:
+                    self._NewSegment()
+
+    def Query(self, start=None, end=None, level=None, substring=None,
+              limit=QUERY_DEFAULT_LIMIT):
+        """
+        Return list of (level, msg, tick, tv_sec, tv_nsec) of at most limit
+        most recent messages, oldest first, with timestamp between start and
+        end (seconds since epoch), with given level or more critical one, and
+        containing given substring. None means no constraint.
+        Messages are ordered by segment, then by timestamp within segment.
+        """
+        if isinstance(substring, str):
+            substring = substring.encode()
+        header_size = JOURNAL_RECORD_HEADER.size
+        unpack_from = JOURNAL_RECORD_HEADER.unpack_from
+        results = []
+        if limit is not None and limit <= 0:
+            return results
+        with self.lock:
+            for segment in reversed(self.Segments):
+                keys = segment.Keys
+                if not keys:
+                    continue
+                if start is not None and keys[-1] < start:
+                    continue
+                if end is not None and keys[0] > end:
+                    continue
+                if level is not None and not any(segment.LevelCounts[:level + 1]):
+                    continue
+                lo = 0 if start is None else bisect_left(keys, start)
+                hi = len(keys) if end is None else bisect_right(keys, end)
+                levels = segment.Levels
+                offsets = segment.Offsets
+                view = segment.View()
+                for i in range(hi - 1, lo - 1, -1):
+                    if level is not None and levels[i] > level:
+                        continue
+                    offset = offsets[i]
+                    tv_sec, tv_nsec, tick, msg_level, size = \
+                        unpack_from(view, offset)
+                    offset += header_size
+                    body = view[offset:offset + size]
+                    if substring and substring not in body:
+                        continue
+                    results.append((msg_level, body.decode(errors="replace"),
+                                    tick, tv_sec, tv_nsec))
+                    if limit is not None and len(results) >= limit:
+                        break
+                if limit is not None and len(results) >= limit:
+                    break
+        results.reverse()
+        return results
+
+    def Close(self):
+        with self.lock:
+            if self._fobj is not None:
+                self._fobj.flush()
+                os.fsync(self._fobj.fileno())
+                self._fobj.close()
+                self._fobj = None
+            for segment in self.Segments:
+                segment.Unmap()
@@ -28,6 +28,7 @@
 import os
 import collections
 import shutil
+import time
 import platform as platform_module
 from zope.interface import implementer
 from nevow import appserver, inevow, tags, loaders, athena, url, rend
@@ -159,6 +160,44 @@ class ISettings(annotate.TypedInterface):
                                                "Upload a file to PLC working directory"),
                                            action=_("Upload"))
 
+class LogJournalPage(rend.Page):
+    """
+    Plain text dump of persistent PLC log journal.
+    Optional query arguments : start and end (seconds since epoch),
+    level (name or number), search (substring) and limit.
+    """
+
+    def renderHTTP(self, ctx):
+        request = inevow.IRequest(ctx)
+
+        def arg(name, convert):
+            values = request.args.get(name.encode())
+            if not values:
+                return None
+            return convert(values[0].decode())
+
+        def level_arg(value):
+            return LogLevelsDict[value] if value in LogLevelsDict \
+                else int(value)
+
+        request.setHeader(b"content-type", b"text/plain; charset=utf-8")
+        try:
+            limit = arg("limit", int)
+            records = GetPLCObjectSingleton().QueryLogMessages(
+                arg("start", float), arg("end", float),
+                arg("level", level_arg), arg("search", str),
+                **({} if limit is None else {"limit": limit}))
+        except (KeyError, ValueError) as e:
+            request.setResponseCode(400)
+            return ("Invalid query : %s\n" % e).encode()
+        lines = []
+        for level, msg, tick, tv_sec, tv_nsec in records:
+            lines.append("%s.%06d [%s] %d: %s\n" % (
+                time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(tv_sec)),
+                tv_nsec // 1000, LogLevels[level], tick, msg))
+        return "".join(lines).encode()
+
+
 customSettingsURLs = {
 }
 
@@ -172,6 +211,7 @@ class SettingsPage(rend.Page):
     # This makes webform_css url answer some default CSS
     child_webform_css = webform.defaultCSS
     child_webinterface_css = File(paths.AbsNeighbourFile(__file__, 'webinterface.css'), 'text/css')
+    child_logs = LogJournalPage()
    
     def __getattr__(self, name):
         global extensions_settings_od
@@ -206,6 +246,8 @@ class SettingsPage(rend.Page):
         ],
         tags.body[
             tags.a(href='/')['Back'],
+            " ",
+            tags.a(href=url.here.child("logs"))['PLC log'],
             tags.h1["Runtime settings:"],
             webform.renderForms('staticSettings'),
             tags.h1["Extensions settings:"],
@@ -37,6 +37,9 @@ import struct
 
 from runtime.typemapping import TypeTranslator
 from runtime.loglevels import LogLevelsDefault, LogLevelsCount
+from runtime.LogJournal import LogJournal, QUERY_DEFAULT_LIMIT
+from runtime.ChunkStore import ChunkStore
+from runtime.BlobStore import BlobStore, FileSHA256
 from runtime.Stunnel import getPSKID
 from runtime import PlcStatus
 from runtime import MainWorker
@@ -62,6 +65,19 @@ lib_ext = {
     "win32":  ".dll",
 }.get(sys.platform, "")
 
+# log_record_t header of records returned by GetLogMessages in plc_main_tail.c
+LOG_RECORD_HEADER = struct.Struct("=5I")
+
+# Max number of trace frames retrieved from PLC at once.
+# Matches default TRACE_FRAMES_COUNT in plc_debug.c
+TRACE_FRAMES_BATCH = 16
+
+# Period in seconds of copy of new PLC log messages to log journal
+LOG_JOURNAL_PERIOD = 1.0
+
+# Max number of log messages copied to log journal at once, per level
+LOG_JOURNAL_BATCH = 256
+
 
 def PLCprint(message):
     if sys.stdout:
@@ -98,6 +114,8 @@ class PLCObject(object):
         self.TraceLock = Lock()
         self.Traces = []
         self.DebugToken = 0
+        self.DebugDroppedCycles = 0
+        self.DebugSampleRate = 0.0
 
         # OpenPLC Debugger vars
         self.DebuggerType = 'simulation'
@@ -109,11 +127,32 @@ class PLCObject(object):
         self.ip = '127.0.0.1'
         self.ipport = 502
         self.mode = 'TCP'
+        self.bandwidth_budget = debugger.DEFAULT_BANDWIDTH_BUDGET
+
+        # Persistent log journal, fed with PLC log messages
+        self.LogJournal = None
+        self.LogJournalThread = None
+        self.LogJournalCounts = [0] * LogLevelsCount
+        try:
+            self.LogJournal = LogJournal(os.path.join(WorkingDir, "logjournal"))
+        except Exception:
+            PLCprint(_("Log journal disabled :") + "\n" + traceback.format_exc())
+
+        # Chunks of transfered files, kept for next transfers
+        self.ChunkStore = ChunkStore(os.path.join(WorkingDir, "chunks"))
+        # Installed files, hard-linked into working directory
+        self.BlobStore = BlobStore(os.path.join(WorkingDir, "blobs"))
 
         self._init_blobs()
 
     # First task of worker -> no @RunInMain
     def AutoLoad(self, autostart):
+        if self.LogJournal is not None and self.LogJournalThread is None:
+            self.LogJournalThread = Thread(target=self.LogJournalThreadProc,
+                                           name="PLCLogJournal")
+            self.LogJournalThread.daemon = True
+            self.LogJournalThread.start()
+
         # Get the last transfered PLC
         try:
             self.CurrentPLCFilename = open(
@@ -147,12 +186,19 @@ class PLCObject(object):
         if self._LogMessage is not None:
             bmsg = msg.encode()
             return self._LogMessage(level, bmsg, len(bmsg))
+        if self.LogJournal is not None:
+            # no PLC log buffer to take it from later, journal it now
+            now = time()
+            self.LogJournal.Append([(level, msg, 0, int(now),
+                                     int((now % 1) * 1e9))])
         return None
 
     @RunInMain
     def ResetLogCount(self):
         if self._ResetLogCount is not None:
+            self._SyncLogJournal()
             self._ResetLogCount()
+            self.LogJournalCounts = [0] * LogLevelsCount
 
     # used internaly
     def GetLogCount(self, level):
@@ -180,6 +226,81 @@ class PLCObject(object):
             return self._loading_error, 0, 0, 0
         return None
 
+    @RunInMain
+    def GetLogMessages(self, level, from_msgid, count):
+        """
+        Return list of (msgid, msg, tick, tv_sec, tv_nsec) of log messages
+        of given level, from from_msgid to from_msgid + count - 1, oldest
+        first. Messages already overwritten in PLC log buffer are missing,
+        as well as oldest ones when too many are requested at once.
+        """
+        records = []
+        if self._GetLogMessages is not None:
+            buff = self._log_records_buffer
+            sz = self._GetLogMessages(level, from_msgid, count, buff, len(buff))
+            raw = ctypes.string_at(buff, sz)
+            offset = 0
+            while offset < sz:
+                msgid, msgsize, tick, tv_sec, tv_nsec = \
+                    LOG_RECORD_HEADER.unpack_from(raw, offset)
+                offset += LOG_RECORD_HEADER.size
+                records.append((msgid, raw[offset:offset + msgsize].decode(),
+                                tick, tv_sec, tv_nsec))
+                offset += msgsize
+            # PLC gives newest first
+            records.reverse()
+        else:
+            for msgid in range(from_msgid, from_msgid + count):
+                answer = self.GetLogMessage(level, msgid)
+                if answer is not None:
+                    records.append((msgid,) + tuple(answer))
+        return records
+
+    # used internaly
+    def _SyncLogJournal(self):
+        """
+        Copy PLC log messages not yet journaled to log journal
+        """
+        if self.LogJournal is None or self._GetLogCount is None:
+            return
+        for level in range(LogLevelsCount):
+            count = self.GetLogCount(level)
+            journaled = self.LogJournalCounts[level]
+            if count < journaled:
+                # log count was reset or PLC was reloaded
+                journaled = 0
+            while journaled < count:
+                batch = min(count - journaled, LOG_JOURNAL_BATCH)
+                records = self.GetLogMessages(level, journaled, batch)
+                self.LogJournal.Append(
+                    [(level, msg, tick, tv_sec, tv_nsec)
+                     for _msgid, msg, tick, tv_sec, tv_nsec in records])
+                journaled += batch
+            self.LogJournalCounts[level] = journaled
+
+    def LogJournalThreadProc(self):
+        while True:
+            sleep(LOG_JOURNAL_PERIOD)
+            try:
+                MainWorker.call(self._SyncLogJournal)
+            except EOFError:
+                # worker is gone, runtime is quitting
+                break
+            except Exception:
+                PLCprint(traceback.format_exc())
+
+    @RunInMain
+    def QueryLogMessages(self, start=None, end=None, level=None,
+                         substring=None, limit=QUERY_DEFAULT_LIMIT):
+        """
+        Return list of (level, msg, tick, tv_sec, tv_nsec) of journaled log
+        messages, oldest first. See LogJournal.Query for arguments.
+        """
+        if self.LogJournal is None:
+            return []
+        self._SyncLogJournal()
+        return self.LogJournal.Query(start, end, level, substring, limit)
+
     def _GetMD5FileName(self):
         return os.path.join(self.workingdir, "lasttransferedPLC.md5")
 
@@ -237,6 +358,17 @@ class PLCObject(object):
             self._RegisterDebugVariable.restype = ctypes.c_int
             self._RegisterDebugVariable.argtypes = [ctypes.c_int, ctypes.c_void_p]
 
+            self._RegisterDebugVariableDeadband = self.PLClibraryHandle.RegisterDebugVariableDeadband
+            self._RegisterDebugVariableDeadband.restype = ctypes.c_int
+            self._RegisterDebugVariableDeadband.argtypes = [ctypes.c_int, ctypes.c_void_p, ctypes.c_double, ctypes.c_int]
+
+            self._SetDebugDeltaMode = self.PLClibraryHandle.SetDebugDeltaMode
+            self._SetDebugDeltaMode.restype = None
+            self._SetDebugDeltaMode.argtypes = [ctypes.c_int]
+
+            self._RequestDebugKeyframe = self.PLClibraryHandle.RequestDebugKeyframe
+            self._RequestDebugKeyframe.restype = None
+
             self._FreeDebugData = self.PLClibraryHandle.FreeDebugData
             self._FreeDebugData.restype = None
 
@@ -244,6 +376,14 @@ class PLCObject(object):
             self._GetDebugData.restype = ctypes.c_int
             self._GetDebugData.argtypes = [ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_void_p)]
 
+            self._FreeDebugDataBatch = self.PLClibraryHandle.FreeDebugDataBatch
+            self._FreeDebugDataBatch.restype = None
+            self._FreeDebugDataBatch.argtypes = [ctypes.c_uint]
+
+            self._GetDebugDataBatch = self.PLClibraryHandle.GetDebugDataBatch
+            self._GetDebugDataBatch.restype = ctypes.c_int
+            self._GetDebugDataBatch.argtypes = [ctypes.c_uint, ctypes.POINTER(ctypes.c_uint), ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_void_p), ctypes.POINTER(ctypes.c_uint32)]
+
             self._suspendDebug = self.PLClibraryHandle.suspendDebug
             self._suspendDebug.restype = ctypes.c_int
             self._suspendDebug.argtypes = [ctypes.c_int]
@@ -267,6 +407,13 @@ class PLCObject(object):
             self._GetLogMessage.restype = ctypes.c_uint32
             self._GetLogMessage.argtypes = [ctypes.c_uint8, ctypes.c_uint32, ctypes.c_char_p, ctypes.c_uint32, ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32), ctypes.POINTER(ctypes.c_uint32)]
 
+            # PLC built before GetLogMessages was introduced may lack it
+            self._log_records_buffer = ctypes.create_string_buffer(1 << 16)  # 64K
+            self._GetLogMessages = getattr(self.PLClibraryHandle, "GetLogMessages", None)
+            if self._GetLogMessages is not None:
+                self._GetLogMessages.restype = ctypes.c_uint32
+                self._GetLogMessages.argtypes = [ctypes.c_uint8, ctypes.c_uint32, ctypes.c_uint32, ctypes.c_char_p, ctypes.c_uint32]
+
             self._loading_error = None
 
         except Exception:
@@ -296,6 +443,9 @@ class PLCObject(object):
     @RunInMain
     def UnLoadPLC(self):
         self.PythonRuntimeCleanup()
+        # PLC log buffer goes away with PLC library
+        self._SyncLogJournal()
+        self.LogJournalCounts = [0] * LogLevelsCount
         self._FreePLC()
 
     def _InitPLCStubCalls(self):
@@ -306,15 +456,21 @@ class PLCObject(object):
         self._stopPLC = lambda: None
         self._ResetDebugVariables = lambda: None
         self._RegisterDebugVariable = lambda x, y: 0
+        self._RegisterDebugVariableDeadband = lambda x, y, z, t: 0
+        self._SetDebugDeltaMode = lambda x: None
+        self._RequestDebugKeyframe = lambda: None
         self._IterDebugData = lambda x, y: None
         self._FreeDebugData = lambda: None
         self._GetDebugData = lambda: -1
+        self._FreeDebugDataBatch = lambda x: None
+        self._GetDebugDataBatch = lambda *args: -1
         self._suspendDebug = lambda x: -1
         self._resumeDebug = lambda: None
         self._PythonIterator = lambda: ""
         self._GetLogCount = None
         self._LogMessage = None
         self._GetLogMessage = None
+        self._GetLogMessages = None
         self._PLClibraryHandle = None
         self.PLClibraryHandle = None
 
@@ -593,6 +749,8 @@ class PLCObject(object):
 
     def _init_blobs(self):
         self.blobs = {}
+        # blob file path -> hashes of chunks it was built from
+        self.blobchunks = {}
         if os.path.exists(self.tmpdir):
             shutil.rmtree(self.tmpdir)
         os.mkdir(self.tmpdir)
@@ -620,11 +778,60 @@ class PLCObject(object):
         self.blobs[newBlobID] = blob
         return newBlobID
 
+    @RunInMain
+    def HasChunks(self, hashes):
+        return self.ChunkStore.Has(hashes)
+
+    @RunInMain
+    def StoreChunks(self, chunks):
+        return self.ChunkStore.Store(chunks)
+
+    @RunInMain
+    def BlobFromChunks(self, seed, hashes):
+        blob = (mkstemp(dir=self.tmpdir) + (hashlib.new('md5'),))
+        fd, path, md5sum = blob
+        md5sum.update(seed.encode())
+        if not self.ChunkStore.WriteTo(hashes, fd, md5sum):
+            os.close(fd)
+            os.remove(path)
+            return None
+        newBlobID = md5sum.digest()
+        self.blobs[newBlobID] = blob
+        self.blobchunks[path] = hashes
+        return newBlobID
+
+    @RunInMain
+    def HasBlobs(self, hashes):
+        return self.BlobStore.Has(hashes)
+
+    @RunInMain
+    def BlobFromStore(self, seed, filehash):
+        path = self.BlobStore.GetPath(filehash)
+        if path is None:
+            return None
+        # stored file may have been modified in place once installed
+        if FileSHA256(path) != filehash:
+            self.BlobStore.Remove(path)
+            return None
+        md5sum = hashlib.new('md5')
+        md5sum.update(seed.encode())
+        with open(path, "rb") as f:
+            for data in iter(lambda: f.read(1 << 20), b""):
+                md5sum.update(data)
+        newBlobID = md5sum.digest()
+        # no file descriptor, blob is already in store
+        self.blobs[newBlobID] = (None, path, md5sum)
+        return newBlobID
+
     @RunInMain
     def PurgeBlobs(self):
         for fd, _path, _md5sum in list(self.blobs.values()):
-            os.close(fd)
+            if fd is not None:
+                os.close(fd)
         self._init_blobs()
+        # chunks read from evicted stored files are forgotten
+        self.BlobStore.Evict()
+        self.ChunkStore.Evict()
 
     def BlobAsFile(self, blobID, newpath):
         blob = self.blobs.pop(blobID, None)
@@ -637,11 +844,17 @@ class PLCObject(object):
 
     def _BlobAsFile(self, blob, newpath):
         fd, path, _md5sum = blob
-        fobj = os.fdopen(fd)
-        fobj.flush()
-        os.fsync(fd)
-        fobj.close()
-        shutil.move(path, newpath)
+        if fd is not None:
+            fobj = os.fdopen(fd)
+            fobj.flush()
+            os.fsync(fd)
+            fobj.close()
+            hashes = self.blobchunks.pop(path, None)
+            path = self.BlobStore.Add(path)
+            if hashes is not None:
+                # stored file replaces its chunks
+                self.ChunkStore.Locate(hashes, path)
+        self.BlobStore.Link(path, newpath)
 
     def _extra_files_log_path(self):
         return os.path.join(self.workingdir, "extra_files.txt")
@@ -726,13 +939,17 @@ class PLCObject(object):
             return self.PLCStatus == PlcStatus.Stopped
         return False
 
-    def ConfigureRemote(self, mode, ip, ipport, serialport, slaveid, baud):
+    def ConfigureRemote(self, mode, ip, ipport, serialport, slaveid, baud, bandwidth_budget=None):
         self.mode = mode
         self.ip = ip
         self.ipport = ipport
         self.comport = serialport
         self.slaveid = slaveid
         self.baud = baud
+        if bandwidth_budget is not None:
+            # fraction of link time debugger may use
+            self.bandwidth_budget = bandwidth_budget
+
     def ReadRemoteSettings(self):
         remoteSettings = {}
         remoteSettings['mode'] = self.mode
@@ -741,6 +958,7 @@ class PLCObject(object):
         remoteSettings['comport'] = self.comport
         remoteSettings['slaveid'] = self.slaveid
         remoteSettings['baud'] = self.baud
+        remoteSettings['bandwidth_budget'] = self.bandwidth_budget
         return remoteSettings
     
     def ConnectRemoteTarget(self):
@@ -748,7 +966,7 @@ class PLCObject(object):
             try:
                 #self.remote = debugger.RemoteDebugClient('TCP', host='192.168.1.155', port=502)
                 #self.remote = debugger.RemoteDebugClient('RTU', serial_port='COM4', baudrate=115200, slave_id=1)
-                self.remote = debugger.RemoteDebugClient(self.mode, host=self.ip, port=self.ipport, serial_port=self.comport, baudrate=self.baud, slave_id=self.slaveid)
+                self.remote = debugger.RemoteDebugClient(self.mode, host=self.ip, port=self.ipport, serial_port=self.comport, baudrate=self.baud, slave_id=self.slaveid, bandwidth_budget=self.bandwidth_budget)
                 if self.remote.connect() == False:
                     self.remote.disconnect()
                     self.remote = None
@@ -800,30 +1018,43 @@ class PLCObject(object):
 
 
     @RunInMain
-    def SetTraceVariablesList(self, idxs):
+    def SetTraceVariablesList(self, idxs, deadbands=None):
         """
         Call ctype imported function to append
-        these indexes to registred variables in PLC debugger
+        these indexes to registred variables in PLC debugger.
+        If deadbands list is given, PLC debugger only traces variables
+        changes (simulation only). Each deadband is None or
+        (deadband, relative) for corresponding index.
         """
 
         if self.DebuggerType == 'remote':
             self.tracesList = []
             for idx, iectype, force in idxs:
                 self.tracesList.append((idx, force, iectype))
+            if self.remote is not None:
+                # requests of former traces list won't be reused
+                self.remote.clear_request_cache()
 
         self.DebugToken += 1
+        self.DebugDroppedCycles = 0
+        self.DebugSampleRate = 0.0
         if idxs:
             # suspend but dont disable
             if self._suspendDebug(False) == 0:
                 # keep a copy of requested idx
                 self._ResetDebugVariables()
-                for idx, iectype, force in idxs:
+                self._SetDebugDeltaMode(deadbands is not None)
+                if deadbands is None:
+                    deadbands = [None] * len(idxs)
+                for (idx, iectype, force), deadband in zip(idxs, deadbands):
                     if force is not None:
                         c_type, _unpack_func, pack_func = \
                             TypeTranslator.get(iectype,
                                                (None, None, None))
                         force = ctypes.byref(pack_func(c_type, force))
-                    res = self._RegisterDebugVariable(idx, force)
+                    deadband, relative = deadband if deadband else (0, False)
+                    res = self._RegisterDebugVariableDeadband(
+                        idx, force, deadband, relative)
                     if res != 0:
                         self._resumeDebug()
                         self._suspendDebug(True)
@@ -852,6 +1083,24 @@ class PLCObject(object):
             return self.PLCStatus, self._TracesSwap()
         return PlcStatus.Broken, []
 
+    def GetTraceDroppedCycles(self, DebugToken):
+        """
+        Return count of PLC cycles that couldn't be traced since
+        given debug session started, because trace thread was late.
+        """
+        if DebugToken is not None and DebugToken == self.DebugToken:
+            return self.DebugDroppedCycles
+        return None
+
+    def GetTraceSampleRate(self, DebugToken):
+        """
+        Return count of traces per second recently
+        produced in given debug session.
+        """
+        if DebugToken is not None and DebugToken == self.DebugToken:
+            return self.DebugSampleRate
+        return None
+
     def TraceThreadProc(self):
         """
         Return a list of traces, corresponding to the list of required idx
@@ -860,28 +1109,37 @@ class PLCObject(object):
         TraceBuffer = None
         ForcedVariablesIdx = []
 
-        # Define maximum number of traces
-        batch_size = 60
-        if self.DebuggerType == 'remote' and self.remote.modbus_type == 'RTU':
-            # We should limit Serial debuggers as they may have smaller buffers
-            batch_size = 20
-        
+        frames_count = ctypes.c_uint()
+        frames_dropped = ctypes.c_uint32()
+        frames_ticks = (ctypes.c_uint32 * TRACE_FRAMES_BATCH)()
+        frames_sizes = (ctypes.c_uint32 * TRACE_FRAMES_BATCH)()
+        frames_buffers = (ctypes.c_void_p * TRACE_FRAMES_BATCH)()
+
+        # traces count and start time of sample rate measurement
+        SampledFrames = 0
+        SamplingStart = time()
+
         while self.PLCStatus == PlcStatus.Started:
+            Frames = []
             if self.DebuggerType == 'simulation':
-                tick = ctypes.c_uint32()
-                size = ctypes.c_uint32()
-                buff = ctypes.c_void_p()
-                TraceBuffer = None
-
                 self.PLClibraryLock.acquire()
 
-                res = self._GetDebugData(ctypes.byref(tick),
-                                        ctypes.byref(size),
-                                        ctypes.byref(buff))
+                # get all frames pending in PLC's trace ring at once
+                res = self._GetDebugDataBatch(TRACE_FRAMES_BATCH,
+                                              ctypes.byref(frames_count),
+                                              frames_ticks,
+                                              frames_sizes,
+                                              frames_buffers,
+                                              ctypes.byref(frames_dropped))
                 if res == 0:
-                    if size.value:
-                        TraceBuffer = ctypes.string_at(buff.value, size.value)
-                    self._FreeDebugData()
+                    for i in range(frames_count.value):
+                        if frames_sizes[i]:
+                            Frames.append((
+                                frames_ticks[i],
+                                ctypes.string_at(frames_buffers[i],
+                                                 frames_sizes[i])))
+                    self._FreeDebugDataBatch(frames_count.value)
+                    self.DebugDroppedCycles = frames_dropped.value
 
                 self.PLClibraryLock.release()
 
@@ -890,84 +1148,64 @@ class PLCObject(object):
                     break
             
             if self.DebuggerType == 'remote' and self.remote != None:
-                trace_list = []
-                TraceBuffer = b''  # Initialize TraceBuffer as bytes
-                for item in self.tracesList:
-                    variable_idx, force_status, iec_type = item
-                    trace_list.append(variable_idx)
-                try:
-                    if self.PLCStatus == PlcStatus.Started and trace_list:                           
-                        total_traces = len(trace_list)
-                        processed_traces = 0
-                        while processed_traces < total_traces:
-                            batch = trace_list[processed_traces:processed_traces + batch_size]
-                            res = self.remote.send_debug_get_list_query(len(batch), batch)
-                            if res != None:
-                                response_code = struct.unpack('>B', res[8:9])[0]  # Unpack the response code as a byte
-                                if response_code == debugger.DebugResponse.SUCCESS:
-                                    lastIndex = struct.unpack('>H', res[9:11])[0]
-                                    tick = ctypes.c_uint32()
-                                    tick.value = struct.unpack('>I', res[11:15])[0]
-                                    TraceBuffer += res[17:]  # Add received traces to TraceBuffer
-                                    
-                                    if lastIndex == batch[-1]:
-                                        # All traces in the batch retrieved
-                                        processed_traces += len(batch)
-                                    else:
-                                        # Get the remaining traces in the next batch
-                                        processed_traces = trace_list.index(lastIndex) + 1
-                                elif response_code == debugger.DebugResponse.ERROR_OUT_OF_BOUNDS:
-                                    print("Error reading traces from remote: request of indexes out of bounds")
-                                    TraceBuffer = None
-                                elif response_code == debugger.DebugResponse.ERROR_OUT_OF_MEMORY:
-                                    if batch_size > 2:
-                                        batch_size -= 1
-                                        print("Error reading traces from remote: out of memory.\nReducing batch size to " + str(batch_size))
-                                    else:
-                                        print("Error reading traces from remote: FATAL out of memory. Can't reduce batch size any further")
-                                    TraceBuffer = None
-                                    break
-                                else:
-                                    print("Error reading traces from remote: Invalid response")
-                                    res_hex = ' '.join([hex(ord(byte))[2:].zfill(2) for byte in res])
-                                    print(res_hex)
-                                    TraceBuffer = None
-                                    break
-                            if res == None:
-                                if processed_traces != 0:
-                                    # First batch was successfull, which probably means target is busy with a complex PLC program
-                                    # In that case, we should try again instead of failing
-                                    print("Failed to get some traces. It looks like your PLC task (higher priority) is taking too long and starving comms (lower priority). Debug timing may be innacurate")
-                                else:
-                                    print("Error reading traces from remote: NULL response object.")
-                                    TraceBuffer = None
-                                    break
-                except Exception as e:
-                    print("Error reading traces from remote: {}".format(str(e)))
-                    TraceBuffer = None
+                TraceBuffer = None
+                requests = []
                 # Go over forced variables
                 for item in self.tracesList:
                     variable_idx, force_value, iec_type = item
                     if force_value != None:
                         if variable_idx not in ForcedVariablesIdx:
                             ForcedVariablesIdx.append(variable_idx)
-                        #value = force_status._obj.value
-                        self.remote.send_debug_set_query(variable_idx, True, force_value, iec_type)
+                        request = self.remote.debug_set_request(variable_idx, True, force_value, iec_type)
+                    elif variable_idx in ForcedVariablesIdx:
+                        request = self.remote.debug_set_request(variable_idx, False, 0, iec_type)
+                        ForcedVariablesIdx.remove(variable_idx)
                     else:
-                        if variable_idx in ForcedVariablesIdx:
-                            self.remote.send_debug_set_query(variable_idx, False, 0, iec_type)
-                            ForcedVariablesIdx.remove(variable_idx)
+                        continue
+                    if request is not None:
+                        requests.append(request)
+
+                trace_list = [variable_idx for variable_idx, _force, _type in self.tracesList]
+                scheduler = self.remote.scheduler
+                PollStart = time()
+                PollBytes = self.remote.byte_count
+                try:
+                    if self.PLCStatus == PlcStatus.Started and trace_list:
+                        # force requests go in the same exchange as traces
+                        tick, TraceBuffer = self._GetRemoteTraces(trace_list, scheduler, requests)
+                    elif requests:
+                        self.remote.send_requests(requests)
+                except Exception as e:
+                    print("Error reading traces from remote: {}".format(str(e)))
+                    TraceBuffer = None
 
-                
-                sleep(0.03) # Thread queries data every 30ms
+                if TraceBuffer is not None:
+                    Frames.append((tick, TraceBuffer))
+
+                # leave link time to target's other communications
+                sleep(scheduler.poll_done(time() - PollStart,
+                                          self.remote.byte_count - PollBytes))
 
-            if TraceBuffer is not None:
+            if Frames:
+                dropped = False
                 self.TraceLock.acquire()
-                lT = len(self.Traces)
-                if lT != 0 and lT * len(self.Traces[0]) > 1024 * 1024:
-                    self.Traces.pop(0)
-                self.Traces.append((tick.value, TraceBuffer))
+                for Frame in Frames:
+                    lT = len(self.Traces)
+                    if lT != 0 and lT * len(self.Traces[0]) > 1024 * 1024:
+                        self.Traces.pop(0)
+                        dropped = True
+                    self.Traces.append(Frame)
                 self.TraceLock.release()
+                SampledFrames += len(Frames)
+                if dropped:
+                    # changes traced in delta mode were lost
+                    self._RequestDebugKeyframe()
+
+            sampling_time = time() - SamplingStart
+            if sampling_time >= 1.0:
+                self.DebugSampleRate = SampledFrames / sampling_time
+                SampledFrames = 0
+                SamplingStart = time()
 
             # TraceProc stops here if Traces not polled for 3 seconds
             traces_age = time() - self.LastSwapTrace
@@ -975,11 +1213,75 @@ class PLCObject(object):
                 self.TraceLock.acquire()
                 self.Traces = []
                 self.TraceLock.release()
+                self._RequestDebugKeyframe()
                 self._suspendDebug(True)  # Disable debugger
                 break
 
         self.TraceThread = None
 
+    def _GetRemoteTraces(self, trace_list, scheduler, requests):
+        """
+        Get traces of remote target. All batches of indexes, preceded by
+        given requests, are sent in one pipelined exchange. Batches the
+        target could only partially answer are completed in next exchanges.
+        Batch size is given by scheduler, and adapted to target's answers.
+        Return tick and traces buffer (None if failed)
+        """
+        batch_size = scheduler.batch_size
+        # each batch is [indexes still to get, traces already received]
+        batches = [[trace_list[i:i + batch_size], b'']
+                   for i in range(0, len(trace_list), batch_size)]
+        tick = None
+        while True:
+            pending = [batch for batch in batches if batch[0]]
+            if not pending:
+                break
+            responses = self.remote.send_requests(
+                requests +
+                [self.remote.debug_get_list_request(indexes)
+                 for indexes, _traces in pending])[len(requests):]
+            requests = []
+
+            progress = False
+            missing = False
+            for batch, res in zip(pending, responses):
+                if res is None:
+                    missing = True
+                    continue
+                indexes = batch[0]
+                response_code = struct.unpack('>B', res[8:9])[0]  # Unpack the response code as a byte
+                if response_code == debugger.DebugResponse.SUCCESS:
+                    lastIndex = struct.unpack('>H', res[9:11])[0]
+                    tick = struct.unpack('>I', res[11:15])[0]
+                    batch[1] += res[17:]  # Add received traces to batch
+                    # Get the remaining traces in the next exchange
+                    batch[0] = indexes[indexes.index(lastIndex) + 1:]
+                    progress = True
+                elif response_code == debugger.DebugResponse.ERROR_OUT_OF_BOUNDS:
+                    print("Error reading traces from remote: request of indexes out of bounds")
+                    return tick, None
+                elif response_code == debugger.DebugResponse.ERROR_OUT_OF_MEMORY:
+                    if scheduler.out_of_memory():
+                        print("Error reading traces from remote: out of memory.\nReducing batch size to " + str(scheduler.batch_size))
+                    else:
+                        print("Error reading traces from remote: FATAL out of memory. Can't reduce batch size any further")
+                    return tick, None
+                else:
+                    print("Error reading traces from remote: Invalid response")
+                    print(' '.join(['%02x' % byte for byte in bytearray(res)]))
+                    return tick, None
+
+            if not progress:
+                print("Error reading traces from remote: NULL response object.")
+                return tick, None
+            if missing:
+                # Some batches were successfull, which probably means target is busy with a complex PLC program
+                # In that case, we should try again instead of failing
+                print("Failed to get some traces. It looks like your PLC task (higher priority) is taking too long and starving comms (lower priority). Debug timing may be innacurate")
+
+        scheduler.success()
+        return tick, b''.join([traces for _indexes, traces in batches])
+
     def RemoteExec(self, script, *kwargs):
         try:
             exec(script, kwargs)
@@ -55,14 +55,23 @@ ExposedCalls = [
     ("GetPLCID", {}),
     ("SeedBlob", {}),
     ("AppendChunkToBlob", {}),
+    ("HasChunks", {}),
+    ("StoreChunks", {}),
+    ("BlobFromChunks", {}),
+    ("HasBlobs", {}),
+    ("BlobFromStore", {}),
     ("PurgeBlobs", {}),
     ("NewPLC", {}),
     ("RepairPLC", {}),
     ("MatchMD5", {}),
     ("SetTraceVariablesList", {}),
     ("GetTraceVariables", {}),
+    ("GetTraceDroppedCycles", {}),
+    ("GetTraceSampleRate", {}),
     ("RemoteExec", {}),
     ("GetLogMessage", {}),
+    ("GetLogMessages", {}),
+    ("QueryLogMessages", {}),
     ("ResetLogCount", {})
 ]
 
@@ -36,6 +36,85 @@ class DebugResponse(IntEnum):
     ERROR_OUT_OF_BOUNDS = 0x81
     ERROR_OUT_OF_MEMORY = 0x82
 
+# Fraction of link time debugger may use, the rest is left
+# to other communications of the target
+DEFAULT_BANDWIDTH_BUDGET = 0.5
+
+# Modbus RTU character is 11 bits long: start bit, 8 data bits,
+# parity bit or second stop bit, and stop bit
+RTU_CHAR_BITS = 11.0
+
+class DebugPollScheduler:
+    """
+    Adapts DEBUG_GET_LIST batch size and poll period to a remote target.
+
+    Batch size is reduced on out of memory errors, the failing size minus
+    one becoming the largest safe batch size, and grows back to it after
+    successful polls. Poll period is such that debug exchanges only use
+    bandwidth_budget of link time, estimated from measured exchange
+    duration and, on serial links, from bytes transmission time.
+    """
+    MIN_BATCH_SIZE = 2
+    # Successful polls before growing batch size
+    GROW_AFTER = 10
+    # Successful polls at largest safe batch size before trying above it
+    PROBE_AFTER = 500
+    MIN_PERIOD = 0.02
+    MAX_PERIOD = 1.0
+
+    def __init__(self, modbus_type, baudrate=19200, bandwidth_budget=DEFAULT_BANDWIDTH_BUDGET):
+        if modbus_type == 'RTU':
+            # We should limit Serial debuggers as they may have smaller buffers
+            self.batch_size = 20
+            self.max_batch_size = 60
+            self.byte_time = RTU_CHAR_BITS / baudrate
+        else:
+            self.batch_size = 60
+            self.max_batch_size = 120
+            self.byte_time = 0.0
+        self.safe_batch_size = self.max_batch_size
+        self.bandwidth_budget = bandwidth_budget
+        self.successes = 0
+        self.period = self.MIN_PERIOD
+
+    def out_of_memory(self):
+        """
+        Reduce batch size after target ran out of memory.
+        Return False if batch size can't be reduced any further
+        """
+        self.successes = 0
+        if self.batch_size <= self.MIN_BATCH_SIZE:
+            return False
+        self.safe_batch_size = self.batch_size - 1
+        self.batch_size = max(self.MIN_BATCH_SIZE, self.batch_size * 3 // 4)
+        return True
+
+    def success(self):
+        """
+        Grow batch size after enough successful polls
+        """
+        self.successes += 1
+        if self.batch_size < self.safe_batch_size:
+            if self.successes >= self.GROW_AFTER:
+                self.batch_size += 1
+                self.successes = 0
+        elif self.safe_batch_size < self.max_batch_size:
+            # target may have more free memory now
+            if self.successes >= self.PROBE_AFTER:
+                self.safe_batch_size += 1
+                self.successes = 0
+
+    def poll_done(self, duration, byte_count):
+        """
+        Update poll period after an exchange of given duration (s)
+        and count of bytes. Return delay before next poll
+        """
+        busy = max(duration, byte_count * self.byte_time)
+        self.period = min(max(busy / self.bandwidth_budget, self.MIN_PERIOD),
+                          self.MAX_PERIOD)
+        return max(self.period - duration, 0)
+
+
 class RemoteDebugClient:
     # Table of CRC values for high-order byte
     _auchCRCHi = [
@@ -79,7 +158,8 @@ class RemoteDebugClient:
         0x40]
 
 
-    def __init__(self, modbus_type, host='', port=None, serial_port=None, baudrate=19200, slave_id=1):
+    def __init__(self, modbus_type, host='', port=None, serial_port=None, baudrate=19200, slave_id=1,
+                 bandwidth_budget=DEFAULT_BANDWIDTH_BUDGET):
         self.modbus_type = modbus_type
         self.host = host
         self.port = port
@@ -90,18 +170,54 @@ class RemoteDebugClient:
         self.sock = None # TCP socket
         self.serial = None # Serial port
         self.timeout = 5
+        # Max number of TCP requests sent before their response is received
+        self.max_inflight = 4
+        # Round trip time of last request, and smoothed round trip time
+        self.last_rtt = None
+        self.rtt = None
+        # Count of bytes sent and received
+        self.byte_count = 0
+        # Learned batch size and poll period, kept while client lives
+        self.scheduler = DebugPollScheduler(modbus_type, baudrate, bandwidth_budget)
+        # Max delay before target starts answering a RTU request
+        self.rtu_timeout = 0.25
+        # Above 19200 bauds, 3.5 characters inter-frame gap
+        # is fixed to 1.75ms
+        self._char_time = RTU_CHAR_BITS / baudrate
+        self._frame_gap = 0.00175 if baudrate > 19200 else 3.5 * self._char_time
+        # DEBUG_GET_LIST requests and frames, reused as long as traced
+        # variables list doesn't change, see clear_request_cache()
+        self._get_list_requests = {}
+        self._request_frames = {}
+
+    def clear_request_cache(self):
+        """
+        Forget cached DEBUG_GET_LIST requests, when traced variables change
+        """
+        self._get_list_requests = {}
+        self._request_frames = {}
 
     def _increment_transaction_id(self):
         self.transaction_id = (self.transaction_id + 1) % 65536
 
+    def _update_rtt(self, rtt):
+        self.last_rtt = rtt
+        if self.rtt is None:
+            self.rtt = rtt
+        else:
+            # same smoothing as TCP's SRTT
+            self.rtt += (rtt - self.rtt) / 8.0
+
     def _calculate_crc(self, message):
         CRCHi = 0xFF
         CRCLo = 0xFF
+        auchCRCHi = self._auchCRCHi
+        auchCRCLo = self._auchCRCLo
 
         for byte in message:
             index = CRCHi ^ byte
-            CRCHi = CRCLo ^ self._auchCRCHi[index]
-            CRCLo = self._auchCRCLo[index]
+            CRCHi = CRCLo ^ auchCRCHi[index]
+            CRCLo = auchCRCLo[index]
 
         return (CRCHi << 8) | CRCLo
 
@@ -136,7 +252,10 @@ class RemoteDebugClient:
         data = struct.pack(">BBBB", 0, 0, 0, 0)  # Dummy data - Modbus TCP parser requires messages with at least 6 bytes of data
         return self._send_modbus_request(FunctionCode.DEBUG_INFO, data)
     
-    def send_debug_set_query(self, varidx, flag, value, var_type):
+    def debug_set_request(self, varidx, flag, value, var_type):
+        """
+        Return (function code, data) of a DEBUG_SET request
+        """
         if flag == False:
             data = struct.pack(">H", varidx) + struct.pack(">B", flag) + struct.pack(">H", 1) + struct.pack(">B", 0)
         else:
@@ -159,21 +278,38 @@ class RemoteDebugClient:
                 # Handle unsupported data types or raise an error if needed
                 #raise TypeError("Unsupported data type: {}".format(type(value)))
                 print("Unsupported data type: {}".format(var_type))
-        
-        return self._send_modbus_request(FunctionCode.DEBUG_SET, data)
+                return None
+
+        return FunctionCode.DEBUG_SET, data
+
+    def send_debug_set_query(self, varidx, flag, value, var_type):
+        request = self.debug_set_request(varidx, flag, value, var_type)
+        if request is None:
+            return None
+        return self._send_modbus_request(*request)
 
     def send_debug_get_query(self, startidx, endidx):
         data = struct.pack(">HH", startidx, endidx)
         return self._send_modbus_request(FunctionCode.DEBUG_GET, data)
     
+    def debug_get_list_request(self, index_array):
+        """
+        Return (function code, data) of a DEBUG_GET_LIST request
+        """
+        key = tuple(index_array)
+        request = self._get_list_requests.get(key)
+        if request is None:
+            num_indexes = len(index_array)
+            data = struct.pack(">H{}H".format(num_indexes), num_indexes, *index_array)
+            request = self._get_list_requests[key] = (FunctionCode.DEBUG_GET_LIST, data)
+        return request
+
     def send_debug_get_list_query(self, num_indexes, index_array):
         if len(index_array) != num_indexes:
             print("Invalid index array length.")
             return None
 
-        #data = struct.pack(f">H{num_indexes}H", num_indexes, *index_array)
-        data = struct.pack(">H{}H".format(num_indexes), num_indexes, *index_array)
-        return self._send_modbus_request(FunctionCode.DEBUG_GET_LIST, data)
+        return self._send_modbus_request(*self.debug_get_list_request(index_array))
     
     def get_md5_hash(self):
         endianness_check = 0xDEAD
@@ -196,70 +332,205 @@ class RemoteDebugClient:
         md5_hash = res[9:].decode('utf-8')
         return md5_hash
 
-    def _send_modbus_request(self, function_code, data):
+    def _assemble_modbus_request(self, function_code, data):
+        cached = function_code == FunctionCode.DEBUG_GET_LIST
+        if cached:
+            request = self._request_frames.get(data)
+            if request is not None:
+                if self.modbus_type == 'TCP':
+                    # only transaction ID changes
+                    self._increment_transaction_id()
+                    return struct.pack(">H", self.transaction_id) + request[2:]
+                return request
+
         request = self._assemble_request(function_code, data)
-        if self.modbus_type == 'RTU':
+        if request is not None and self.modbus_type == 'RTU':
             # Add CRC for Modbus RTU
-            #crc = binascii.crc_hqx(data, 0xFFFF)
             crc = self._calculate_crc(request)
-
-            #crc_bytes = crc.to_bytes(2, 'big')
             crc_bytes = struct.pack('>H', crc)  # Convert crc to bytes using struct.pack
             request += crc_bytes
+        if cached and request is not None:
+            self._request_frames[data] = request
+        return request
 
-        
+    def _send_modbus_request(self, function_code, data):
+        request = self._assemble_modbus_request(function_code, data)
+        if request is None:
+            return None
         return self._send_request(request)
-        
+
+    def send_requests(self, requests):
+        """
+        Send a list of (function code, data) requests in a single exchange.
+        On TCP, up to max_inflight requests are sent before waiting for
+        responses. Return list of responses, None for failed requests.
+        """
+        frames = []
+        for function_code, data in requests:
+            frames.append(self._assemble_modbus_request(function_code, data))
+        if None in frames:
+            return [None] * len(frames)
+        return self._send_requests(frames)
+
     def _send_request(self, request):
+        return self._send_requests([request])[0]
+
+    def _recv_exact(self, size):
+        data = b''
+        while len(data) < size:
+            chunk = self.sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Connection closed by target")
+            data += chunk
+        return data
+
+    def _recv_tcp_frame(self):
+        """
+        Read exactly one Modbus TCP frame, using length from MBAP header.
+        Return transaction ID and whole frame
+        """
+        header = self._recv_exact(7)
+        transaction_id, _protocol_id, length = struct.unpack(">HHH", header[:6])
+        # length counts unit identifier, already read with header
+        return transaction_id, header + self._recv_exact(length - 1)
+
+    def _exchange_tcp(self, requests, responses):
+        # transaction ID -> (request position, send time)
+        pending = {}
+        next_request = 0
+        received = 0
+        while received < len(requests):
+            while next_request < len(requests) and len(pending) < self.max_inflight:
+                request = requests[next_request]
+                transaction_id = struct.unpack(">H", request[:2])[0]
+                self.sock.sendall(request)
+                self.byte_count += len(request)
+                pending[transaction_id] = (next_request, time.time())
+                next_request += 1
+
+            transaction_id, response = self._recv_tcp_frame()
+            entry = pending.pop(transaction_id, None)
+            if entry is None:
+                # late response to a request that previously timed out
+                continue
+            self.byte_count += len(response)
+            position, sent = entry
+            self._update_rtt(time.time() - sent)
+            responses[position] = response
+            received += 1
+
+    def _read_rtu(self, size):
+        """
+        Read exactly size bytes from serial port, giving up after response
+        timeout plus transmission time. Return None if incomplete
+        """
+        self.serial.timeout = self.rtu_timeout + size * self._char_time
+        data = self.serial.read(size)
+        self.byte_count += len(data)
+        if len(data) < size:
+            return None
+        return data
+
+    def _read_rtu_until_gap(self):
+        """
+        Read bytes until inter-frame gap, for frames without length field
+        """
+        self.serial.timeout = self.rtu_timeout
+        self.serial.inter_byte_timeout = self._frame_gap
+        try:
+            data = self.serial.read(1024)
+        finally:
+            self.serial.inter_byte_timeout = None
+        self.byte_count += len(data)
+        return data
+
+    def _recv_rtu_frame(self):
+        """
+        Read exactly one Modbus RTU frame, which length is deduced from
+        function code and header, and check its CRC.
+        Return frame without CRC, None if incomplete or corrupted
+        """
+        frame = self._read_rtu(2)
+        if frame is None:
+            return None
+        function_code = frame[1]
+        if function_code & 0x80:
+            # exception code
+            remaining = 1
+        elif function_code == FunctionCode.DEBUG_INFO:
+            # variables count
+            remaining = 2
+        elif function_code == FunctionCode.DEBUG_SET:
+            # response code
+            remaining = 1
+        elif function_code in (FunctionCode.DEBUG_GET, FunctionCode.DEBUG_GET_LIST):
+            code = self._read_rtu(1)
+            if code is None:
+                return None
+            frame += code
+            remaining = 0
+            if code[0] == DebugResponse.SUCCESS:
+                # last index, tick and data size
+                header = self._read_rtu(8)
+                if header is None:
+                    return None
+                frame += header
+                remaining = struct.unpack('>H', header[6:8])[0]
+        else:
+            remaining = None
+
+        if remaining is None:
+            frame += self._read_rtu_until_gap()
+        else:
+            tail = self._read_rtu(remaining + 2)
+            if tail is None:
+                return None
+            frame += tail
+
+        if len(frame) < 4 or \
+           self._calculate_crc(frame[:-2]) != struct.unpack('>H', frame[-2:])[0]:
+            print("Invalid CRC in response from target")
+            self.serial.reset_input_buffer()
+            return None
+        return frame[:-2]
+
+    def _exchange_rtu(self, requests, responses):
+        for position, request in enumerate(requests):
+            # drop late bytes of a previously failed response
+            self.serial.reset_input_buffer()
+            sent = time.time()
+            self.serial.write(request)
+            self.byte_count += len(request)
+            response = self._recv_rtu_frame()
+            if response is None:
+                continue
+            self._update_rtt(time.time() - sent)
+
+            # TCP header is bigeer. Pad serial response 6 bytes to the right so that it matches TCP response
+            inserted_bytes = b'\x00\x00\x00\x00\x00\x00'
+            responses[position] = inserted_bytes + response
+
+    def _send_requests(self, requests):
+        responses = [None] * len(requests)
         try:
             if self.modbus_type == 'TCP':
                 if not self.sock:
                     #raise Exception("Not connected.")
                     print("Device is not connected")
-                    return None
+                    return responses
 
-                
-                self.sock.send(request)
-                response = self.sock.recv(1024)
-                return response
+                self._exchange_tcp(requests, responses)
 
             elif self.modbus_type == 'RTU':
                 if not self.serial:
                     #raise Exception("Not connected.")
                     print("Device is not connected")
-                    return None
+                    return responses
 
-                #if should_print == True:
-                #    print('request:')
-                #    res_hex = ' '.join([hex(ord(byte))[2:].zfill(2) for byte in request])
-                #    print(res_hex)
-
-                ## Wait until timeout for the response to arrive
-                #start_time = time.time()
-                #
-                #while (time.time() - start_time) < self.timeout:
-                #    if self.serial.in_waiting >= expected_response_length:
-                #        response = self.serial.read(expected_response_length)
-                #        return response
-                #
-                ## If no response is received within the timeout, return an empty string
-                #return ''
-
-                self.serial.write(request)
-                response = self.serial.read(1024)
-                if response == None or len(response) < 2:
-                    return None
-                
-                # TCP header is bigeer. Pad serial response 6 bytes to the right so that it matches TCP response
-                inserted_bytes = b'\x00\x00\x00\x00\x00\x00'
-                response = inserted_bytes + response
-                # Remove the last two bytes (CRC)
-                response = response[:-2]
-                return response
+                self._exchange_rtu(requests, responses)
 
             else:
                 print("Unsupported Modbus type.")
-                return None
 
         except Exception as e:
             #print(f"Error sending request: {str(e)}")
@@ -267,15 +538,18 @@ class RemoteDebugClient:
             print("Trying to reconnect...")
             self.disconnect()
             self.connect()
-            return None
+
+        return responses
 
     def connect(self):
         if self.modbus_type == 'TCP':
             try:
                 self.sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
                 self.sock.settimeout(self.timeout)
+                # don't delay small pipelined requests
+                self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                # connect() returns once connection is established
                 self.sock.connect((self.host, self.port))
-                time.sleep(1) #make sure connection happens
             except Exception as e:
                 #print(f"TCP connection error: {str(e)}")
                 print("TCP connection error: {}\n".format(str(e)))
@@ -284,7 +558,7 @@ class RemoteDebugClient:
         elif self.modbus_type == 'RTU':
             try:
                 self.serial = serial.Serial(port=self.serial_port, baudrate=self.baudrate, timeout=0.03)
-                time.sleep(2) #make sure connection happens
+                time.sleep(2) #make sure connection happens, boards may reset on port opening
             except Exception as e:
                 #print(f"Serial port connection error: {str(e)}")
                 print("Serial port connection error: {}".format(str(e)))
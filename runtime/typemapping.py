@@ -6,6 +6,8 @@
 
 from ctypes import *
 from datetime import timedelta as td
+from functools import lru_cache
+import struct
 
 class IEC_STRING(Structure):
     """
@@ -71,34 +73,317 @@ TypeTranslator = SameEndianessTypeTranslator
 DebugTypesSize = dict([(key, sizeof(t)) for key, (t, p, u) in SameEndianessTypeTranslator.items() if t is not None])
 
 
-def UnpackDebugBuffer(buff, indexes, calc_string_size):
-    res = []
-    buffoffset = 0
-    buffsize = len(buff)
-    buffptr = cast(cast(buff, c_char_p), c_void_p).value
-    for iectype in indexes:
-        c_type, unpack_func, _pack_func = TypeTranslator.get(iectype,
-                                                             (None, None, None))
-
-        cursor = c_void_p(buffptr + buffoffset)
-        if iectype == "STRING" and calc_string_size == True:
-            # strlen is stored in c_uint8 and sizeof(c_uint8) is 1
-            # first check we can read size.
-            if (buffoffset + 1) <= buffsize:
-                size = 1 + cast(cursor,POINTER(c_type)).contents.len
-            else:
+def _unpack_string(size, body):
+    return body[:size]
+
+
+def _unpack_time(s, ns):
+    return td(0, s, ns/1000.0)
+
+
+# struct module equivalent of TypeTranslator, to unpack debug buffers
+# many values at a time. Format must match ctypes layout, with no padding.
+# Second member is a function converting the unpacked item(s) into value,
+# None when a single item is already the value.
+DebugTypesFormat = {
+    "BOOL":       ("?", None),
+    "STEP":       ("B", None),
+    "TRANSITION": ("B", None),
+    "ACTION":     ("B", None),
+    "SINT":       ("b", None),
+    "USINT":      ("B", None),
+    "BYTE":       ("B", None),
+    "STRING":     ("B126s", _unpack_string),
+    "INT":        ("h", None),
+    "UINT":       ("H", None),
+    "WORD":       ("H", None),
+    "DINT":       ("i", None),
+    "UDINT":      ("I", None),
+    "DWORD":      ("I", None),
+    "LINT":       ("q", None),
+    "ULINT":      ("Q", None),
+    "LWORD":      ("Q", None),
+    "REAL":       ("f", None),
+    "LREAL":      ("d", None),
+    "TIME":       ("ii", _unpack_time),
+    "TOD":        ("ii", _unpack_time),
+    "DATE":       ("ii", _unpack_time),
+    "DT":         ("ii", _unpack_time),
+    }
+
+
+class DebugBufferLayout(object):
+    """
+    Layout of debug buffers for a given list of traced IEC types,
+    compiled once into struct.Struct segments, so that many debug
+    buffers can be unpacked at once, one column of values per variable.
+
+    When strings size is computed by PLC (simulation), each STRING
+    splits layout in fixed size segments, and is unpacked separately.
+    """
+    def __init__(self, iectypes, calc_string_size):
+        self.IECTypes = tuple(iectypes)
+        # list of (struct.Struct, None) or (None, "STRING") segments
+        self.Segments = []
+        # list of (first item index, items count, convert function)
+        self.Fields = []
+        # size of buffers if no variable size segment, else None
+        self.Size = 0
+        self.Valid = True
+
+        fmt = ""
+        items_count = 0
+        for iectype in self.IECTypes:
+            if iectype == "STRING" and calc_string_size:
+                if fmt:
+                    self.Segments.append((struct.Struct("=" + fmt), None))
+                    fmt = ""
+                self.Segments.append((None, iectype))
+                self.Fields.append((items_count, 1, None))
+                items_count += 1
+                self.Size = None
+                continue
+
+            type_format = DebugTypesFormat.get(iectype, None)
+            if type_format is None:
+                self.Valid = False
+                break
+            item_fmt, convert = type_format
+            item_count = len(struct.unpack(
+                "=" + item_fmt, bytes(struct.calcsize("=" + item_fmt))))
+            fmt += item_fmt
+            self.Fields.append((items_count, item_count, convert))
+            items_count += item_count
+            if self.Size is not None:
+                self.Size += struct.calcsize("=" + item_fmt)
+
+        if fmt:
+            self.Segments.append((struct.Struct("=" + fmt), None))
+        # each value is a single item, that needs no conversion
+        self.ItemsAreValues = all(
+            convert is None for _first, _count, convert in self.Fields)
+
+    def _UnpackItems(self, buff):
+        """
+        Unpack buffer into a flat tuple of items, or None if buffer
+        doesn't match layout
+        """
+        buffsize = len(buff)
+        if not self.Valid or buffsize == 0:
+            return None
+        if self.Size is not None:
+            if buffsize != self.Size:
                 return None
-        
-        else:
-            size = sizeof(c_type)
+            return self.Segments[0][0].unpack(buff) if self.Segments else ()
+
+        items = ()
+        buffoffset = 0
+        for segment_struct, _iectype in self.Segments:
+            if segment_struct is not None:
+                next_offset = buffoffset + segment_struct.size
+                if next_offset > buffsize:
+                    return None
+                items += segment_struct.unpack_from(buff, buffoffset)
+            else:
+                # strlen is stored in first byte
+                if buffoffset + 1 > buffsize:
+                    return None
+                strlen = buff[buffoffset]
+                next_offset = buffoffset + 1 + strlen
+                if next_offset > buffsize:
+                    return None
+                items += (buff[buffoffset + 1:next_offset],)
+            buffoffset = next_offset
+        if buffoffset != buffsize:
+            return None
+        return items
+
+    def _ItemsToColumns(self, rows):
+        if not rows:
+            return [[] for _field in self.Fields]
+        item_columns = list(zip(*rows))
+        columns = []
+        for first, count, convert in self.Fields:
+            if convert is None:
+                columns.append(list(item_columns[first]))
+            else:
+                columns.append(list(map(convert, *item_columns[first:first + count])))
+        return columns
 
-        if c_type is not None and (buffoffset + size) <= buffsize:
-            ptr = cast(cursor, POINTER(c_type))
-            value = unpack_func(ptr.contents)
-            buffoffset += size
-            res.append(value)
+    def Unpack(self, buff):
+        """
+        Return list of values found in one debug buffer,
+        or None if buffer doesn't match layout
+        """
+        items = self._UnpackItems(buff)
+        if items is None:
+            return None
+        if self.ItemsAreValues:
+            return list(items)
+        values = []
+        for first, count, convert in self.Fields:
+            if convert is None:
+                values.append(items[first])
+            else:
+                values.append(convert(*items[first:first + count]))
+        return values
+
+    def UnpackTraces(self, traces):
+        """
+        Unpack a list of (tick, debug buffer) traces in one pass.
+        Return list of ticks, list of values columns (one per variable),
+        and count of traces rejected because not matching layout
+        """
+        ticks = []
+        rejected = 0
+        if self.Valid and self.Size:
+            # Fixed size layout: all matching buffers are unpacked at once
+            buffs = []
+            for tick, buff in traces:
+                if len(buff) == self.Size:
+                    ticks.append(tick)
+                    buffs.append(buff)
+                else:
+                    rejected += 1
+            rows = list(self.Segments[0][0].iter_unpack(b"".join(buffs)))
         else:
+            rows = []
+            for tick, buff in traces:
+                items = self._UnpackItems(buff)
+                if items is not None:
+                    ticks.append(tick)
+                    rows.append(items)
+                else:
+                    rejected += 1
+        return ticks, self._ItemsToColumns(rows), rejected
+
+
+# frame number preceding bitmap of buffers traced in delta mode
+DEBUG_DELTA_HEADER_SIZE = 2
+DEBUG_DELTA_FRAME_MASK = (1 << (8 * DEBUG_DELTA_HEADER_SIZE)) - 1
+# count of layouts of changed variables kept by a delta decoder
+DEBUG_DELTA_LAYOUTS_CACHE_SIZE = 256
+
+
+class DebugDeltaDecoder(object):
+    """
+    Rebuild complete traces from buffers traced in delta mode, where each
+    buffer starts with a frame number and a bitmap of changed variables,
+    followed by the values of changed variables only. Only these values
+    are unpacked, with a layout compiled once per set of changed
+    variables, as the same variables tend to change together.
+
+    Last known value of each variable is kept between calls, so that
+    a decoder must be used for a single debug session. When frames were
+    lost, values are unknown again until next keyframe.
+    """
+    def __init__(self, iectypes, calc_string_size):
+        self.IECTypes = tuple(iectypes)
+        self.CalcStringSize = calc_string_size
+        self.Valid = DebugBufferLayout(self.IECTypes, calc_string_size).Valid
+        self.BitmapSize = (len(self.IECTypes) + 7) // 8
+        # bitmap -> (indexes of changed variables, size of their values or
+        # None if it varies, function unpacking their values)
+        self.Layouts = {}
+        self._Forget()
+        self.NextFrame = None
+
+    def _Forget(self):
+        self.LastValues = [None] * len(self.IECTypes)
+        self.Missing = len(self.IECTypes)
+
+    def _GetLayout(self, bitmap):
+        """
+        Return layout of variables changed in given bitmap, as cached
+        in Layouts, or None if bitmap doesn't match traced variables
+        """
+        changed = int.from_bytes(bitmap, "little")
+        if changed >> len(self.IECTypes):
             return None
-    if buffoffset and buffoffset == buffsize:
-        return res
-    return None
+        indexes = [index for index in range(changed.bit_length())
+                   if changed >> index & 1]
+        layout = DebugBufferLayout(
+            [self.IECTypes[index] for index in indexes], self.CalcStringSize)
+        if not indexes:
+            size, unpack = 0, lambda buff: ()
+        elif layout.Size is not None and layout.ItemsAreValues:
+            # values are unpacked at once
+            size, unpack = layout.Size, layout.Segments[0][0].unpack
+        else:
+            size, unpack = None, layout.Unpack
+        if len(self.Layouts) >= DEBUG_DELTA_LAYOUTS_CACHE_SIZE:
+            self.Layouts.clear()
+        layout = self.Layouts[bitmap] = (indexes, size, unpack)
+        return layout
+
+    def Decode(self, traces):
+        """
+        Unpack a list of (tick, delta buffer) traces, as
+        DebugBufferLayout.UnpackTraces does for complete buffers.
+        Return list of ticks, list of values columns (one per variable),
+        and count of traces rejected because they can't be decoded.
+        Traces that arrive before value of all variables is known are
+        skipped.
+        """
+        ticks = []
+        rows = []
+        rejected = 0
+        layouts = self.Layouts
+        bitmap_end = DEBUG_DELTA_HEADER_SIZE + self.BitmapSize
+        for tick, buff in traces:
+            layout = None
+            if self.Valid and len(buff) >= bitmap_end:
+                bitmap = buff[DEBUG_DELTA_HEADER_SIZE:bitmap_end]
+                layout = layouts.get(bitmap) or self._GetLayout(bitmap)
+            if layout is None:
+                rejected += 1
+                continue
+            frame = int.from_bytes(buff[:DEBUG_DELTA_HEADER_SIZE], "little")
+            if frame != self.NextFrame and self.NextFrame is not None:
+                # frames were lost, wait for next keyframe
+                self._Forget()
+            self.NextFrame = (frame + 1) & DEBUG_DELTA_FRAME_MASK
+
+            indexes, size, unpack = layout
+            if size is None:
+                values = unpack(buff[bitmap_end:])
+            elif len(buff) - bitmap_end == size:
+                values = unpack(buff[bitmap_end:])
+            else:
+                values = None
+            if values is None:
+                # corrupted buffer, wait for next keyframe
+                self._Forget()
+                rejected += 1
+                continue
+            last_values = self.LastValues
+            if self.Missing:
+                self.Missing -= sum(
+                    1 for index in indexes if last_values[index] is None)
+            for index, value in zip(indexes, values):
+                last_values[index] = value
+            if self.Missing == 0:
+                ticks.append(tick)
+                rows.append(tuple(last_values))
+        if rows:
+            columns = [list(column) for column in zip(*rows)]
+        else:
+            columns = [[] for _iectype in self.IECTypes]
+        return ticks, columns, rejected
+
+
+@lru_cache(maxsize=8)
+def _GetDebugBufferLayout(iectypes, calc_string_size):
+    return DebugBufferLayout(iectypes, calc_string_size)
+
+
+def GetDebugBufferLayout(iectypes, calc_string_size):
+    """
+    Return compiled layout for given list of traced IEC types,
+    cached since the same list is used for many buffers
+    """
+    return _GetDebugBufferLayout(tuple(iectypes), bool(calc_string_size))
+
+
+def UnpackDebugBuffer(buff, indexes, calc_string_size):
+    return GetDebugBufferLayout(indexes, calc_string_size).Unpack(buff)
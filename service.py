@@ -116,10 +116,26 @@ class PLCObjectAdapter(PLCObject):
     def AppendChunkToBlob(self, *args, **kwargs):
         return super().AppendChunkToBlob(*args, **kwargs)
 
+    @expose
+    def BlobFromChunks(self, *args, **kwargs):
+        return super().BlobFromChunks(*args, **kwargs)
+
+    @expose
+    def BlobFromStore(self, *args, **kwargs):
+        return super().BlobFromStore(*args, **kwargs)
+
     @expose
     def GetLogMessage(self, *args, **kwargs):
         return super().GetLogMessage(*args, **kwargs)
 
+    @expose
+    def GetLogMessages(self, *args, **kwargs):
+        return super().GetLogMessages(*args, **kwargs)
+
+    @expose
+    def QueryLogMessages(self, *args, **kwargs):
+        return super().QueryLogMessages(*args, **kwargs)
+
     @expose
     def GetPLCID(self, *args, **kwargs):
         return super().GetPLCID(*args, **kwargs)
@@ -132,6 +148,22 @@ class PLCObjectAdapter(PLCObject):
     def GetTraceVariables(self, *args, **kwargs):
         return super().GetTraceVariables(*args, **kwargs)
 
+    @expose
+    def GetTraceDroppedCycles(self, *args, **kwargs):
+        return super().GetTraceDroppedCycles(*args, **kwargs)
+
+    @expose
+    def GetTraceSampleRate(self, *args, **kwargs):
+        return super().GetTraceSampleRate(*args, **kwargs)
+
+    @expose
+    def HasBlobs(self, *args, **kwargs):
+        return super().HasBlobs(*args, **kwargs)
+
+    @expose
+    def HasChunks(self, *args, **kwargs):
+        return super().HasChunks(*args, **kwargs)
+
     @expose
     def MatchMD5(self, *args, **kwargs):
         return super().MatchMD5(*args, **kwargs)
@@ -160,6 +192,10 @@ class PLCObjectAdapter(PLCObject):
     def SeedBlob(self, *args, **kwargs):
         return super().SeedBlob(*args, **kwargs)
 
+    @expose
+    def StoreChunks(self, *args, **kwargs):
+        return super().StoreChunks(*args, **kwargs)
+
     @expose
     def SetTraceVariablesList(self, *args, **kwargs):
         return super().SetTraceVariablesList(*args, **kwargs)
@@ -358,6 +358,9 @@ class SVGHMI(object):
     """%default_cmds
 
     EditorType = SVGHMIEditor
+    # XSLT transform only reads HMI tree built by SVGHMILibrary, that is
+    # generated before confnodes
+    CTNGenerateConcurrently = True
 
     ConfNodeMethods = [
         {
@@ -545,6 +548,9 @@ class SVGHMI(object):
         target_path = os.path.join(build_path, target_fname)
         hash_path = os.path.join(build_path, "svghmi_"+location_str+".md5")
 
+        # progress of this instance, may be generated concurrently with others
+        self.times_msgs = {}
+
         self.GetCTRoot().logger.write("SVGHMI:\n")
 
         if os.path.exists(svgfile):
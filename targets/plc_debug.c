@@ -1,12 +1,21 @@
 /*
  * DEBUGGER code
  * 
- * On "publish", when buffer is free, debugger stores arbitrary variables 
- * content into, and mark this buffer as filled
+ * On "publish", when a trace frame is free in the ring, debugger stores
+ * arbitrary variables content into it, stamps it with current tick,
+ * and mark this frame as filled.
  * 
  * 
- * Buffer content is read asynchronously, (from non real time part), 
- * and then buffer marked free again.
+ * Frames content is read asynchronously, (from non real time part), 
+ * oldest first, and then frames are marked free again.
+ * When the ring is full, cycle is not traced and counted as dropped.
+ * 
+ * In delta mode, frames start with a 16 bits frame number, incremented
+ * for each published frame, so that lost frames can be detected. Then
+ * comes a bitmap of traced variables that changed since last published
+ * frame (beyond optional deadband), and values of these variables only.
+ * Every TRACE_DELTA_KEYFRAME_PERIOD frames, after any re-configuration,
+ * and when requested after frames were lost, all variables are sent.
  *  
  * 
  * */
@@ -28,32 +37,77 @@ void __publish_debug (void){}
 typedef unsigned int dbgvardsc_index_t;
 typedef unsigned short trace_buf_offset_t;
 
-#define BUFFER_EMPTY 0
-#define BUFFER_FULL 1
-
 #ifndef TARGET_ONLINE_DEBUG_DISABLE
 
 #define TRACE_BUFFER_SIZE 4096
 #define TRACE_LIST_SIZE 1024
 
-/* Atomically accessed variable for buffer state */
-static long trace_buffer_state = BUFFER_EMPTY;
+/* Number of trace frames in ring, must be a power of 2 */
+#ifndef TRACE_FRAMES_COUNT
+#define TRACE_FRAMES_COUNT 16
+#endif
+#define TRACE_FRAMES_MASK (TRACE_FRAMES_COUNT-1)
+
+/* Size of copy of last published values, used to detect changes */
+#ifndef TRACE_SHADOW_SIZE
+#define TRACE_SHADOW_SIZE (2*TRACE_BUFFER_SIZE)
+#endif
+#define TRACE_NO_SHADOW ((unsigned int)-1)
+
+#ifndef TRACE_DELTA_KEYFRAME_PERIOD
+#define TRACE_DELTA_KEYFRAME_PERIOD 64
+#endif
+/* Size of frame number preceding bitmap in delta frames */
+#define TRACE_DELTA_HEADER_SIZE 2
 
 typedef struct trace_item_s {
     dbgvardsc_index_t dbgvardsc_index;
+    /* delta mode only */
+    unsigned int shadow_offset;
+    double deadband;
+    int deadband_relative;
+    /* value didn't fit in a frame, send it in next frames even if
+       unchanged. Shadow is only updated once value was sent. */
+    int pending;
 } trace_item_t;
 
 trace_item_t trace_list[TRACE_LIST_SIZE];
-char trace_buffer[TRACE_BUFFER_SIZE];
+
+typedef struct trace_frame_s {
+    unsigned long tick;
+    unsigned long size;
+    char buffer[TRACE_BUFFER_SIZE];
+} trace_frame_t;
+
+trace_frame_t trace_frames[TRACE_FRAMES_COUNT];
+
+/* Ring counters. Only PLC thread increments trace_frames_published,
+   trace_frames_consumed is incremented by debugger thread, or moved
+   by ResetDebugVariables while debug is suspended.
+   Both are always updated atomically. */
+static volatile long trace_frames_published = 0;
+static volatile long trace_frames_consumed = 0;
+/* Count of cycles not traced because ring was full, since last
+   debugger re-configuration. Only written by PLC thread. */
+static volatile unsigned long trace_frames_dropped = 0;
+/* Set when debugger thread was signalled, until it waited for it, so
+   that each InitiateDebugTransfer is paired with a WaitDebugData */
+static volatile long trace_transfer_signalled = 0;
 
 /* Trace's cursor*/
 static trace_item_t *trace_list_collect_cursor = trace_list;
 static trace_item_t *trace_list_addvar_cursor = trace_list;
 static const trace_item_t *trace_list_end = 
     &trace_list[TRACE_LIST_SIZE-1];
-static char *trace_buffer_cursor = trace_buffer;
-static const char *trace_buffer_end = trace_buffer + TRACE_BUFFER_SIZE;
 
+/* Delta mode state, only changed while debug is suspended,
+   except trace_delta_frames_to_keyframe, only used by PLC thread */
+static int trace_delta_mode = 0;
+static unsigned int trace_delta_frames_to_keyframe = 0;
+/* Set by debugger thread when frames were lost, cleared by PLC thread */
+static volatile long trace_delta_keyframe_requested = 0;
+static unsigned int trace_shadow_cursor = 0;
+char trace_shadow[TRACE_SHADOW_SIZE];
 
 
 #define FORCE_BUFFER_SIZE 1024
@@ -127,10 +181,16 @@ void __init_debug(void)
 {
     /* init local static vars */
 #ifndef TARGET_ONLINE_DEBUG_DISABLE
-    trace_buffer_cursor = trace_buffer;
     trace_list_addvar_cursor = trace_list;
     trace_list_collect_cursor = trace_list;
-    trace_buffer_state = BUFFER_EMPTY;
+    trace_frames_published = 0;
+    trace_frames_consumed = 0;
+    trace_frames_dropped = 0;
+    trace_transfer_signalled = 0;
+    trace_delta_mode = 0;
+    trace_delta_frames_to_keyframe = 0;
+    trace_delta_keyframe_requested = 0;
+    trace_shadow_cursor = 0;
 
     force_buffer_cursor = force_buffer;
     force_list_addvar_cursor = force_list;
@@ -169,14 +229,26 @@ void __init_debug(void)
 
 extern void InitiateDebugTransfer(void);
 extern void CleanupRetain(void);
+extern long AtomicCompareExchange(long*, long, long);
 
 extern unsigned long __tick;
 
+#ifndef TARGET_ONLINE_DEBUG_DISABLE
+/* Signal debugger thread, unless it was already signalled and didn't
+   wait for it yet : it will then see all frames published meanwhile */
+static void __signal_debug_transfer(void)
+{
+    if(AtomicCompareExchange(
+        (long*)&trace_transfer_signalled, 0, 1) == 0)
+        InitiateDebugTransfer();
+}
+#endif
+
 void __cleanup_debug(void)
 {
 #ifndef TARGET_ONLINE_DEBUG_DISABLE
-    trace_buffer_cursor = trace_buffer;
-    InitiateDebugTransfer();
+    /* unblock debugger thread, possibly with no frame */
+    __signal_debug_transfer();
 #endif    
 
     CleanupRetain();
@@ -215,7 +287,6 @@ unsigned int GetRetainSize(void)
 
 extern void PLC_GetTime(IEC_TIME*);
 extern int TryEnterDebugSection(void);
-extern long AtomicCompareExchange(long*, long, long);
 extern long long AtomicCompareExchange64(long long* , long long , long long);
 extern void LeaveDebugSection(void);
 extern void ValidateRetainBuffer(void);
@@ -239,6 +310,107 @@ extern void InValidateRetainBuffer(void);
                 }                                                                                   \
             }                                                                                       \
             break;
+#ifndef TARGET_ONLINE_DEBUG_DISABLE
+
+#define __DeltaNum_case(TYPENAME)                                           \
+        case TYPENAME##_ENUM :                                              \
+        case TYPENAME##_P_ENUM :                                            \
+        case TYPENAME##_O_ENUM :                                            \
+            current = (double)*((TYPENAME *)value_p);                       \
+            previous = (double)*((TYPENAME *)shadow_p);                     \
+            break;
+
+/* Tell if value changed since it was last published, given deadband */
+static int __trace_value_changed(dbgvardsc_t *dsc, trace_item_t *item,
+                                 void *value_p, size_t size)
+{
+    void *shadow_p = trace_shadow + item->shadow_offset;
+    if(item->deadband > 0){
+        double current, previous, delta, threshold;
+        switch(dsc->type){
+            __ANY_NUM(__DeltaNum_case)
+        default:
+            return memcmp(shadow_p, value_p, size) != 0;
+        }
+        delta = current - previous;
+        if(delta < 0) delta = -delta;
+        threshold = item->deadband;
+        if(item->deadband_relative)
+            threshold *= (previous < 0 ? -previous : previous) / 100.0;
+        return delta > threshold;
+    }
+    return memcmp(shadow_p, value_p, size) != 0;
+}
+
+/* Fill frame buffer with frame number, changed variables bitmap, and
+   changed variables values. Values that don't fit are left pending for
+   next frames. Return 0 if even bitmap doesn't fit in frame. */
+static int __publish_debug_delta(char *buffer, char **buffer_cursor,
+                                 long frame_number)
+{
+    unsigned int count = trace_list_addvar_cursor - trace_list;
+    unsigned int bitmap_size = (count + 7) / 8;
+    unsigned int index = 0;
+    int keyframe = (trace_delta_frames_to_keyframe == 0);
+    char *bitmap = buffer + TRACE_DELTA_HEADER_SIZE;
+    char *cursor = bitmap + bitmap_size;
+    const char *buffer_end = buffer + TRACE_BUFFER_SIZE;
+
+    if(cursor >= buffer_end){
+        return 0;
+    }
+    /* atomically take keyframe request, if any */
+    if(AtomicCompareExchange(
+        (long*)&trace_delta_keyframe_requested, 1, 0))
+        keyframe = 1;
+    /* little endian frame number */
+    buffer[0] = frame_number & 0xff;
+    buffer[1] = (frame_number >> 8) & 0xff;
+    memset(bitmap, 0, bitmap_size);
+
+    /* iterate over trace list */
+    while(trace_list_collect_cursor < trace_list_addvar_cursor){
+        void *value_p = NULL;
+        size_t size;
+        trace_item_t *item = trace_list_collect_cursor;
+        dbgvardsc_t *dsc = &dbgvardsc[item->dbgvardsc_index];
+
+        UnpackVar(dsc, &value_p, NULL, &size);
+
+        if(__Is_a_string(dsc)){
+            /* optimization for strings */
+            size = ((STRING*)value_p)->len + 1;
+        }
+
+        if(keyframe || item->pending || item->shadow_offset == TRACE_NO_SHADOW ||
+           __trace_value_changed(dsc, item, value_p, size)){
+            char *next_cursor = cursor + size;
+            /* check for buffer overflow */
+            if(next_cursor < buffer_end){
+                memcpy(cursor, value_p, size);
+                cursor = next_cursor;
+                if(item->shadow_offset != TRACE_NO_SHADOW)
+                    memcpy(trace_shadow + item->shadow_offset, value_p, size);
+                bitmap[index >> 3] |= 1 << (index & 7);
+                item->pending = 0;
+            }else{
+                /* not in bitmap, keep trying following smaller values */
+                item->pending = 1;
+            }
+        }
+        index++;
+        trace_list_collect_cursor++;
+    }
+
+    trace_delta_frames_to_keyframe = keyframe ?
+        TRACE_DELTA_KEYFRAME_PERIOD - 1 :
+        trace_delta_frames_to_keyframe - 1;
+    *buffer_cursor = cursor;
+    return 1;
+}
+
+#endif
+
 void __publish_debug(void)
 {
     InValidateRetainBuffer();
@@ -246,74 +418,92 @@ void __publish_debug(void)
 #ifndef TARGET_ONLINE_DEBUG_DISABLE 
     /* Check there is no running debugger re-configuration */
     if(TryEnterDebugSection()){
-        /* Lock buffer */
-        long latest_state = AtomicCompareExchange(
-            &trace_buffer_state,
-            BUFFER_EMPTY,
-            BUFFER_FULL);
-            
-        /* If buffer was free */
-        if(latest_state == BUFFER_EMPTY)
-        {
-            int stop = 0;
-            /* Reset force list cursor */
-            force_list_apply_cursor = force_list;
-
-            /* iterate over force list */
-            while(!stop && force_list_apply_cursor < force_list_addvar_cursor){
-                dbgvardsc_t *dsc = &dbgvardsc[
-                    force_list_apply_cursor->dbgvardsc_index];
-                void *varp = dsc->ptr;
-                __IEC_types_enum vartype = dsc->type;
-                switch(vartype){
-                    __ANY(__ReForceOutput_case_p)
-                default:
-                    break;
-                }
-                force_list_apply_cursor++;
-            }
+        long published = trace_frames_published;
+        int stop = 0;
 
-            /* Reset buffer cursor */
-            trace_buffer_cursor = trace_buffer;
-            /* Reset trace list cursor */
-            trace_list_collect_cursor = trace_list;
+        /* Reset force list cursor */
+        force_list_apply_cursor = force_list;
 
-            /* iterate over trace list */
-            while(trace_list_collect_cursor < trace_list_addvar_cursor){
-                void *value_p = NULL;
-                size_t size;
-                char* next_cursor;
+        /* iterate over force list, even if ring is full */
+        while(!stop && force_list_apply_cursor < force_list_addvar_cursor){
+            dbgvardsc_t *dsc = &dbgvardsc[
+                force_list_apply_cursor->dbgvardsc_index];
+            void *varp = dsc->ptr;
+            __IEC_types_enum vartype = dsc->type;
+            switch(vartype){
+                __ANY(__ReForceOutput_case_p)
+            default:
+                break;
+            }
+            force_list_apply_cursor++;
+        }
 
-                dbgvardsc_t *dsc = &dbgvardsc[
-                    trace_list_collect_cursor->dbgvardsc_index];
+        /* If a frame is free in ring */
+        if(published - trace_frames_consumed < TRACE_FRAMES_COUNT)
+        {
+            trace_frame_t *frame = &trace_frames[published & TRACE_FRAMES_MASK];
+            char *trace_buffer_cursor = frame->buffer;
+            const char *trace_buffer_end = frame->buffer + TRACE_BUFFER_SIZE;
 
-                UnpackVar(dsc, &value_p, NULL, &size);
+            /* Reset trace list cursor */
+            trace_list_collect_cursor = trace_list;
 
-                /* copy visible variable to buffer */;
-                if(__Is_a_string(dsc)){
-                    /* optimization for strings */
-                    /* assume NULL terminated strings */
-                    size = ((STRING*)value_p)->len + 1;
+            if(trace_delta_mode){
+                if(!__publish_debug_delta(frame->buffer, &trace_buffer_cursor,
+                                          published))
+                    /* not even room for bitmap, publish empty frame */
+                    trace_buffer_cursor = frame->buffer;
+            }else{
+                /* iterate over trace list */
+                while(trace_list_collect_cursor < trace_list_addvar_cursor){
+                    void *value_p = NULL;
+                    size_t size;
+                    char* next_cursor;
+
+                    dbgvardsc_t *dsc = &dbgvardsc[
+                        trace_list_collect_cursor->dbgvardsc_index];
+
+                    UnpackVar(dsc, &value_p, NULL, &size);
+
+                    /* copy visible variable to buffer */;
+                    if(__Is_a_string(dsc)){
+                        /* optimization for strings */
+                        /* assume NULL terminated strings */
+                        size = ((STRING*)value_p)->len + 1;
+                    }
+
+                    /* compute next cursor positon.*/
+                    next_cursor = trace_buffer_cursor + size;
+                    /* check for buffer overflow */
+                    if(next_cursor < trace_buffer_end)
+                        /* copy data to the buffer */
+                        memcpy(trace_buffer_cursor, value_p, size);
+                    else
+                        /* stop looping in case of overflow */
+                        break;
+                    /* increment cursor according size*/
+                    trace_buffer_cursor = next_cursor;
+                    trace_list_collect_cursor++;
                 }
-
-                /* compute next cursor positon.*/
-                next_cursor = trace_buffer_cursor + size;
-                /* check for buffer overflow */
-                if(next_cursor < trace_buffer_end)
-                    /* copy data to the buffer */
-                    memcpy(trace_buffer_cursor, value_p, size);
-                else
-                    /* stop looping in case of overflow */
-                    break;
-                /* increment cursor according size*/
-                trace_buffer_cursor = next_cursor;
-                trace_list_collect_cursor++;
             }
+
+            /* stamp frame */
+            frame->tick = __tick;
+            frame->size = trace_buffer_cursor - frame->buffer;
+
+            /* atomically publish frame */
+            AtomicCompareExchange(
+                (long*)&trace_frames_published,
+                published,
+                published + 1);
             
             /* Leave debug section,
              * Trigger asynchronous transmission 
              * (returns immediately) */
-            InitiateDebugTransfer(); /* size */
+            __signal_debug_transfer();
+        }else{
+            /* debugger thread is late, ring is full */
+            trace_frames_dropped++;
         }
         LeaveDebugSection();
     }
@@ -390,13 +580,44 @@ void __publish_debug(void)
 
 void ResetDebugVariables(void);
 
-int RegisterDebugVariable(dbgvardsc_index_t idx, void* force)
+/* Enable or disable delta mode. Must be called while debug is suspended,
+   before registering variables. */
+void SetDebugDeltaMode(int enable)
+{
+    trace_delta_mode = enable;
+    trace_delta_frames_to_keyframe = 0;
+    trace_delta_keyframe_requested = 0;
+}
+
+/* Make next delta frame a keyframe, after frames were lost.
+   Can be called while PLC is running. */
+void RequestDebugKeyframe(void)
+{
+    AtomicCompareExchange(
+        (long*)&trace_delta_keyframe_requested, 0, 1);
+}
+
+int RegisterDebugVariableDeadband(dbgvardsc_index_t idx, void* force,
+                                  double deadband, int deadband_relative)
 {
     int error_code = 0;
     if(idx < sizeof(dbgvardsc)/sizeof(dbgvardsc_t)){
         /* add to trace_list, inc trace_list_addvar_cursor*/
         if(trace_list_addvar_cursor <= trace_list_end){
+            size_t size;
             trace_list_addvar_cursor->dbgvardsc_index = idx;
+            trace_list_addvar_cursor->deadband = deadband;
+            trace_list_addvar_cursor->deadband_relative = deadband_relative;
+            trace_list_addvar_cursor->pending = 0;
+            /* reserve room in shadow for whole value, if possible.
+               Variables without shadow are sent in every frame. */
+            UnpackVar(&dbgvardsc[idx], NULL, NULL, &size);
+            if(trace_shadow_cursor + size <= TRACE_SHADOW_SIZE){
+                trace_list_addvar_cursor->shadow_offset = trace_shadow_cursor;
+                trace_shadow_cursor += size;
+            }else{
+                trace_list_addvar_cursor->shadow_offset = TRACE_NO_SHADOW;
+            }
             trace_list_addvar_cursor++;
         } else {
             error_code = TRACE_LIST_OVERFLOW;
@@ -426,11 +647,15 @@ int RegisterDebugVariable(dbgvardsc_index_t idx, void* force)
 
 error_cleanup:
     ResetDebugVariables();
-    trace_buffer_state = BUFFER_EMPTY;
     return error_code;
     
 }
 
+int RegisterDebugVariable(dbgvardsc_index_t idx, void* force)
+{
+    return RegisterDebugVariableDeadband(idx, force, 0, 0);
+}
+
 #define ResetForcedVariable_case_t(TYPENAME)                                            \
         case TYPENAME##_ENUM :                                                          \
             ((__IEC_##TYPENAME##_t *)varp)->flags &= ~__IEC_FORCE_FLAG;                 \
@@ -451,6 +676,17 @@ void ResetDebugVariables(void)
 {
     /* Reset trace list */
     trace_list_addvar_cursor = trace_list;
+    trace_shadow_cursor = 0;
+    /* first frame of new list must be complete */
+    trace_delta_frames_to_keyframe = 0;
+
+    /* Forget pending frames, they were traced with previous list.
+       PLC thread is kept out of debug section by caller. */
+    AtomicCompareExchange(
+        (long*)&trace_frames_consumed,
+        trace_frames_consumed,
+        trace_frames_published);
+    trace_frames_dropped = 0;
 
     force_list_apply_cursor = force_list;
     /* Restore forced variables */
@@ -476,19 +712,82 @@ void ResetDebugVariables(void)
 
 void FreeDebugData(void)
 {
-    /* atomically mark buffer as free */
+    long consumed = trace_frames_consumed;
+    /* atomically mark oldest frame as free */
+    if(consumed != trace_frames_published)
+        AtomicCompareExchange(
+            (long*)&trace_frames_consumed,
+            consumed,
+            consumed + 1);
+}
+
+void FreeDebugDataBatch(unsigned int count)
+{
+    long consumed = trace_frames_consumed;
+    long pending = trace_frames_published - consumed;
+    if((long)count > pending)
+        count = (unsigned int)pending;
+    /* atomically mark oldest frames as free */
     AtomicCompareExchange(
-        &trace_buffer_state,
-        BUFFER_FULL,
-        BUFFER_EMPTY);
+        (long*)&trace_frames_consumed,
+        consumed,
+        consumed + count);
 }
+
 int WaitDebugData(unsigned long *tick);
-/* Wait until debug data ready and return pointer to it */
+
+/* Wait until at least one frame is ready in ring, unless debugger
+   thread was signalled without frame (cleanup), or for frames it
+   already got without waiting */
+static int WaitDebugFrame(void)
+{
+    unsigned long tick;
+    int res;
+    if(trace_frames_published != trace_frames_consumed)
+        return 0;
+    res = WaitDebugData(&tick);
+    /* signal was consumed, next published frame signals again.
+       Ring is read after this, so that no frame is missed. */
+    AtomicCompareExchange((long*)&trace_transfer_signalled, 1, 0);
+    return res;
+}
+
+/* Wait until debug data ready and return pointer to oldest frame */
 int GetDebugData(unsigned long *tick, unsigned long *size, void **buffer){
-    int wait_error = WaitDebugData(tick);
+    int wait_error = WaitDebugFrame();
     if(!wait_error){
-        *size = trace_buffer_cursor - trace_buffer;
-        *buffer = trace_buffer;
+        if(trace_frames_published != trace_frames_consumed){
+            trace_frame_t *frame = 
+                &trace_frames[trace_frames_consumed & TRACE_FRAMES_MASK];
+            *tick = frame->tick;
+            *size = frame->size;
+            *buffer = frame->buffer;
+        }else{
+            *size = 0;
+        }
+    }
+    return wait_error;
+}
+
+/* Wait until debug data ready and describe up to max_frames frames,
+   oldest first. Frames stay valid until FreeDebugDataBatch(*count). */
+int GetDebugDataBatch(unsigned int max_frames, unsigned int *count,
+                      uint32_t *ticks, uint32_t *sizes, void **buffers,
+                      uint32_t *dropped){
+    int wait_error = WaitDebugFrame();
+    *count = 0;
+    if(!wait_error){
+        long consumed = trace_frames_consumed;
+        long pending = trace_frames_published - consumed;
+        while(*count < max_frames && (long)*count < pending){
+            trace_frame_t *frame = 
+                &trace_frames[(consumed + *count) & TRACE_FRAMES_MASK];
+            ticks[*count] = frame->tick;
+            sizes[*count] = frame->size;
+            buffers[*count] = frame->buffer;
+            (*count)++;
+        }
+        *dropped = trace_frames_dropped;
     }
     return wait_error;
 }
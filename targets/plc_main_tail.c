@@ -127,7 +127,7 @@ uint32_t GetLogMessage(uint8_t level, uint32_t msgidx, char* buf, uint32_t max_s
             *tick = tail.tick; 
             *tv_sec = tail.time.tv_sec; 
             *tv_nsec = tail.time.tv_nsec; 
-            copy_from_log(level, sbuffpos, buf, 
+            copy_from_log(level, sbuffpos, buf,
                           totalsize > max_size ? max_size : totalsize);
             return totalsize;
         }
@@ -135,6 +135,57 @@ uint32_t GetLogMessage(uint8_t level, uint32_t msgidx, char* buf, uint32_t max_s
     return 0;
 }
 
+/* Record header of messages returned by GetLogMessages */
+typedef struct {
+    uint32_t msgidx;
+    uint32_t msgsize;
+    uint32_t tick;
+    uint32_t tv_sec;
+    uint32_t tv_nsec;
+} log_record_t;
+
+/* Copy messages from_msgidx to from_msgidx + count - 1 in buf, newest first,
+   each as a log_record_t header followed by message body.
+   Stops at first overwritten message or when buf is full.
+   Return used size of buf */
+uint32_t GetLogMessages(uint8_t level, uint32_t from_msgidx, uint32_t count, char* buf, uint32_t max_size){
+    uint64_t cursor = LogCursor[level];
+    uint32_t used = 0;
+    if(cursor && count){
+        uint32_t stailpos = (uint32_t)cursor;
+        uint32_t smsgidx;
+        uint64_t end_msgidx = (uint64_t)from_msgidx + count;
+        mTail tail;
+        tail.msgidx = cursor >> 32;
+        tail.msgsize = 0;
+
+        /* Same search loop as GetLogMessage, copying messages on the way */
+        while(tail.msgidx > from_msgidx){
+            smsgidx = tail.msgidx;
+            stailpos = (stailpos - sizeof(mTail) - tail.msgsize ) & LOG_BUFFER_MASK;
+            copy_from_log(level, stailpos, &tail, sizeof(mTail));
+            if(tail.msgidx != smsgidx - 1)
+                break;
+            if(tail.msgidx < end_msgidx){
+                log_record_t record;
+                if(used + sizeof(log_record_t) + tail.msgsize > max_size)
+                    break;
+                record.msgidx = tail.msgidx;
+                record.msgsize = tail.msgsize;
+                record.tick = tail.tick;
+                record.tv_sec = tail.time.tv_sec;
+                record.tv_nsec = tail.time.tv_nsec;
+                memcpy(buf + used, &record, sizeof(log_record_t));
+                used += sizeof(log_record_t);
+                copy_from_log(level, (stailpos - tail.msgsize) & LOG_BUFFER_MASK,
+                              buf + used, tail.msgsize);
+                used += tail.msgsize;
+            }
+        }
+    }
+    return used;
+}
+
 #endif
 
 #ifndef TARGET_EXT_SYNC_DISABLE
@@ -27,10 +27,13 @@
 
 import os
 import re
-import operator
+import json
 import hashlib
-from functools import reduce
+from collections import deque
+from queue import Queue, Empty
+from time import time
 from util.ProcessLogger import ProcessLogger
+from util.ObjectCache import ObjectCache
 
 
 includes_re = re.compile(r'\s*#include\s*["<]([^">]*)[">].*')
@@ -45,6 +48,7 @@ class toolchain_gcc(object):
     def __init__(self, CTRInstance):
         self.CTRInstance = CTRInstance
         self.buildpath = None
+        self.objcache = ObjectCache()
         self.SetBuildPath(self.CTRInstance._getBuildPath())
 
     def getBuilderCFLAGS(self):
@@ -82,6 +86,15 @@ class toolchain_gcc(object):
         """
         return self.CTRInstance.GetTarget().getcontent().getLinker()
 
+    def getJobs(self):
+        """
+        Returns max number of concurrent C compilations
+        """
+        jobs = self.CTRInstance.GetTarget().getcontent().getJobs()
+        if not jobs:
+            jobs = os.cpu_count() or 1
+        return max(1, jobs)
+
     def GetBinaryPath(self):
         return self.bin_path
 
@@ -110,7 +123,9 @@ class toolchain_gcc(object):
             self.bin = self.CTRInstance.GetProjectName() + self.extension
             self.bin_path = os.path.join(self.buildpath, self.bin)
             self.md5key = None
-            self.srcmd5 = {}
+            # source hashes and deps, as of last build
+            self.srcmd5 = self._LoadDeps()
+            self.depsmatch = {}
 
     def append_cfile_deps(self, src, deps):
         for l in src.splitlines():
@@ -120,44 +135,158 @@ class toolchain_gcc(object):
                 if os.path.exists(os.path.join(self.buildpath, depfn)):
                     deps.append(depfn)
 
-    def concat_deps(self, bn):
-        # read source
-        src = open(os.path.join(self.buildpath, bn), "r").read()
-        # update direct dependencies
-        deps = []
-        self.append_cfile_deps(src, deps)
-        # recurse through deps
-        # TODO detect cicular deps.
-        return reduce(operator.concat, list(map(self.concat_deps, deps)), src)
-
     def check_and_update_hash_and_deps(self, bn):
+        # Already checked during this build
+        match = self.depsmatch.get(bn)
+        if match is not None:
+            return match
+        srcpath = os.path.join(self.buildpath, bn)
+        st = os.stat(srcpath)
         # Get latest computed hash and deps
-        oldhash, deps = self.srcmd5.get(bn, (None, []))
-        # read source
-        src = open(os.path.join(self.buildpath, bn)).read()
-        # compute new hash
-        newhash = hashlib.md5(src.encode()).hexdigest()
-        # compare
-        match = (oldhash == newhash)
-        if not match:
-            # file have changed
-            # update direct dependencies
-            deps = []
-            self.append_cfile_deps(src, deps)
-            # store that hashand deps
-            self.srcmd5[bn] = (newhash, deps)
+        oldhash, deps, mtime, size = self.srcmd5.get(bn, (None, [], None, None))
+        if oldhash is not None and (mtime, size) == (st.st_mtime_ns, st.st_size):
+            # file untouched, no need to read it
+            match = True
+        else:
+            # read source
+            src = open(srcpath).read()
+            # compute new hash
+            newhash = hashlib.md5(src.encode()).hexdigest()
+            # compare
+            match = (oldhash == newhash)
+            if not match:
+                # file have changed
+                # update direct dependencies
+                deps = []
+                self.append_cfile_deps(src, deps)
+            # store that hash and deps
+            self.srcmd5[bn] = (newhash, deps, st.st_mtime_ns, st.st_size)
+        # provisional result, for circular deps
+        self.depsmatch[bn] = match
         # recurse through deps
-        # TODO detect cicular deps.
-        return reduce(operator.and_, list(map(self.check_and_update_hash_and_deps, deps)), match)
+        for dep in deps:
+            match = self.check_and_update_hash_and_deps(dep) and match
+        self.depsmatch[bn] = match
+        return match
+
+    def _GetDepsFileName(self):
+        return os.path.join(self.buildpath, "lastbuildDeps.json")
+
+    def _LoadDeps(self):
+        try:
+            with open(self._GetDepsFileName(), "r") as f:
+                return dict((bn, tuple(entry)) for bn, entry in json.load(f).items())
+        except (OSError, ValueError):
+            return {}
+
+    def _SaveDeps(self):
+        try:
+            with open(self._GetDepsFileName(), "w") as f:
+                json.dump(self.srcmd5, f)
+        except OSError:
+            pass
 
     def calc_source_md5(self):
-        wholesrcdata = ""
+        srcmd5 = hashlib.md5()
+        visited = set()
+
+        def hash_deps(bn):
+            if bn in visited:
+                return
+            visited.add(bn)
+            src = open(os.path.join(self.buildpath, bn), "rb").read()
+            srcmd5.update(src)
+            deps = []
+            self.append_cfile_deps(src.decode(errors="replace"), deps)
+            for dep in deps:
+                hash_deps(dep)
+
         for _Location, CFilesAndCFLAGS, _DoCalls in self.CTRInstance.LocationCFilesAndCFLAGS:
             # Get CFiles list to give it to makefile
             for CFile, _CFLAGS in CFilesAndCFLAGS:
-                CFileName = os.path.basename(CFile)
-                wholesrcdata += self.concat_deps(CFileName)
-        return hashlib.md5(wholesrcdata).hexdigest()
+                hash_deps(os.path.basename(CFile))
+        return srcmd5.hexdigest()
+
+    def compile_objects(self, compilations):
+        """
+        Run given (bn, obn, command, objectfilename, cachekey) C
+        compilations, at most getJobs() at once. Objects compiled
+        successfully are stored in object cache with given key. Output
+        of each compilation is logged in one piece once it ends. First
+        failure cancels compilations still running or pending.
+        Return True if all compilations succeeded.
+        """
+        logger = self.CTRInstance.logger
+        pending = deque(compilations)
+        running = []
+        failed = []
+        jobs = self.getJobs()
+        # processes are queued by their finish callback as they end
+        finished = Queue()
+        profiler = self.CTRInstance.BuildProfiler
+        # compilations are traced as running in one of jobs tracks
+        free_tids = list(range(jobs, 0, -1))
+
+        start = time()
+        while running or (pending and not failed):
+            while pending and not failed and len(running) < jobs:
+                bn, obn, command, objectfilename, cachekey = pending.popleft()
+                depfilename = os.path.splitext(objectfilename)[0]+".d"
+                command += " -MD -MF \"%s\"" % depfilename
+                running.append((bn, obn, objectfilename, cachekey,
+                                (free_tids.pop(), profiler.Now()), ProcessLogger(
+                                    None, command,
+                                    finish_callback=lambda proc, *args: finished.put(proc))))
+
+            try:
+                ended = [finished.get(timeout=1.0)]
+            except Empty:
+                ended = []
+            while not finished.empty():
+                ended.append(finished.get())
+            logger.progress("%.3fs" % (time() - start))
+
+            for compilation in [c for c in running if c[5] in ended]:
+                bn, obn, objectfilename, cachekey, (tid, started), proc = compilation
+                # finish callback runs before output is fully collected
+                proc.finishsem.acquire()
+                running.remove(compilation)
+                free_tids.append(tid)
+                profiler.AddSpan(bn, "CC", started, profiler.Now() - started,
+                                 tid=tid, file=obn)
+                logger.write("   [CC]  "+bn+" -> "+obn+"\n")
+                output, errors = "".join(proc.outdata), "".join(proc.errdata)
+                if output:
+                    logger.write(output)
+                if errors:
+                    logger.write_warning(errors)
+                if proc.exitcode != 0:
+                    logger.write(proc.Command_str + "\n")
+                    logger.write_warning(_("exited with status {a1} (pid {a2})\n").format(
+                        a1=str(proc.exitcode), a2=str(proc.Proc.pid)))
+                    logger.write_error(_("C compilation of %s failed.\n") % bn)
+                    failed.append(bn)
+                else:
+                    self.objcache.Store(
+                        cachekey, objectfilename,
+                        os.path.splitext(objectfilename)[0]+".d")
+
+            if failed and running:
+                # cancel others, they are already hashed as up to date
+                for bn, _obn, _objectfilename, _cachekey, _trace, proc in running:
+                    proc.kill()
+                    proc.finishsem.acquire()
+                    failed.append(bn)
+                running = []
+
+        if failed:
+            # forget hashes of sources not compiled, so that they get
+            # compiled next time
+            failed.extend(compilation[0] for compilation in pending)
+            for bn in failed:
+                self.srcmd5.pop(bn, None)
+            return False
+        return True
 
     def build(self):
         # Retrieve compiler and linker
@@ -166,9 +295,15 @@ class toolchain_gcc(object):
 
         Builder_CFLAGS = ' '.join(self.getBuilderCFLAGS())
 
+        # sources may have been generated again since last build
+        self.objcache.ForgetFileHashes()
+        self.depsmatch = {}
+        hits, misses = self.objcache.GetStats()
+
         # ----------------- GENERATE OBJECT FILES ------------------------
         obns = []
         objs = []
+        compilations = []
         relink = not os.path.exists(self.bin_path)
         for Location, CFilesAndCFLAGS, _DoCalls in self.CTRInstance.LocationCFilesAndCFLAGS:
             if CFilesAndCFLAGS:
@@ -183,31 +318,42 @@ class toolchain_gcc(object):
                     obn = os.path.splitext(bn)[0]+".o"
                     objectfilename = os.path.splitext(CFile)[0]+".o"
 
-                    match = self.check_and_update_hash_and_deps(bn)
+                    match = self.check_and_update_hash_and_deps(bn) and \
+                        os.path.exists(objectfilename)
 
                     if match:
                         self.CTRInstance.logger.write("   [pass]  "+bn+" -> "+obn+"\n")
                     else:
                         relink = True
-
-                        self.CTRInstance.logger.write("   [CC]  "+bn+" -> "+obn+"\n")
-
-                        status, _result, _err_result = ProcessLogger(
-                            self.CTRInstance.logger,
-                            "\"%s\" -c \"%s\" -o \"%s\" -O2 %s %s" %
+                        command = "\"%s\" -c \"%s\" -o \"%s\" -O2 %s %s" % \
                             (self.compiler, CFile, objectfilename, Builder_CFLAGS, CFLAGS)
-                        ).spin()
-
-                        if status:
-                            self.srcmd5.pop(bn)
-                            self.CTRInstance.logger.write_error(_("C compilation of %s failed.\n") % bn)
-                            return False
+                        cachekey = self.objcache.GetKey(command, CFile, self.compiler)
+                        if self.objcache.Restore(cachekey, objectfilename):
+                            self.CTRInstance.logger.write("   [cache]  "+bn+" -> "+obn+"\n")
+                        else:
+                            compilations.append((
+                                bn, obn, command, objectfilename, cachekey))
                     obns.append(obn)
                     objs.append(objectfilename)
                 elif CFile.endswith(".o"):
                     obns.append(os.path.basename(CFile))
                     objs.append(CFile)
 
+        compiled = True
+        if compilations:
+            compiled = self.compile_objects(compilations)
+            self.objcache.Evict()
+        self._SaveDeps()
+        if not compiled:
+            return False
+
+        hits, misses = [total - before for total, before in
+                        zip(self.objcache.GetStats(), (hits, misses))]
+        if hits or misses:
+            self.CTRInstance.logger.write(
+                _("Object cache : {a1} hit(s), {a2} miss(es)\n").format(
+                    a1=hits, a2=misses))
+
         # ---------------- GENERATE OUTPUT FILE --------------------------
         # Link all the object files into one binary file
         self.CTRInstance.logger.write(_("Linking :\n"))
@@ -219,14 +365,15 @@ class toolchain_gcc(object):
 
             self.CTRInstance.logger.write("   [CC]  " + ' '.join(obns)+" -> " + self.bin + "\n")
 
-            status, _result, _err_result = ProcessLogger(
-                self.CTRInstance.logger,
-                "\"%s\" %s -o \"%s\" %s" %
-                (self.linker,
-                 listobjstring,
-                 self.bin_path,
-                 ALLldflags)
-            ).spin()
+            with self.CTRInstance.BuildProfiler.Span("Link", "phase", file=self.bin):
+                status, _result, _err_result = ProcessLogger(
+                    self.CTRInstance.logger,
+                    "\"%s\" %s -o \"%s\" %s" %
+                    (self.linker,
+                     listobjstring,
+                     self.bin_path,
+                     ALLldflags)
+                ).spin()
 
             if status:
                 return False
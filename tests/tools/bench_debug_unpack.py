@@ -0,0 +1,171 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz, a Integrated Development Environment for
+# programming IEC 61131-3 automates supporting plcopen standard and CanFestival.
+#
+# See COPYING file for copyrights details.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Micro-benchmark of debug trace buffers unpacking.
+
+Compares per variable ctypes unpacking, as formerly done by
+runtime.typemapping.UnpackDebugBuffer, with DebugBufferLayout, and
+complete buffers unpacking with DebugDeltaDecoder, when few variables
+change between frames.
+
+usage: python tests/tools/bench_debug_unpack.py [variables] [frames]
+"""
+
+import os
+import sys
+import random
+import struct
+from ctypes import cast, c_char_p, c_void_p, POINTER, sizeof
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from runtime.typemapping import TypeTranslator, GetDebugBufferLayout, \
+    DebugDeltaDecoder, DEBUG_DELTA_HEADER_SIZE  # noqa: E402
+
+
+def LegacyUnpackDebugBuffer(buff, indexes, calc_string_size):
+    res = []
+    buffoffset = 0
+    buffsize = len(buff)
+    buffptr = cast(cast(buff, c_char_p), c_void_p).value
+    for iectype in indexes:
+        c_type, unpack_func, _pack_func = TypeTranslator.get(iectype,
+                                                             (None, None, None))
+
+        cursor = c_void_p(buffptr + buffoffset)
+        if iectype == "STRING" and calc_string_size:
+            if (buffoffset + 1) <= buffsize:
+                size = 1 + cast(cursor, POINTER(c_type)).contents.len
+            else:
+                return None
+        else:
+            size = sizeof(c_type)
+
+        if c_type is not None and (buffoffset + size) <= buffsize:
+            ptr = cast(cursor, POINTER(c_type))
+            value = unpack_func(ptr.contents)
+            buffoffset += size
+            res.append(value)
+        else:
+            return None
+    if buffoffset and buffoffset == buffsize:
+        return res
+    return None
+
+
+def RandomValue(iectype):
+    if iectype == "BOOL":
+        return struct.pack("=B", random.randint(0, 1))
+    if iectype == "STRING":
+        body = b"x" * random.randint(0, 20)
+        return struct.pack("=B", len(body)) + body
+    fmt = {"INT": "=h", "DINT": "=i", "REAL": "=f", "LREAL": "=d"}[iectype]
+    if iectype in ("REAL", "LREAL"):
+        return struct.pack(fmt, random.random())
+    return struct.pack(fmt, random.randint(-1000, 1000))
+
+
+def MakeTraces(iectypes, nframes):
+    return [(tick, b"".join(RandomValue(t) for t in iectypes))
+            for tick in range(nframes)]
+
+
+def Bench(label, iectypes, nframes):
+    traces = MakeTraces(iectypes, nframes)
+
+    start = default_timer()
+    legacy = [LegacyUnpackDebugBuffer(buff, iectypes, True)
+              for _tick, buff in traces]
+    legacy_time = default_timer() - start
+
+    start = default_timer()
+    layout = GetDebugBufferLayout(iectypes, True)
+    ticks, columns, rejected = layout.UnpackTraces(traces)
+    layout_time = default_timer() - start
+
+    assert rejected == 0 and len(ticks) == nframes
+    assert [list(row) for row in zip(*columns)] == legacy
+
+    print("%-24s legacy %8.2f ms   layout %8.2f ms   x%.1f" % (
+        label, legacy_time * 1000, layout_time * 1000,
+        legacy_time / layout_time))
+
+
+def MakeDeltaTraces(iectypes, nframes, ratio):
+    """
+    Return complete traces and delta traces of same values, with given
+    ratio of variables, always the same ones, changing at each frame
+    """
+    values = [RandomValue(t) for t in iectypes]
+    changing = sorted(random.sample(range(len(iectypes)),
+                                    int(len(iectypes) * ratio)))
+    traces = []
+    deltas = []
+    for tick in range(nframes):
+        changed = range(len(iectypes)) if tick == 0 else changing
+        bitmap = 0
+        for i in changed:
+            values[i] = RandomValue(iectypes[i])
+            bitmap |= 1 << i
+        traces.append((tick, b"".join(values)))
+        deltas.append((tick, b"".join(
+            [tick.to_bytes(DEBUG_DELTA_HEADER_SIZE, "little"),
+             bitmap.to_bytes((len(iectypes) + 7) // 8, "little")] +
+            [values[i] for i in changed])))
+    return traces, deltas
+
+
+def BenchDelta(label, iectypes, nframes, ratio):
+    traces, deltas = MakeDeltaTraces(iectypes, nframes, ratio)
+
+    start = default_timer()
+    layout = GetDebugBufferLayout(iectypes, True)
+    expected = layout.UnpackTraces(traces)
+    layout_time = default_timer() - start
+
+    start = default_timer()
+    decoded = DebugDeltaDecoder(iectypes, True).Decode(deltas)
+    delta_time = default_timer() - start
+
+    assert decoded == expected
+
+    print("%-24s layout %8.2f ms   delta  %8.2f ms   x%.1f" % (
+        label, layout_time * 1000, delta_time * 1000,
+        layout_time / delta_time))
+
+
+if __name__ == '__main__':
+    nvars = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+    nframes = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    random.seed(0)
+    fixed = [random.choice(["BOOL", "INT", "DINT", "REAL", "LREAL"])
+             for _i in range(nvars)]
+    with_strings = list(fixed)
+    for i in range(0, nvars, 50):
+        with_strings[i] = "STRING"
+    print("%d variables, %d frames" % (nvars, nframes))
+    Bench("fixed size types", fixed, nframes)
+    Bench("with strings", with_strings, nframes)
+    BenchDelta("5% changes", with_strings, nframes, 0.05)
+    BenchDelta("all changes", with_strings, nframes, 1.0)
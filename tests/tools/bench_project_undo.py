@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz, a Integrated Development Environment for
+# programming IEC 61131-3 automates supporting plcopen standard and CanFestival.
+#
+# See COPYING file for copyrights details.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Benchmark of project undo buffering on a large generated project.
+
+POUs of given project (default: first_steps example) are copied until project
+has the given count of POUs. A few edits are buffered, undone and redone, and
+timings are compared with former full project dump and reload.
+
+usage: python tests/tools/bench_project_undo.py [pous] [plc.xml]
+"""
+
+import os
+import sys
+import shutil
+import tempfile
+from copy import deepcopy
+from timeit import default_timer
+
+beremiz_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.insert(0, beremiz_dir)
+
+import fake_wx  # noqa: E402, F401
+# controls first, as PLCControler and graphics import each other
+import controls  # noqa: E402, F401
+from PLCControler import PLCControler, GetProjectState  # noqa: E402
+from plcopen import PLCOpenParser  # noqa: E402
+
+
+def Timed(func, *args):
+    start = default_timer()
+    res = func(*args)
+    return default_timer() - start, res
+
+
+def GrowProject(project, count):
+    pous = project.getpous()
+    idx = 0
+    while len(project.getpous()) < count:
+        pou = deepcopy(pous[idx % len(pous)])
+        pou.setname("%s_%d" % (pou.getname(), idx))
+        project.insertpou(len(project.getpous()), pou)
+        idx += 1
+
+
+def CountChildren(states):
+    children = set()
+    for state in states:
+        stack = [state]
+        while stack:
+            for entry in stack.pop():
+                if isinstance(entry, tuple):
+                    stack.append(entry[1])
+                else:
+                    children.add(id(entry))
+    return len(children)
+
+
+def main(count, filepath):
+    tmpdir = tempfile.mkdtemp()
+    try:
+        shutil.copy(filepath, tmpdir)
+        controler = PLCControler()
+        error = controler.OpenXMLFile(os.path.join(tmpdir, os.path.basename(filepath)))
+        if error is not None:
+            print("can't open %s: %s" % (filepath, error))
+            return 1
+    finally:
+        shutil.rmtree(tmpdir)
+
+    project = controler.Project
+    GrowProject(project, count)
+    controler.CreateProjectBuffer(False)
+    xml = PLCOpenParser.Dumps(project)
+    print("%d POUs, %.1f MB" % (len(project.getpous()), len(xml) / 1e6))
+
+    legacy_dump, _ = Timed(PLCOpenParser.Dumps, project)
+    legacy_load, _ = Timed(PLCOpenParser.Loads, xml)
+
+    edits = 5
+    buffering = 0.
+    for idx, pou in enumerate(project.getpous()[:edits]):
+        pou.setdescription("Edit %d" % idx)
+        elapsed, _ = Timed(controler.BufferProject)
+        buffering += elapsed
+    undo = sum(Timed(controler.LoadPrevious)[0] for _idx in range(edits))
+    redo = sum(Timed(controler.LoadNext)[0] for _idx in range(edits))
+    states = controler.ProjectBuffer.Buffer[:edits + 1]
+
+    print("buffer: %.3f s per edit (full dump: %.3f s)" % (
+        buffering / edits, legacy_dump))
+    print("undo: %.3f s, redo: %.3f s per edit (full reload: %.3f s)" % (
+        undo / edits, redo / edits, legacy_load))
+    print("%d states hold %d serialized children (full dumps: %d copies)" % (
+        len(states), CountChildren(states), len(states)))
+    if GetProjectState(project) != states[-1]:
+        print("project differs from last state after redo")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 1200,
+        sys.argv[2] if len(sys.argv) > 2 else
+        os.path.join(beremiz_dir, "exemples", "first_steps", "plc.xml")))
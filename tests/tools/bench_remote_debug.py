@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz, a Integrated Development Environment for
+# programming IEC 61131-3 automates supporting plcopen standard and CanFestival.
+#
+# See COPYING file for copyrights details.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Benchmark of remote debug polling against a fake Modbus TCP target.
+
+The fake target answers DEBUG_GET_LIST requests after a simulated one way
+link latency. Compares one request per round trip, as formerly done by
+PLCObject's trace thread, with pipelined RemoteDebugClient.send_requests.
+
+usage: python tests/tools/bench_remote_debug.py [variables] [latency_ms] [polls]
+"""
+
+import os
+import sys
+import socket
+import struct
+import threading
+import time
+from timeit import default_timer
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from runtime.openplc_debugger import RemoteDebugClient, DebugResponse  # noqa: E402
+
+
+class FakeTarget(object):
+    """
+    Modbus TCP target answering DEBUG_GET_LIST with 4 bytes per variable,
+    delaying each response by given latency without serializing requests
+    """
+
+    def __init__(self, latency):
+        self.latency = latency
+        self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server.bind(("127.0.0.1", 0))
+        self.server.listen(1)
+        self.port = self.server.getsockname()[1]
+        self.outgoing = queue.Queue()
+        self.tick = 0
+        thread = threading.Thread(target=self.Serve)
+        thread.daemon = True
+        thread.start()
+
+    def Serve(self):
+        conn, _addr = self.server.accept()
+        conn.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        writer = threading.Thread(target=self.Write, args=(conn,))
+        writer.daemon = True
+        writer.start()
+        stream = conn.makefile("rb")
+        while True:
+            header = stream.read(7)
+            if len(header) < 7:
+                break
+            transaction_id, _protocol_id, length, unit = struct.unpack(">HHHB", header)
+            pdu = stream.read(length - 1)
+            self.outgoing.put((time.time() + self.latency,
+                               self.Answer(transaction_id, unit, pdu)))
+
+    def Answer(self, transaction_id, unit, pdu):
+        function_code = pdu[0:1]
+        count = struct.unpack(">H", pdu[1:3])[0]
+        indexes = struct.unpack(">%dH" % count, pdu[3:3 + 2 * count])
+        self.tick += 1
+        data = b"".join([struct.pack(">I", idx) for idx in indexes])
+        body = function_code + struct.pack(">BHIH", DebugResponse.SUCCESS,
+                                           indexes[-1], self.tick, len(data)) + data
+        return struct.pack(">HHHB", transaction_id, 0, len(body) + 1, unit) + body
+
+    def Write(self, conn):
+        while True:
+            due, response = self.outgoing.get()
+            delay = due - time.time()
+            if delay > 0:
+                time.sleep(delay)
+            conn.sendall(response)
+
+
+def Batches(nvars, batch_size):
+    indexes = list(range(nvars))
+    return [indexes[i:i + batch_size] for i in range(0, nvars, batch_size)]
+
+
+def Sequential(client, batches):
+    return [client.send_debug_get_list_query(len(batch), batch) for batch in batches]
+
+
+def Pipelined(client, batches):
+    return client.send_requests([client.debug_get_list_request(batch) for batch in batches])
+
+
+def Bench(label, poll, client, batches, polls):
+    start = default_timer()
+    for _i in range(polls):
+        responses = poll(client, batches)
+        assert None not in responses
+    elapsed = default_timer() - start
+    print("%-12s %8.2f ms per poll" % (label, elapsed * 1000 / polls))
+    return elapsed
+
+
+if __name__ == '__main__':
+    nvars = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    latency = float(sys.argv[2]) / 1000 if len(sys.argv) > 2 else 0.005
+    polls = int(sys.argv[3]) if len(sys.argv) > 3 else 20
+
+    target = FakeTarget(latency)
+    client = RemoteDebugClient('TCP', host="127.0.0.1", port=target.port)
+    client.connect()
+    batches = Batches(nvars, 60)
+    print("%d variables in %d batches, %.1f ms link latency" % (
+        nvars, len(batches), latency * 1000))
+    sequential = Bench("sequential", Sequential, client, batches, polls)
+    pipelined = Bench("pipelined", Pipelined, client, batches, polls)
+    print("x%.1f, smoothed RTT %.2f ms" % (sequential / pipelined, client.rtt * 1000))
+    client.disconnect()
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz, a Integrated Development Environment for
+# programming IEC 61131-3 automates supporting plcopen standard and CanFestival.
+#
+# See COPYING file for copyrights details.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Benchmark of remote debug polling against a fake Modbus RTU board on a pty.
+
+The fake board answers DEBUG_GET_LIST requests, pacing its output at the
+given baud rate. Compares the former fixed 30 ms timeout read with
+RemoteDebugClient's length-aware RTU framing. POSIX only.
+
+usage: python tests/tools/bench_remote_rtu.py [variables] [baudrate] [seconds]
+"""
+
+import os
+import sys
+import pty
+import struct
+import threading
+import time
+from timeit import default_timer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", ".."))
+
+from runtime.openplc_debugger import RemoteDebugClient, FunctionCode, DebugResponse, \
+    RTU_CHAR_BITS  # noqa: E402
+
+
+class FakeBoard(object):
+    """
+    Modbus RTU board answering DEBUG_GET_LIST with 4 bytes per variable
+    """
+
+    def __init__(self, baudrate):
+        self.char_time = RTU_CHAR_BITS / baudrate
+        self.master, self.slave = pty.openpty()
+        self.port = os.ttyname(self.slave)
+        # only used to compute CRCs
+        self.crc = RemoteDebugClient('RTU', baudrate=baudrate)._calculate_crc
+        self.tick = 0
+        thread = threading.Thread(target=self.Serve)
+        thread.daemon = True
+        thread.start()
+
+    def Read(self, size):
+        data = b''
+        while len(data) < size:
+            data += os.read(self.master, size - len(data))
+        return data
+
+    def Serve(self):
+        while True:
+            slave_id, function_code = struct.unpack(">BB", self.Read(2))
+            assert function_code == FunctionCode.DEBUG_GET_LIST
+            count = struct.unpack(">H", self.Read(2))[0]
+            indexes = struct.unpack(">%dH" % count, self.Read(2 * count))
+            self.Read(2)  # CRC
+            self.tick += 1
+            data = b"".join([struct.pack(">I", idx) for idx in indexes])
+            frame = struct.pack(">BBBHIH", slave_id, function_code,
+                                DebugResponse.SUCCESS, indexes[-1],
+                                self.tick, len(data)) + data
+            frame += struct.pack(">H", self.crc(frame))
+            # pace output as a real serial line would
+            for i in range(0, len(frame), 16):
+                chunk = frame[i:i + 16]
+                time.sleep(len(chunk) * self.char_time)
+                os.write(self.master, chunk)
+
+
+def LegacyExchange(client, request):
+    """ RTU exchange as formerly done by RemoteDebugClient """
+    client.serial.timeout = 0.03
+    client.serial.write(request)
+    response = client.serial.read(1024)
+    if response is None or len(response) < 2:
+        return None
+    return b'\x00\x00\x00\x00\x00\x00' + response[:-2]
+
+
+def Bench(label, poll, client, batches, seconds):
+    polls = complete = 0
+    start = default_timer()
+    while default_timer() - start < seconds:
+        responses = poll(client, batches)
+        polls += 1
+        complete += all(response is not None and
+                        len(response) == 17 + 4 * len(batch)
+                        for response, batch in zip(responses, batches))
+        # let late bytes of cut responses arrive before next poll
+        time.sleep(0.001)
+        client.serial.reset_input_buffer()
+    elapsed = default_timer() - start
+    print("%-8s %7.1f polls/s   %5.1f %% complete" % (
+        label, polls / elapsed, 100.0 * complete / polls))
+
+
+def Legacy(client, batches):
+    return [LegacyExchange(client, client._assemble_modbus_request(
+        *client.debug_get_list_request(batch))) for batch in batches]
+
+
+def Framed(client, batches):
+    return client.send_requests([client.debug_get_list_request(batch) for batch in batches])
+
+
+if __name__ == '__main__':
+    nvars = int(sys.argv[1]) if len(sys.argv) > 1 else 40
+    baudrate = int(sys.argv[2]) if len(sys.argv) > 2 else 115200
+    seconds = float(sys.argv[3]) if len(sys.argv) > 3 else 3
+
+    board = FakeBoard(baudrate)
+    client = RemoteDebugClient('RTU', serial_port=board.port, baudrate=baudrate)
+    client.connect()
+    indexes = list(range(nvars))
+    batches = [indexes[i:i + 20] for i in range(0, nvars, 20)]
+    print("%d variables in %d batches, %d bauds" % (nvars, len(batches), baudrate))
+    # legacy reads leave the board with a backlog of requests, run it last
+    Bench("after", Framed, client, batches, seconds)
+    Bench("before", Legacy, client, batches, seconds)
+    client.disconnect()
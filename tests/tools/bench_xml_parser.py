@@ -0,0 +1,127 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz, a Integrated Development Environment for
+# programming IEC 61131-3 automates supporting plcopen standard and CanFestival.
+#
+# See COPYING file for copyrights details.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Benchmark of XSD generated parser element class lookup on a large project.
+
+POUs of given project (default: first_steps example) are copied until project
+has the given count of elements. Project is parsed, and proxies are created
+for all its elements, with former element class lookup, that resolved class
+from tags for each element, and with XMLElementClassLookUp.
+
+usage: python tests/tools/bench_xml_parser.py [elements] [plc.xml]
+"""
+
+import os
+import sys
+from copy import deepcopy
+from timeit import default_timer
+
+beremiz_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.insert(0, beremiz_dir)
+
+from lxml import etree  # noqa: E402
+from xmlclass.xmlclass import XMLElementClassLookUp  # noqa: E402
+from plcopen.plcopen import PLCOpenParser, LoadProject  # noqa: E402
+
+
+class LegacyElementClassLookUp(XMLElementClassLookUp):
+
+    def lookup(self, document, element):
+        element_class = self.GetLookupResult(element)
+        if element_class is not None:
+            return element_class
+
+        parent = element.getparent()
+        element_class = self.GetElementClass(
+            element.tag, parent.tag if parent is not None else None)
+        if isinstance(element_class, list):
+            children = "".join([
+                "%s " % etree.QName(child.tag).localname
+                for child in element])
+            for possible_class in element_class:
+                if isinstance(possible_class, str):
+                    possible_class = self.GetElementClass(possible_class)
+                if possible_class.StructurePattern.match(children) is not None:
+                    return possible_class
+            return element_class[0]
+        return element_class
+
+
+def GrowProject(project, count):
+    pous = project.getpous()
+    elements = sum(1 for _element in project.iter())
+    idx = 0
+    while elements < count:
+        pou = deepcopy(pous[idx % len(pous)])
+        pou.setname("%s_%d" % (pou.getname(), idx))
+        project.insertpou(len(project.getpous()), pou)
+        elements += sum(1 for _element in pou.iter())
+        idx += 1
+
+
+def Bench(lookup_class, xml, repeat=5):
+    PLCOpenParser.set_element_class_lookup(
+        lookup_class(PLCOpenParser.ClassLookup.LookUpClasses))
+    parsing = proxies = float("inf")
+    for _idx in range(repeat):
+        start = default_timer()
+        project = PLCOpenParser.Loads(xml)
+        parsed = default_timer()
+        classes = [element.__class__ for element in project.iter()]
+        end = default_timer()
+        parsing = min(parsing, parsed - start)
+        proxies = min(proxies, end - parsed)
+    return parsing, proxies, classes
+
+
+def main(count, filepath):
+    project, error = LoadProject(filepath)
+    if error is not None:
+        print("can't open %s: %s" % (filepath, error))
+        return 1
+    GrowProject(project, count)
+    xml = PLCOpenParser.Dumps(project)
+
+    lookup_class = PLCOpenParser.ClassLookup.__class__
+    try:
+        legacy_parsing, legacy_proxies, legacy_classes = Bench(LegacyElementClassLookUp, xml)
+        parsing, proxies, classes = Bench(lookup_class, xml)
+    finally:
+        PLCOpenParser.set_element_class_lookup(
+            lookup_class(PLCOpenParser.ClassLookup.LookUpClasses))
+
+    print("%d elements, %.1f MB" % (len(classes), len(xml) / 1e6))
+    print("parsing: %.3f s (legacy lookup: %.3f s)" % (parsing, legacy_parsing))
+    print("proxies for all elements: %.3f s (legacy lookup: %.3f s)" % (
+        proxies, legacy_proxies))
+    if classes != legacy_classes:
+        print("element classes differ from legacy lookup")
+        return 1
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 50000,
+        sys.argv[2] if len(sys.argv) > 2 else
+        os.path.join(beremiz_dir, "exemples", "first_steps", "plc.xml")))
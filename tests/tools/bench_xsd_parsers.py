@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz, a Integrated Development Environment for
+# programming IEC 61131-3 automates supporting plcopen standard and CanFestival.
+#
+# See COPYING file for copyrights details.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Benchmark of XSD parsers generation when loading many confnodes.
+
+Each confnode instance asks for a parser generated from its XSD, as
+py_ext confnodes do with py_ext_xsd.xsd. Given XSD files (default: PLCopen,
+py_ext and EtherCAT ones) are asked for by given count of nodes, with
+parsers generated for each node as formerly done, and shared by XSD hash as
+GenerateParserFromXSD does.
+
+usage: python tests/tools/bench_xsd_parsers.py [nodes] [file.xsd ...]
+"""
+
+import os
+import sys
+from xml.dom import minidom
+from timeit import default_timer
+
+beremiz_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.insert(0, beremiz_dir)
+
+from xmlclass.xsdschema import XSDClassFactory, GenerateParser, \
+    GenerateParserFromXSD, GeneratedParsers  # noqa: E402
+
+
+def LegacyGenerateParserFromXSD(filepath):
+    xsdfile = open(filepath, 'r')
+    xsdstring = xsdfile.read()
+    xsdfile.close()
+    cwd = os.getcwd()
+    os.chdir(os.path.dirname(filepath))
+    parser = GenerateParser(XSDClassFactory(minidom.parseString(xsdstring), filepath), xsdstring)
+    os.chdir(cwd)
+    return parser
+
+
+def Bench(generate, filepath, nodes):
+    GeneratedParsers.clear()
+    start = default_timer()
+    parsers = [generate(filepath) for _idx in range(nodes)]
+    return default_timer() - start, parsers
+
+
+def main(nodes, filepaths):
+    if not filepaths:
+        filepaths = [
+            os.path.join(beremiz_dir, "plcopen", "tc6_xml_v201.xsd"),
+            os.path.join(beremiz_dir, "py_ext", "py_ext_xsd.xsd"),
+            os.path.join(beremiz_dir, "etherlab", "EtherCATInfo.xsd"),
+            os.path.join(beremiz_dir, "etherlab", "EtherCATConfig.xsd")]
+    for filepath in filepaths:
+        legacy, _parsers = Bench(LegacyGenerateParserFromXSD, filepath, nodes)
+        shared, parsers = Bench(GenerateParserFromXSD, filepath, nodes)
+        print("%s: %d nodes in %.3f s (legacy: %.3f s), %d parser(s) generated" % (
+            os.path.basename(filepath), nodes, shared, legacy,
+            len(set(map(id, parsers)))))
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 20,
+        [os.path.abspath(filepath) for filepath in sys.argv[2:]]))
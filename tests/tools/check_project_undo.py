@@ -0,0 +1,133 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz, a Integrated Development Environment for
+# programming IEC 61131-3 automates supporting plcopen standard and CanFestival.
+#
+# See COPYING file for copyrights details.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Check that project restored by undo and redo, and compiled project snapshot,
+are serialized byte for byte as they were when buffered.
+
+Each given project (default: all examples and test projects) goes through a
+sequence of edits, then is undone and redone completely.
+
+usage: python tests/tools/check_project_undo.py [plc.xml ...]
+"""
+
+import os
+import sys
+import glob
+import shutil
+import tempfile
+
+beremiz_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "..")
+sys.path.insert(0, beremiz_dir)
+
+import fake_wx  # noqa: E402, F401
+# controls first, as PLCControler and graphics import each other
+import controls  # noqa: E402, F401
+from PLCControler import PLCControler  # noqa: E402
+from plcopen import PLCOpenParser  # noqa: E402
+
+
+def Edits(controler):
+    """
+    Yield after each edit of project, buffered
+    """
+    project = controler.Project
+    project.setname("Renamed")
+    controler.BufferProject()
+    yield
+    project.setcontentHeader({"author": "Someone"})
+    controler.BufferProject()
+    yield
+    for pou in project.getpous()[:2]:
+        pou.setdescription("Changed " + pou.getname())
+        controler.BufferProject()
+        yield
+    controler.ProjectAddPou("UndoCheckPrg", "program", "ST")
+    yield
+    controler.ProjectAddDataType("UndoCheckType")
+    yield
+    pous = project.getpous()
+    if len(pous) > 1:
+        controler.ProjectRemovePou(pous[0].getname())
+        yield
+
+
+def Transfer(controler):
+    controler.NextCompiledProject = controler.GetProjectSnapshot()
+    controler.ProgramTransferred()
+    return PLCOpenParser.Dumps(controler.Project)
+
+
+def CheckProject(filepath):
+    """
+    Return list of errors found for given project file
+    """
+    errors = []
+    tmpdir = tempfile.mkdtemp()
+    try:
+        shutil.copy(filepath, tmpdir)
+        controler = PLCControler()
+        error = controler.OpenXMLFile(os.path.join(tmpdir, os.path.basename(filepath)))
+        if error is not None:
+            return ["can't open: " + error]
+
+        states = [PLCOpenParser.Dumps(controler.Project)]
+        transferred = Transfer(controler)
+        for _step in Edits(controler):
+            states.append(PLCOpenParser.Dumps(controler.Project))
+            if PLCOpenParser.Dumps(controler.GetProject(True)) != transferred:
+                errors.append("compiled project differs after %d edits" % (len(states) - 1))
+            transferred = Transfer(controler)
+
+        for idx in range(len(states) - 2, -1, -1):
+            controler.LoadPrevious()
+            if PLCOpenParser.Dumps(controler.Project) != states[idx]:
+                errors.append("undo to state %d differs" % idx)
+            if PLCOpenParser.Dumps(controler.GetProject(True)) != transferred:
+                errors.append("compiled project differs after undo to state %d" % idx)
+        for idx in range(1, len(states)):
+            controler.LoadNext()
+            if PLCOpenParser.Dumps(controler.Project) != states[idx]:
+                errors.append("redo to state %d differs" % idx)
+            transferred = Transfer(controler)
+            if PLCOpenParser.Dumps(controler.GetProject(True)) != transferred:
+                errors.append("compiled project differs after redo to state %d" % idx)
+    finally:
+        shutil.rmtree(tmpdir)
+    return errors
+
+
+def main(filepaths):
+    if not filepaths:
+        filepaths = sorted(
+            glob.glob(os.path.join(beremiz_dir, "exemples", "*", "plc.xml")) +
+            glob.glob(os.path.join(beremiz_dir, "tests", "projects", "*", "plc.xml")))
+    failed = 0
+    for filepath in filepaths:
+        errors = CheckProject(filepath)
+        print("%s: %s" % (filepath, "; ".join(errors) if errors else "ok"))
+        failed += bool(errors)
+    return failed
+
+
+if __name__ == '__main__':
+    sys.exit(main(sys.argv[1:]) != 0)
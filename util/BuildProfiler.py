@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz, a Integrated Development Environment for
+# programming IEC 61131-3 automates supporting plcopen standard and CanFestival.
+#
+# See COPYING file for copyrights details.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Timing of build phases.
+
+Spans record wall time and CPU time of IDE process for each phase of a
+build. They are saved in Chrome trace event format, that can be opened
+with Perfetto UI or chrome://tracing.
+"""
+
+import os
+import json
+import time
+from threading import Lock, current_thread, main_thread
+from contextlib import contextmanager
+
+
+BUILD_TRACE_FILENAME = "build_trace.json"
+
+
+class BuildProfiler(object):
+    def __init__(self):
+        self.Lock = Lock()
+        # (name, category, start, duration, cpu, tid, args),
+        # times in seconds relative to profiler creation
+        self.Spans = []
+        self.Origin = time.perf_counter()
+
+    def Now(self):
+        return time.perf_counter() - self.Origin
+
+    @contextmanager
+    def Span(self, name, category, **args):
+        """
+        Record wall and CPU time spent in with statement body
+        """
+        start = self.Now()
+        cpu_start = time.process_time()
+        # spans of other threads, for example confnodes generated
+        # concurrently, are shown in their own row
+        thread = current_thread()
+        tid = 0 if thread is main_thread() else thread.ident
+        try:
+            yield
+        finally:
+            self.AddSpan(name, category, start, self.Now() - start,
+                         time.process_time() - cpu_start, tid, **args)
+
+    def AddSpan(self, name, category, start, duration, cpu=None, tid=0, **args):
+        """
+        Record span measured by caller, for example a compilation running
+        concurrently with others in its own tid
+        """
+        with self.Lock:
+            self.Spans.append((name, category, start, duration, cpu, tid, args))
+
+    def Save(self, path):
+        events = []
+        for name, category, start, duration, cpu, tid, args in self.Spans:
+            args = dict(args)
+            if cpu is not None:
+                args["cpu_ms"] = round(cpu * 1e3, 3)
+            events.append({
+                "name": name,
+                "cat": category,
+                "ph": "X",
+                "ts": round(start * 1e6),
+                "dur": round(duration * 1e6),
+                "pid": os.getpid(),
+                "tid": tid,
+                "args": args})
+        with open(path, "w") as f:
+            json.dump({"traceEvents": events,
+                       "displayTimeUnit": "ms"}, f)
+
+    def GetSummary(self, count=10):
+        """
+        Return text of the count longest spans, but whole build
+        """
+        spans = sorted((span for span in self.Spans if span[1] != "build"),
+                       key=lambda span: span[3], reverse=True)
+        lines = []
+        for name, category, _start, duration, cpu, _tid, args in spans[:count]:
+            detail = args.get("location", args.get("file"))
+            lines.append("   %8.3fs %s %s %s%s\n" % (
+                duration,
+                "%8.3fs" % cpu if cpu is not None else "        -",
+                category, name,
+                " (%s)" % detail if detail and detail != name else ""))
+        return "".join(lines)
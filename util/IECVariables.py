@@ -0,0 +1,254 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz, a Integrated Development Environment for
+# programming IEC 61131-3 automates supporting plcopen standard and CanFestival.
+#
+# See COPYING file for copyrights details.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Programs and variables of PLC, as listed in VARIABLES.csv by IEC2C compiler.
+
+CSV file is parsed in a single pass into compact records. Parsed columns are
+saved in a binary sidecar file next to CSV, keyed by CSV hash, so that
+loading variables again for an unchanged build doesn't parse CSV.
+"""
+
+import gc
+import sys
+import marshal
+import hashlib
+from array import array
+
+from runtime.typemapping import DebugTypesSize
+
+# bump when parsing or columns change, to ignore older sidecar files
+IEC_VARIABLES_CACHE_VERSION = 1
+
+
+class IECRecord(object):
+    """
+    Record with fixed fields, that can also be read like a dictionnary,
+    as libraries and templates expect. Fields missing in CSV line are None.
+    """
+    __slots__ = ()
+
+    def __getitem__(self, name):
+        value = getattr(self, name, None)
+        if value is None:
+            raise KeyError(name)
+        return value
+
+    def __contains__(self, name):
+        return getattr(self, name, None) is not None
+
+    def get(self, name, default=None):
+        value = getattr(self, name, None)
+        return default if value is None else value
+
+    def keys(self):
+        return [name for name in self.__slots__
+                if getattr(self, name) is not None]
+
+
+class IECProgram(IECRecord):
+    __slots__ = ("num", "C_path", "type")
+
+    def __init__(self, num, C_path, type=None):
+        self.num = num
+        self.C_path = C_path
+        self.type = type
+
+
+class IECVariable(IECRecord):
+    __slots__ = ("num", "vartype", "IEC_path", "C_path", "type", "derived", "retain")
+
+    def __init__(self, num, vartype, IEC_path, C_path, type=None,
+                 derived=None, retain=None):
+        self.num = num
+        self.vartype = vartype
+        self.IEC_path = IEC_path
+        self.C_path = C_path
+        self.type = type
+        self.derived = derived
+        self.retain = retain
+
+
+# fields with few distinct values, stored as table of values and indexes
+SHARED_FIELDS = ("vartype", "type", "derived", "retain")
+
+
+def _Columns(records, cls):
+    """
+    Return columns of records, one per field : fields unique to each record
+    are joined in a single string, others are stored as a table of distinct
+    values and an array of indexes in table
+    """
+    columns = []
+    for name in cls.__slots__:
+        values = [getattr(record, name) for record in records]
+        if name in SHARED_FIELDS:
+            table = list(dict.fromkeys(values))
+            index = {value: i for i, value in enumerate(table)}
+            columns.append(
+                (table, array("I", map(index.__getitem__, values)).tobytes()))
+        else:
+            columns.append("\n".join(values))
+    return columns
+
+
+def _Records(cls, columns, count):
+    values = []
+    for column in columns:
+        if isinstance(column, str):
+            values.append(column.split("\n") if count else [])
+        else:
+            table, indexes = column
+            column = array("I")
+            column.frombytes(indexes)
+            values.append(list(map(table.__getitem__, column)))
+    return list(map(cls, *values))
+
+
+class IECVariables(object):
+    def __init__(self):
+        self.Hash = None
+        self.Programs = []
+        self.Variables = []
+        # variables that can be debugged, index in this list is debug index
+        self.DbgVariables = []
+        self.IECPathToIdx = {}
+        self.Ticktime = 0
+
+    def Load(self, csvfile, cachefile=None):
+        """
+        Load CSV file, from cache file if it was written for same CSV
+        """
+        # records hold no reference cycles, don't let garbage collector
+        # scan them over and over while hundreds of thousands are created
+        gc_enabled = gc.isenabled()
+        gc.disable()
+        try:
+            self._Load(csvfile, cachefile)
+        finally:
+            if gc_enabled:
+                gc.enable()
+
+    def _Load(self, csvfile, cachefile):
+        with open(csvfile, "rb") as f:
+            data = f.read()
+        csvhash = hashlib.md5(data).hexdigest()
+        if cachefile is not None:
+            try:
+                with open(cachefile, "rb") as f:
+                    version, cachehash, columns = marshal.load(f)
+                if version == IEC_VARIABLES_CACHE_VERSION and cachehash == csvhash:
+                    self._FromColumns(*columns)
+                    self.Hash = csvhash
+                    return
+            except (OSError, EOFError, ValueError, TypeError):
+                pass
+        self._Parse(data.decode().splitlines())
+        self.Hash = csvhash
+        if cachefile is not None:
+            try:
+                with open(cachefile, "wb") as f:
+                    marshal.dump((IEC_VARIABLES_CACHE_VERSION, csvhash,
+                                  self._ToColumns()), f)
+            except OSError:
+                pass
+
+    def _Parse(self, lines):
+        section = -1
+        variables = []
+        config_FBs = {}
+        ticktime = None
+        intern = sys.intern
+        for line in lines:
+            line = line.strip()
+            if line.startswith("//"):
+                # Start new section
+                section += 1
+                continue
+            if not line or section < 0:
+                continue
+            fields = line.split(';')
+            if section == 0:
+                # programs
+                program = IECProgram(*fields[:3])
+                # Truncate "C_path" to remove conf an resources names
+                program.C_path = '__'.join(program.C_path.split(".", 2)[1:])
+                self.Programs.append(program)
+            elif section == 1:
+                # variables
+                if len(fields) >= 7:
+                    # types are shared by many variables
+                    variable = IECVariable(
+                        fields[0], intern(fields[1]), fields[2], fields[3],
+                        intern(fields[4]), intern(fields[5]), intern(fields[6]))
+                else:
+                    variable = IECVariable(*fields)
+                # Truncate "C_path" to remove conf an resources names
+                parts = variable.C_path.split(".", 2)
+                if len(parts) > 2:
+                    config_FB = config_FBs.get(tuple(parts[:2]))
+                    if config_FB:
+                        parts = [config_FB] + parts[2:]
+                        variable.C_path = '.'.join(parts)
+                    else:
+                        variable.C_path = '__'.join(parts[1:])
+                else:
+                    variable.C_path = '__'.join(parts)
+                    if variable.vartype == "FB":
+                        config_FBs[tuple(parts)] = variable.C_path
+                variables.append(variable)
+            elif section == 2 and ticktime is None:
+                ticktime = self.Ticktime = int(line)
+        if section < 1:
+            raise ValueError("Missing programs or variables section")
+        self._AddVariables(variables)
+
+    def _AddVariables(self, variables):
+        IECPathToIdx = self.IECPathToIdx
+        DbgVariables = self.DbgVariables
+        for variable in variables:
+            if variable.vartype != "FB" and variable.type in DebugTypesSize:
+                # Ignores numbers given in CSV file, count variables only
+                IECPathToIdx[variable.IEC_path] = len(DbgVariables)
+                DbgVariables.append(variable)
+        self.Variables.extend(variables)
+
+    def _ToColumns(self):
+        return (len(self.Programs), _Columns(self.Programs, IECProgram),
+                len(self.Variables), _Columns(self.Variables, IECVariable),
+                self.Ticktime)
+
+    def _FromColumns(self, programs_count, programs,
+                     variables_count, variables, ticktime):
+        self.Programs = _Records(IECProgram, programs, programs_count)
+        self._AddVariables(_Records(IECVariable, variables, variables_count))
+        self.Ticktime = ticktime
+
+    def GetDebugIdxAndType(self, IECPath):
+        """
+        Return debug index and IEC type of variable, (None, None) if it
+        can't be debugged
+        """
+        Idx = self.IECPathToIdx.get(IECPath)
+        if Idx is None:
+            return None, None
+        return Idx, self.DbgVariables[Idx].type
@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+# This file is part of Beremiz, a Integrated Development Environment for
+# programming IEC 61131-3 automates supporting plcopen standard and CanFestival.
+#
+# See COPYING file for copyrights details.
+#
+# This program is free software; you can redistribute it and/or
+# modify it under the terms of the GNU General Public License
+# as published by the Free Software Foundation; either version 2
+# of the License, or (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program; if not, write to the Free Software
+# Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+
+"""
+Content addressed cache of compiled object files, shared by all projects.
+
+Entries are keyed by a hash of compiler command, compiler executable identity
+and source file content.
+Each entry holds the object file and a manifest of the hashes of all files
+the source included when it was compiled, as listed by compiler's -MD
+dependency output. An entry is only used if these files are unchanged.
+
+Least recently used entries are evicted when cache grows over max size.
+"""
+
+import os
+import json
+import shutil
+import hashlib
+
+import util.paths as paths
+
+OBJECT_CACHE_MAX_SIZE = 512 << 20
+
+
+def GetObjectCachePath():
+    """
+    Return folder of object cache, BEREMIZ_OBJECT_CACHE if set in
+    environment, or a folder in user's cache directory.
+    """
+    path = os.environ.get("BEREMIZ_OBJECT_CACHE")
+    if path:
+        return path
+    return paths.UserCacheDir("objcache")
+
+
+def ParseDepFile(depfilename):
+    """
+    Return list of prerequisites in make rule written by compiler -MD
+    """
+    with open(depfilename, "r") as f:
+        data = f.read()
+    # keep escaped spaces in file names, join continued lines
+    data = data.replace("\\ ", "\0").replace("\\\n", " ")
+    _target, _sep, prerequisites = data.partition(": ")
+    return [dep.replace("\0", " ") for dep in prerequisites.split()]
+
+
+class ObjectCache(object):
+    def __init__(self, path=None, max_size=OBJECT_CACHE_MAX_SIZE):
+        self.path = GetObjectCachePath() if path is None else path
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # file and tool hashes, computed once per build
+        self.filehashes = {}
+        self.toolhashes = {}
+
+    def _EntryPath(self, key):
+        return os.path.join(self.path, key[:2], key)
+
+    def FileHash(self, filename):
+        filehash = self.filehashes.get(filename)
+        if filehash is None:
+            with open(filename, "rb") as f:
+                filehash = hashlib.md5(f.read()).hexdigest()
+            self.filehashes[filename] = filehash
+        return filehash
+
+    def ToolHash(self, tool):
+        """
+        Return identity of given executable, as found in PATH : its real
+        path, size and modification time, so that upgrading compiler in
+        place doesn't reuse objects it built before.
+        """
+        toolhash = self.toolhashes.get(tool)
+        if toolhash is None:
+            toolpath = shutil.which(tool) or tool
+            toolpath = os.path.realpath(toolpath)
+            try:
+                st = os.stat(toolpath)
+                toolhash = "%s:%d:%d" % (toolpath, st.st_size, st.st_mtime_ns)
+            except OSError:
+                toolhash = toolpath
+            self.toolhashes[tool] = toolhash
+        return toolhash
+
+    def ForgetFileHashes(self):
+        self.filehashes = {}
+        self.toolhashes = {}
+
+    def GetKey(self, command, srcfilename, compiler):
+        """
+        Return cache key of object produced by given compilation command
+        from given source file, with given compiler executable
+        """
+        key = hashlib.md5(command.encode())
+        key.update(self.ToolHash(compiler).encode())
+        key.update(self.FileHash(srcfilename).encode())
+        return key.hexdigest()
+
+    def Restore(self, key, objectfilename):
+        """
+        Copy cached object file with given key to objectfilename if all its
+        dependencies are unchanged. Return True on success.
+        """
+        entry = self._EntryPath(key)
+        try:
+            with open(os.path.join(entry, "manifest.json"), "r") as f:
+                manifest = json.load(f)
+            for depfilename, filehash in manifest.items():
+                if self.FileHash(depfilename) != filehash:
+                    break
+            else:
+                shutil.copyfile(os.path.join(entry, "object.o"), objectfilename)
+                # most recently used
+                os.utime(entry, None)
+                self.hits += 1
+                return True
+        except (OSError, ValueError):
+            pass
+        self.misses += 1
+        return False
+
+    def Store(self, key, objectfilename, depfilename):
+        """
+        Store object file freshly compiled, with dependencies listed in
+        given compiler dep file
+        """
+        entry = self._EntryPath(key)
+        try:
+            manifest = {}
+            for dep in ParseDepFile(depfilename):
+                # hash as written by compiler, not as cached before build
+                self.filehashes.pop(dep, None)
+                manifest[dep] = self.FileHash(dep)
+            if not os.path.isdir(entry):
+                os.makedirs(entry)
+            shutil.copyfile(objectfilename, os.path.join(entry, "object.o"))
+            # manifest written last, entry is not valid without it
+            with open(os.path.join(entry, "manifest.json"), "w") as f:
+                json.dump(manifest, f)
+        except (OSError, ValueError):
+            shutil.rmtree(entry, ignore_errors=True)
+
+    def Evict(self):
+        """
+        Remove least recently used entries until cache size is under max size
+        """
+        entries = []
+        total = 0
+        if not os.path.isdir(self.path):
+            return
+        for subdir in os.listdir(self.path):
+            subpath = os.path.join(self.path, subdir)
+            if not os.path.isdir(subpath):
+                continue
+            for key in os.listdir(subpath):
+                entry = os.path.join(subpath, key)
+                try:
+                    size = sum(os.path.getsize(os.path.join(entry, fn))
+                               for fn in os.listdir(entry))
+                    entries.append((os.path.getmtime(entry), size, entry))
+                except OSError:
+                    continue
+                total += size
+        if total <= self.max_size:
+            return
+        entries.sort()
+        for _mtime, size, entry in entries:
+            shutil.rmtree(entry, ignore_errors=True)
+            total -= size
+            if total <= self.max_size:
+                break
+
+    def GetStats(self):
+        return self.hits, self.misses
@@ -57,3 +57,15 @@ def Bpath(*names):
     Return path of files in Beremiz project
     """
     return os.path.join(AbsParentDir(__file__, 1), *names)
+
+
+def UserCacheDir(*names):
+    """
+    Return path of files in user's cache directory
+    """
+    if os.name in ("nt", "ce"):
+        base = os.environ.get("LOCALAPPDATA") or os.path.expanduser("~")
+    else:
+        base = os.environ.get("XDG_CACHE_HOME") or \
+            os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "beremiz", *names)
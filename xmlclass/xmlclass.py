@@ -1167,6 +1167,7 @@ class ClassFactory(object):
 
         classmembers["_init_"] = generateInitMethod(self, classinfos)
         classmembers["StructurePattern"] = GetStructurePattern(classinfos)
+        classmembers["StructureFirstChildren"] = GetStructureFirstChildren(classinfos)
         classmembers["getElementAttributes"] = generateGetElementAttributes(self, classinfos)
         classmembers["getElementInfos"] = generateGetElementInfos(self, classinfos)
         classmembers["setElementValue"] = generateSetElementValue(self, classinfos)
@@ -1271,6 +1272,45 @@ def GetStructurePattern(classinfos):
         raise ValueError("XSD structure not yet supported!")
 
 
+def GetStructureFirstChildren(classinfos):
+    """
+    Method that compute names of children that can come first in xml tree
+    structure model, with None if structure can be empty. Return None if any
+    child can come first
+    """
+    if "base" in classinfos:
+        first_children = classinfos["base"].StructureFirstChildren
+        if first_children is None or None not in first_children:
+            return first_children
+        first_children = set(first_children) - {None}
+    else:
+        first_children = set()
+    for element in classinfos["elements"]:
+        if element["type"] == ANY:
+            return None
+        elif element["type"] == CHOICE:
+            optional = element["minOccurs"] == 0
+            for infos in element["choices"]:
+                if infos["type"] == "sequence":
+                    choice_first_children = GetStructureFirstChildren(infos)
+                    if choice_first_children is None:
+                        return None
+                    optional |= None in choice_first_children
+                    first_children |= choice_first_children - {None}
+                else:
+                    first_children.add(infos["name"])
+                optional |= infos["minOccurs"] == 0
+        elif element["name"] == "content" and element["elmt_type"]["type"] == SIMPLETYPE:
+            optional = True
+        else:
+            first_children.add(element["name"])
+            optional = element["minOccurs"] == 0
+        if not optional:
+            return frozenset(first_children)
+    first_children.add(None)
+    return frozenset(first_children)
+
+
 def generateClassCreateFunction(factory, class_definition):
     """
     Method that generate the method for creating a class instance
@@ -1725,6 +1765,7 @@ NAMESPACE_PATTERN = re.compile(r"xmlns(?:\:[^\=]*)?=\"[^\"]*\" ")
 class DefaultElementClass(etree.ElementBase):
 
     StructurePattern = re.compile("$")
+    StructureFirstChildren = frozenset([None])
 
     def _init_(self):
         pass
@@ -1745,6 +1786,16 @@ class XMLElementClassLookUp(etree.PythonElementClassLookup):
         self.LookUpClasses = classes
         self.ElementTag = None
         self.ElementClass = None
+        # (element tag, parent tag) -> class or list of possible classes,
+        # with names of equivalent classes resolved
+        self.ResolvedClasses = {}
+        # (element tag, parent tag, first child tag) -> class, or False if
+        # first child doesn't tell possible classes apart, for tags with
+        # several possible classes
+        self.FirstChildClasses = {}
+        # (element tag, parent tag, children tags) -> class, for tags
+        # with several possible classes not told apart by first child
+        self.StructureClasses = {}
 
     def GetElementClass(self, element_tag, parent_tag=None, default=DefaultElementClass):
         element_class = self.LookUpClasses.get(element_tag, (default, None))
@@ -1790,6 +1841,21 @@ class XMLElementClassLookUp(etree.PythonElementClassLookup):
         self.ResetLookupResult()
         return element_class
 
+    def GetFirstChildClass(self, possible_classes, first_child_tag):
+        """
+        Return the only class of possible classes whose structure can start
+        with given first child tag, or False if there are several of them
+        """
+        first_child = (etree.QName(first_child_tag).localname
+                       if first_child_tag is not None else None)
+        candidates = [
+            possible_class for possible_class in possible_classes
+            if possible_class.StructureFirstChildren is None or
+            first_child in possible_class.StructureFirstChildren]
+        if len(candidates) > 1:
+            return False
+        return candidates[0] if candidates else possible_classes[0]
+
     def lookup(self, document, element):
         """
         Lookup for element class for given element tag.
@@ -1804,23 +1870,45 @@ class XMLElementClassLookUp(etree.PythonElementClassLookup):
         :return:
             Returns element class corresponding to given element.
         """
-        element_class = self.GetLookupResult(element)
-        if element_class is not None:
-            return element_class
+        if self.ElementTag is not None:
+            element_class = self.GetLookupResult(element)
+            if element_class is not None:
+                return element_class
 
         parent = element.getparent()
-        element_class = self.GetElementClass(
-            element.tag, parent.tag if parent is not None else None)
+        key = (element.tag, parent.tag if parent is not None else None)
+        element_class = self.ResolvedClasses.get(key)
+        if element_class is None:
+            element_class = self.GetElementClass(*key)
+            if isinstance(element_class, list):
+                element_class = [
+                    self.GetElementClass(possible_class)
+                    if isinstance(possible_class, str) else possible_class
+                    for possible_class in element_class]
+            self.ResolvedClasses[key] = element_class
         if isinstance(element_class, list):
+            first_child_tag = element[0].tag if len(element) else None
+            first_child_key = key + (first_child_tag,)
+            structure_class = self.FirstChildClasses.get(first_child_key)
+            if structure_class is None:
+                structure_class = self.GetFirstChildClass(
+                    element_class, first_child_tag)
+                self.FirstChildClasses[first_child_key] = structure_class
+            if structure_class is not False:
+                return structure_class
             children = "".join([
                 "%s " % etree.QName(child.tag).localname
                 for child in element])
-            for possible_class in element_class:
-                if isinstance(possible_class, str):
-                    possible_class = self.GetElementClass(possible_class)
-                if possible_class.StructurePattern.match(children) is not None:
-                    return possible_class
-            return element_class[0]
+            structure_key = key + (children,)
+            structure_class = self.StructureClasses.get(structure_key)
+            if structure_class is None:
+                structure_class = element_class[0]
+                for possible_class in element_class:
+                    if possible_class.StructurePattern.match(children) is not None:
+                        structure_class = possible_class
+                        break
+                self.StructureClasses[structure_key] = structure_class
+            return structure_class
         return element_class
 
 
@@ -26,6 +26,7 @@
 import os
 import re
 import datetime
+import hashlib
 from types import FunctionType
 from xml.dom import minidom
 
@@ -1110,6 +1111,12 @@ class XSDClassFactory(ClassFactory):
         return None
 
 
+# Parsers already generated, by XSD file path and hash. Generated classes
+# only depend on XSD, so that confnodes with the same XSD share a parser
+# instead of generating classes and compiling schema again for each one.
+GeneratedParsers = {}
+
+
 def GenerateParserFromXSD(filepath):
     """
     This function opens the xsd file and generate a xml parser with class lookup from
@@ -1118,10 +1125,15 @@ def GenerateParserFromXSD(filepath):
     xsdfile = open(filepath, 'r')
     xsdstring = xsdfile.read()
     xsdfile.close()
-    cwd = os.getcwd()
-    os.chdir(os.path.dirname(filepath))
-    parser = GenerateParser(XSDClassFactory(minidom.parseString(xsdstring), filepath), xsdstring)
-    os.chdir(cwd)
+    key = (os.path.realpath(filepath),
+           hashlib.md5(xsdstring.encode()).hexdigest())
+    parser = GeneratedParsers.get(key)
+    if parser is None:
+        cwd = os.getcwd()
+        os.chdir(os.path.dirname(filepath))
+        parser = GenerateParser(XSDClassFactory(minidom.parseString(xsdstring), filepath), xsdstring)
+        os.chdir(cwd)
+        GeneratedParsers[key] = parser
     return parser
 
 
@@ -1129,7 +1141,12 @@ def GenerateParserFromXSDstring(xsdstring):
     """
     This function generate a xml from the xsd given as a string
     """
-    return GenerateParser(XSDClassFactory(minidom.parseString(xsdstring)), xsdstring)
+    key = (None, hashlib.md5(xsdstring.encode()).hexdigest())
+    parser = GeneratedParsers.get(key)
+    if parser is None:
+        parser = GenerateParser(XSDClassFactory(minidom.parseString(xsdstring)), xsdstring)
+        GeneratedParsers[key] = parser
+    return parser
 
 
 # -------------------------------------------------------------------------------